@@ -0,0 +1,63 @@
+"""Measure how long the VideoTable analytics kernels take over a million videos.
+
+Run from the repository root (numpy is needed):
+
+    python benchmarks/bench_analytics.py
+
+"""
+import sys
+import time
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from pytaw.analytics import VideoTable     # noqa: E402
+
+
+def random_table(n_rows=1_000_000, n_channels=10_000, n_tags=50_000, seed=0):
+    """Build a table of random videos, with up to 5 tags each."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(0, 6, n_rows)
+    tag_names = np.asarray([f'tag {i}' for i in range(n_tags)], dtype=object)
+    return VideoTable(
+        ids=np.asarray([f'video-{i:07d}' for i in range(n_rows)], dtype=object),
+        channel_ids=np.asarray([f'UC{i:06d}' for i in rng.integers(0, n_channels, n_rows)],
+                               dtype=object),
+        published_at=rng.uniform(1.2e9, 1.7e9, n_rows),
+        duration=rng.exponential(600, n_rows).round(),
+        n_views=rng.pareto(1.5, n_rows).round() * 1000,
+        n_likes=rng.pareto(1.5, n_rows).round() * 10,
+        n_comments=rng.pareto(1.5, n_rows).round(),
+        tags=(rng.integers(0, n_tags, lengths.sum()), lengths, tag_names),
+    )
+
+
+KERNELS = (
+    ('views_per_day', lambda t: t.views_per_day()),
+    ('percentiles', lambda t: t.percentiles('n_views', (50, 90, 99))),
+    ('duration_histogram', lambda t: t.duration_histogram()),
+    ('group_by_channel sum', lambda t: t.group_by_channel('n_views')),
+    ('group_by_channel max', lambda t: t.group_by_channel('n_views', 'max')),
+    ('top_channels', lambda t: t.top_channels(10, by='engagement', agg='mean')),
+    ('top_k', lambda t: t.top_k(100, by='views_per_day')),
+    ('tag_frequency', lambda t: t.tag_frequency(20)),
+    ('select short videos', lambda t: t[t.duration < 60]),
+)
+
+
+def milliseconds(kernel, table, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        kernel(table)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+if __name__ == '__main__':
+    table = random_table()
+    print(table)
+    for name, kernel in KERNELS:
+        print(f"{name:22s} {milliseconds(kernel, table):8.1f} ms")
@@ -0,0 +1,76 @@
+"""Measure how fast Resources are created from full pages of api items.
+
+Run from the repository root:
+
+    python benchmarks/bench_attributes.py
+
+"""
+import sys
+import time
+import copy
+import statistics
+
+sys.path.insert(0, '.')
+
+from pytaw.youtube import create_resource_from_api_response     # noqa: E402
+
+
+def video_item(i):
+    return {
+        'kind': 'youtube#video',
+        'etag': f'etag-{i}',
+        'id': f'video-{i:06d}',
+        'snippet': {
+            'publishedAt': '2019-03-12T17:00:05.000Z',
+            'channelId': 'UCGm3CO6LPcN-Y7HIuyE0Rew',
+            'title': f'Monty Python - Dead Parrot ({i})',
+            'description': 'Monty Python ' * 40,
+            'thumbnails': {
+                name: {'url': f'https://i.ytimg.com/vi/{i}/{name}.jpg', 'width': w, 'height': h}
+                for name, w, h in (('default', 120, 90), ('medium', 320, 180),
+                                   ('high', 480, 360))
+            },
+            'channelTitle': 'Monty Python',
+            'tags': ['monty python', 'dead parrot', 'sketch'],
+        },
+        'contentDetails': {'duration': 'PT5M33S', 'definition': 'hd'},
+        'status': {'license': 'youtube'},
+        'statistics': {'viewCount': '12345678', 'likeCount': '123456', 'favoriteCount': '0',
+                       'commentCount': '12345'},
+    }
+
+
+def channel_item(i):
+    return {
+        'kind': 'youtube#channel',
+        'etag': f'etag-{i}',
+        'id': f'channel-{i:06d}',
+        'snippet': {
+            'title': f'Monty Python ({i})',
+            'description': 'Monty Python ' * 40,
+            'publishedAt': '2008-03-31T20:04:29Z',
+            'thumbnails': {'default': {'url': f'https://yt3.ggpht.com/{i}.jpg'}},
+        },
+        'contentDetails': {'relatedPlaylists': {'uploads': f'UU{i:06d}'}},
+        'statistics': {'viewCount': '1234567890', 'subscriberCount': '1000000',
+                       'videoCount': '1234'},
+    }
+
+
+def items_per_second(make_item, n_pages=200, repeat=5):
+    """Create Resources from n_pages pages of 50 items (median of several runs)."""
+    pages = [[make_item(i) for i in range(50)] for _ in range(n_pages)]
+    rates = []
+    for _ in range(repeat):
+        items = copy.deepcopy(pages)
+        start = time.perf_counter()
+        for page in items:
+            for item in page:
+                create_resource_from_api_response(None, item)
+        rates.append(n_pages * 50 / (time.perf_counter() - start))
+    return statistics.median(rates)
+
+
+if __name__ == '__main__':
+    for name, make_item in (('videos', video_item), ('channels', channel_item)):
+        print(f"{name:10s} {items_per_second(make_item):10,.0f} items/s")
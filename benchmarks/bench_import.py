@@ -0,0 +1,34 @@
+"""Measure how long it takes to import pytaw, and to build a client.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py
+
+"""
+import sys
+import subprocess
+import statistics
+
+
+STATEMENTS = {
+    'import pytaw': 'import pytaw',
+    'import pytaw.youtube': 'import pytaw.youtube',
+    'import googleapiclient.discovery': 'import googleapiclient.discovery',
+    'build a client': "import pytaw; pytaw.YouTube(key='x')",
+}
+
+
+def time_statement(statement, repeat=10):
+    """Time a statement in a fresh interpreter, in milliseconds (median of several runs)."""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                check=True)
+        times.append(float(result.stdout) * 1000)
+    return statistics.median(times)
+
+
+if __name__ == '__main__':
+    for name, statement in STATEMENTS.items():
+        print(f"{name:35s} {time_statement(statement):8.1f} ms")
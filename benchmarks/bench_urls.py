@@ -0,0 +1,79 @@
+"""Measure how fast youtube urls are classified and ingested, over a million of them.
+
+Run from the repository root:
+
+    python benchmarks/bench_urls.py
+
+The classification rate is compared against parsing each url with urllib (the old way
+`youtube_url_to_id()` did it).  Ingestion is measured up to the point of fetching (classifying,
+deduplicating and batching), since fetching is bound by the api, not by us.
+
+"""
+import sys
+import time
+import random
+import string
+import urllib.parse
+
+sys.path.insert(0, '.')
+
+from pytaw.ingest import UrlIngester        # noqa: E402
+from pytaw.utils import classify_youtube_url        # noqa: E402
+
+
+ID_CHARACTERS = string.ascii_letters + string.digits + '-_'
+
+SHAPES = (
+    'https://www.youtube.com/watch?v={video}',
+    'https://www.youtube.com/watch?v={video}&list=PL{playlist}&index=3',
+    'https://youtu.be/{video}?t=42',
+    'https://m.youtube.com/shorts/{video}',
+    'https://www.youtube.com/embed/{video}',
+    'https://www.youtube.com/playlist?list=PL{playlist}',
+    'https://www.youtube.com/channel/UC{channel}',
+    'https://www.youtube.com/@handle{n}',
+    'https://example.com/article/{n}',
+)
+
+
+def random_id(rng, length):
+    return ''.join(rng.choice(ID_CHARACTERS) for _ in range(length))
+
+
+def random_urls(n_urls=1_000_000, n_distinct=200_000, seed=0):
+    """Build a corpus of urls of mixed shapes, where each distinct url appears several times."""
+    rng = random.Random(seed)
+    distinct = [
+        rng.choice(SHAPES).format(video=random_id(rng, 11), playlist=random_id(rng, 32),
+                                  channel=random_id(rng, 22), n=i)
+        for i in range(n_distinct)
+    ]
+    return [rng.choice(distinct) for _ in range(n_urls)]
+
+
+def parse_url(url):
+    """Classify a url the slow way, by parsing it."""
+    url_data = urllib.parse.urlparse(urllib.parse.unquote(url))
+    query = urllib.parse.parse_qs(url_data.query)
+    return url_data.netloc, url_data.path, query.get('v')
+
+
+def rate(function, urls):
+    start = time.perf_counter()
+    for url in urls:
+        function(url)
+    return len(urls) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    urls = random_urls()
+    print(f"{len(urls)} urls")
+    print(f"{'classify_youtube_url':22s} {rate(classify_youtube_url, urls):12,.0f} urls/s")
+    print(f"{'urlparse':22s} {rate(parse_url, urls):12,.0f} urls/s")
+
+    ingester = UrlIngester(youtube=None)
+    start = time.perf_counter()
+    n_batches = sum(1 for _ in ingester.batches(urls))
+    elapsed = time.perf_counter() - start
+    print(f"{'batch (with dedupe)':22s} {len(urls) / elapsed:12,.0f} urls/s "
+          f"({n_batches} batches, {ingester.stats})")
@@ -1 +1,63 @@
-from .youtube import YouTube
\ No newline at end of file
+"""PYTAW: Python YouTube API Wrapper.
+
+The public names below are imported lazily, the first time they're used, so that `import
+pytaw` stays cheap for scripts which never build a client.  The heavy dependencies
+(googleapiclient, oauth2client, httplib2, dateutil) are only imported when a YouTube client is
+built, a connection is opened or a timestamp needs parsing.
+
+"""
+import importlib
+
+
+_LAZY_NAMES = {
+    'YouTube': 'youtube',
+    'Query': 'youtube',
+    'ListResponse': 'youtube',
+    'BulkResponse': 'youtube',
+    'Resource': 'youtube',
+    'Video': 'youtube',
+    'Channel': 'youtube',
+    'Playlist': 'youtube',
+    'PlaylistItem': 'youtube',
+    'CommentThread': 'youtube',
+    'Comment': 'youtube',
+    'Thumbnail': 'youtube',
+    'Pipeline': 'pipeline',
+    'KeyPool': 'quota',
+    'QuotaExhausted': 'quota',
+    'Scheduler': 'scheduler',
+    'request_priority': 'scheduler',
+    'ResourceStore': 'store',
+    'SearchIndex': 'index',
+    'VideoTable': 'analytics',
+    'Crawler': 'crawl',
+    'CommentHarvester': 'comments',
+    'StatisticsPoller': 'poller',
+    'WebSubSubscriber': 'websub',
+    'FeedReader': 'feeds',
+    'Daemon': 'daemon',
+    'RemoteYouTube': 'daemon',
+    'UrlIngester': 'ingest',
+    'GraphCrawler': 'graph',
+    'ThumbnailStore': 'thumbnails',
+    'ThumbnailDownloader': 'thumbnails',
+    'encode_resources': 'serialization',
+    'decode_resources': 'serialization',
+}
+
+__all__ = list(_LAZY_NAMES)
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_NAMES[name]
+    except KeyError:
+        raise AttributeError(f"module 'pytaw' has no attribute '{name}'") from None
+
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value     # so we only come through here once per name
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,337 @@
+"""Vectorised analytics over crawled videos, with numpy.
+
+Videos are loaded into a VideoTable: one numpy array per attribute (a columnar batch), so that
+statistics over millions of videos are computed in a few array operations rather than a python
+loop over Video objects.
+
+    >>> table = VideoTable.from_store(store)
+    >>> table.percentiles('n_views', (50, 90, 99))
+    >>> table.top_channels(10, by='n_views')
+    >>> table[table.duration < 60].tag_frequency(20)
+
+numpy is an optional dependency: install it with `pip install pytaw[analytics]`.
+
+"""
+import time
+import logging
+import collections
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("pytaw.analytics needs numpy (pip install pytaw[analytics])") from None
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+SECONDS_PER_DAY = 86400.0
+
+# numeric columns of a VideoTable, and the Video attribute each comes from
+NUMERIC_COLUMNS = (
+    ('published_at', 'published_at'),
+    ('duration', 'duration'),
+    ('n_views', 'n_views'),
+    ('n_likes', 'n_likes'),
+    ('n_comments', 'n_comments'),
+)
+
+# group-by aggregations, and the numpy ufunc used to reduce each group
+AGGREGATIONS = {
+    'sum': np.add,
+    'min': np.fmin,
+    'max': np.fmax,
+    'mean': None,
+    'count': None,
+}
+
+
+def _number(value):
+    """Convert an attribute value to a float for a numeric column (NaN if it's missing)."""
+    if value is None:
+        return np.nan
+    if hasattr(value, 'timestamp'):
+        return value.timestamp()
+    if hasattr(value, 'total_seconds'):
+        return value.total_seconds()
+    return float(value)
+
+
+class VideoTable(object):
+    """A columnar batch of video data.
+
+    Columns are numpy arrays with one row per video:
+        ids, channel_ids: object arrays of strings
+        published_at: unix time
+        duration: seconds
+        n_views, n_likes, n_comments: counts
+    Numeric columns are float64, with NaN where a value is missing (e.g. if that part wasn't
+    fetched, or likes are hidden).  Tags are held as integer codes into `tag_names`.
+
+    Tables can be indexed with a boolean mask or an array of row indices to get a new table of
+    the selected rows, e.g. `table[table.n_views > 1000]`.
+
+    """
+
+    def __init__(self, ids, channel_ids, published_at, duration, n_views, n_likes, n_comments,
+                 tags=None, channels=None):
+        """Initialise the table from columns.
+
+        :param ids: sequence of video ids
+        :param channel_ids: sequence of channel ids
+        :param published_at, duration, n_views, n_likes, n_comments: numeric sequences (see
+            above)
+        :param tags: sequence of lists of tags for each video, or a (tag_codes, tag_lengths,
+            tag_names) tuple as held by a table (default: no tags)
+        :param channels: (channel_names, channel_codes) tuple as held by a table (default:
+            worked out from channel_ids)
+
+        """
+        self.ids = np.asarray(ids, dtype=object)
+        self.channel_ids = np.asarray(channel_ids, dtype=object)
+        self.published_at = np.asarray(published_at, dtype=np.float64)
+        self.duration = np.asarray(duration, dtype=np.float64)
+        self.n_views = np.asarray(n_views, dtype=np.float64)
+        self.n_likes = np.asarray(n_likes, dtype=np.float64)
+        self.n_comments = np.asarray(n_comments, dtype=np.float64)
+
+        n = len(self.ids)
+        for name in ('channel_ids', 'published_at', 'duration', 'n_views', 'n_likes',
+                     'n_comments'):
+            if len(getattr(self, name)) != n:
+                raise ValueError(f"column '{name}' has {len(getattr(self, name))} rows, not {n}")
+
+        if tags is None:
+            tags = [[]] * n
+        if isinstance(tags, tuple):
+            self._tag_codes, self._tag_lengths, self.tag_names = tags
+        else:
+            self._encode_tags(tags)
+
+        # channel ids as integer codes, for grouping
+        if channels is None:
+            channels = np.unique(self.channel_ids.astype(str), return_inverse=True)
+        self.channel_names, self._channel_codes = channels
+
+    def _encode_tags(self, tags):
+        codes = {}
+        flat = []
+        lengths = np.empty(len(tags), dtype=np.int64)
+        for i, video_tags in enumerate(tags):
+            lengths[i] = len(video_tags)
+            for tag in video_tags:
+                flat.append(codes.setdefault(tag.casefold(), len(codes)))
+        self._tag_codes = np.asarray(flat, dtype=np.int64)
+        self._tag_lengths = lengths
+        self.tag_names = np.asarray(list(codes), dtype=object)
+
+    def __repr__(self):
+        return f"<VideoTable n={len(self)} n_channels={len(self.channel_names)}>"
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_videos(cls, videos):
+        """Build a table from Video instances.
+
+        Only attributes the videos already have are used: missing data is never fetched.  Use
+        e.g. `hydrate_resources()` first to fetch any missing parts in batches.
+
+        :param videos: iterable of Video instances
+        :return: VideoTable
+
+        """
+        ids, channel_ids, tags = [], [], []
+        numbers = collections.defaultdict(list)
+        for video in videos:
+            if video is None:
+                continue
+            attributes = vars(video)    # don't go through __getattr__, which would fetch
+            ids.append(video.id)
+            channel_ids.append(attributes.get('channel_id') or '')
+            tags.append(attributes.get('tags') or [])
+            for column, attribute in NUMERIC_COLUMNS:
+                numbers[column].append(_number(attributes.get(attribute)))
+
+        return cls(ids, channel_ids, tags=tags,
+                   **{column: numbers[column] for column, _ in NUMERIC_COLUMNS})
+
+    @classmethod
+    def from_items(cls, items):
+        """Build a table from raw api video items (or a raw api page)."""
+        from .youtube import create_resource_from_api_response
+
+        if isinstance(items, dict) and 'items' in items:
+            items = items['items']
+        return cls.from_videos(create_resource_from_api_response(None, item) for item in items)
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """Build a table from the videos in a ResourceStore.
+
+        :param store: ResourceStore
+        :param kwargs: keyword arguments for `ResourceStore.videos()`, e.g. channel_id
+        """
+        return cls.from_videos(store.videos(**kwargs))
+
+    @classmethod
+    def concat(cls, tables):
+        """Join tables together into one."""
+        tables = list(tables)
+        if not tables:
+            return cls([], [], [], [], [], [], [])
+
+        # re-code the tags of each table into a shared vocabulary
+        names = np.unique(np.concatenate([t.tag_names for t in tables]).astype(str))
+        tag_codes = [np.searchsorted(names, t.tag_names.astype(str))[t._tag_codes]
+                     if len(t._tag_codes) else t._tag_codes for t in tables]
+
+        return cls(
+            np.concatenate([t.ids for t in tables]),
+            np.concatenate([t.channel_ids for t in tables]),
+            tags=(np.concatenate(tag_codes), np.concatenate([t._tag_lengths for t in tables]),
+                  names.astype(object)),
+            **{column: np.concatenate([getattr(t, column) for t in tables])
+               for column, _ in NUMERIC_COLUMNS}
+        )
+
+    def __getitem__(self, rows):
+        """Select rows with a boolean mask, or an array (or slice) of row indices."""
+        rows = np.arange(len(self))[rows]
+        starts = np.cumsum(self._tag_lengths) - self._tag_lengths
+        lengths = self._tag_lengths[rows]
+        # indices into the flat tag codes of each selected row's tags
+        tag_index = (np.repeat(starts[rows] - np.cumsum(lengths) + lengths, lengths)
+                     + np.arange(lengths.sum()))
+        # keep only the channels of the selected rows, without sorting the ids again
+        used, channel_codes = np.unique(self._channel_codes[rows], return_inverse=True)
+
+        return VideoTable(
+            self.ids[rows],
+            self.channel_ids[rows],
+            tags=(self._tag_codes[tag_index], lengths, self.tag_names),
+            channels=(self.channel_names[used], channel_codes),
+            **{column: getattr(self, column)[rows] for column, _ in NUMERIC_COLUMNS}
+        )
+
+    def column(self, name):
+        """Get a column (or derived column, see below) by name."""
+        if name in ('views_per_day', 'engagement', 'age_days'):
+            return getattr(self, name)()
+        return getattr(self, name)
+
+    def age_days(self, now=None):
+        """Days since each video was published."""
+        now = time.time() if now is None else now
+        return (now - self.published_at) / SECONDS_PER_DAY
+
+    def views_per_day(self, now=None):
+        """Average views per day since each video was published (its first day counts as one)."""
+        return self.n_views / np.maximum(self.age_days(now), 1.0)
+
+    def engagement(self):
+        """Likes and comments per view of each video (NaN if it has no views)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = (np.nan_to_num(self.n_likes) + np.nan_to_num(self.n_comments)) / self.n_views
+        rate[~np.isfinite(rate)] = np.nan
+        return rate
+
+    def percentiles(self, column, q=(50, 90, 99)):
+        """Percentiles of a column, ignoring missing values.
+
+        :param column: column name, or an array with a value for each row
+        :param q: percentile or sequence of percentiles (0-100)
+        :return: array of percentiles
+
+        """
+        values = self.column(column) if isinstance(column, str) else np.asarray(column)
+        if np.isnan(values).all():
+            return np.full(np.shape(q), np.nan)
+        return np.nanpercentile(values, q)
+
+    def duration_histogram(self, bins=(0, 60, 240, 600, 1200, 3600, np.inf)):
+        """Count videos by duration.
+
+        :param bins: bin edges in seconds, or a number of equal width bins
+        :return: (counts, edges) arrays
+        """
+        duration = self.duration[~np.isnan(self.duration)]
+        return np.histogram(duration, bins=bins)
+
+    def group_by_channel(self, column='n_views', agg='sum'):
+        """Aggregate a column over each channel's videos.
+
+        :param column: column name, or an array with a value for each row
+        :param agg: 'sum', 'mean', 'min', 'max' or 'count'.  missing values are ignored.
+        :return: (channel ids, values) arrays
+
+        """
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"agg must be one of {tuple(AGGREGATIONS)}, not '{agg}'")
+
+        values = self.column(column) if isinstance(column, str) else np.asarray(column, float)
+        present = ~np.isnan(values)
+        codes, values = self._channel_codes[present], values[present]
+        n_channels = len(self.channel_names)
+
+        if agg == 'count':
+            result = np.bincount(codes, minlength=n_channels).astype(np.float64)
+        elif agg in ('sum', 'mean'):
+            result = np.bincount(codes, weights=values, minlength=n_channels)
+            if agg == 'mean':
+                with np.errstate(invalid='ignore'):
+                    result /= np.bincount(codes, minlength=n_channels)
+        else:
+            # sort by channel and reduce each channel's run of values
+            order = np.argsort(codes, kind='stable')
+            codes, values = codes[order], values[order]
+            result = np.full(n_channels, np.nan)
+            if len(codes):
+                starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+                result[codes[starts]] = AGGREGATIONS[agg].reduceat(values, starts)
+
+        return self.channel_names.astype(object), result
+
+    def top_k(self, k, by='n_views'):
+        """Find the k rows with the largest values of a column.
+
+        :param k: number of rows
+        :param by: column name, or an array with a value for each row
+        :return: VideoTable of the rows, largest first
+
+        """
+        values = self.column(by) if isinstance(by, str) else np.asarray(by, float)
+        return self[_top_indices(np.nan_to_num(values, nan=-np.inf), k)]
+
+    def top_channels(self, k, by='n_views', agg='sum'):
+        """Find the k channels with the largest aggregate of a column (see `group_by_channel()`).
+
+        :return: list of (channel id, value) tuples, largest first
+        """
+        channel_ids, values = self.group_by_channel(by, agg)
+        top = _top_indices(np.nan_to_num(values, nan=-np.inf), k)
+        return [(channel_ids[i], values[i]) for i in top]
+
+    def tag_frequency(self, k=None):
+        """Count how many videos use each tag (tags are compared case insensitively).
+
+        :param k: only give the k most common tags
+        :return: list of (tag, count) tuples, most common first
+        """
+        counts = np.bincount(self._tag_codes, minlength=len(self.tag_names))
+        top = _top_indices(counts, len(counts) if k is None else k)
+        return [(self.tag_names[i], int(counts[i])) for i in top if counts[i]]
+
+
+def _top_indices(values, k):
+    """Get the indices of the k largest values, largest first (ties in order of index)."""
+    k = min(k, len(values))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(values):
+        candidates = np.argpartition(-values, k - 1)[:k]
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.lexsort((candidates, -values[candidates]))]
@@ -0,0 +1,480 @@
+"""The `pytaw` command, for bulk jobs that write api data straight to a file.
+
+    $ pytaw uploads UCGm3CO6LPcN-Y7HIuyE0Rew --parts snippet,statistics > videos.ndjson
+    $ pytaw videos ids.txt --concurrency 16 --format csv --output videos.csv
+    $ pytaw search "monty python" "dead parrot" --max-pages 5 --quota-budget 2000
+
+Raw api items are written as they arrive (one per line for NDJSON), so memory use stays flat
+however big the job is.  Throughput and quota use are shown on stderr while the job runs.
+
+`pytaw daemon` runs a long-lived daemon holding the api client (see `pytaw.daemon`), and
+`--remote` sends a job's requests through it.
+
+"""
+import os
+import sys
+import csv
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .youtube import YouTube, Query
+from .daemon import Daemon, RemoteYouTube
+from .scheduler import BULK
+from .quota import QuotaBudget, QuotaExhausted, quota_cost
+from .utils import youtube_url_to_id, iterate_chunks
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+class _BudgetExhausted(Exception):
+    """Raised inside a job when the quota budget has run out."""
+    pass
+
+
+def flatten(item, prefix=''):
+    """Flatten a nested api item into a single level dictionary with dotted keys, e.g. for csv.
+
+    Lists are encoded as json.
+    """
+    flat = dict()
+    for key, value in item.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix=f'{prefix}{key}.'))
+        elif isinstance(value, list):
+            flat[prefix + key] = json.dumps(value, separators=(',', ':'))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+class NdjsonWriter(object):
+    """Writes api items as newline delimited json."""
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, item):
+        self.file.write(json.dumps(item, separators=(',', ':')) + '\n')
+
+
+class CsvWriter(object):
+    """Writes api items as csv, one flattened item per row.
+
+    The columns are those of the first item written.  Fields which later items have but the first
+    didn't are left out, so choose parts (or fields) which every item will have.
+
+    """
+
+    def __init__(self, file, write_header=True):
+        self.file = file
+        self.write_header = write_header
+        self._writer = None
+
+    def write(self, item):
+        row = flatten(item)
+        if self._writer is None:
+            self._writer = csv.DictWriter(self.file, fieldnames=list(row), extrasaction='ignore')
+            if self.write_header:
+                self._writer.writeheader()
+        self._writer.writerow(row)
+
+
+WRITERS = {
+    'ndjson': NdjsonWriter,
+    'csv': CsvWriter,
+}
+
+
+class ResumeLog(object):
+    """Records which units of a job (channels, batches of videos, searches) are complete.
+
+    Each completed unit is appended to the file as a line of json, so a job which is interrupted
+    can be run again and carry on where it left off.  Units which were in progress when the job
+    stopped are done again, so their items may be written twice.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done.update(json.loads(line) for line in f if line.strip())
+        self._file = open(path, 'a')
+
+    def __contains__(self, unit):
+        return unit in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def add(self, unit):
+        self.done.add(unit)
+        self._file.write(json.dumps(unit) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BulkJob(object):
+    """Runs the units of a bulk job concurrently, writing every item fetched to a writer.
+
+    Only a bounded number of units are queued at once, so units can be read lazily from a huge
+    input file.
+
+    """
+
+    def __init__(self, youtube, writer, concurrency=8, parts='snippet', fields=None,
+                 quota_budget=None, resume=None):
+        """Initialise the job.
+
+        :param youtube: YouTube instance
+        :param writer: NdjsonWriter or CsvWriter
+        :param concurrency: maximum number of requests at once
+        :param parts: part string of the items written
+        :param fields: fields filter for the items written, e.g. 'id,snippet(title)'
+        :param quota_budget: maximum quota to use, in units
+        :param resume: ResumeLog, or None
+
+        """
+        self.youtube = youtube
+        self.writer = writer
+        self.concurrency = concurrency
+        self.parts = parts
+        self.fields = fields
+        self.budget = QuotaBudget(quota_budget) if quota_budget is not None else None
+        self.resume = resume
+
+        self.n_items = 0
+        self.n_requests = 0
+        self.n_errors = 0
+        self.quota_used = 0
+        self.started_at = time.time()
+
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def request(self, endpoint, params):
+        """Execute a single request, charging it to the quota budget.
+
+        :return: raw api response dictionary
+        """
+        cost = quota_cost(endpoint)
+        if self.budget is not None and not self.budget.spend(cost):
+            raise _BudgetExhausted()
+
+        raw = Query(self.youtube, endpoint, params, priority=BULK).execute()
+        with self._lock:
+            self.n_requests += 1
+            self.quota_used += cost
+        return raw
+
+    def item_params(self, params):
+        """Add the parts and fields filter to the parameters of a request for output items."""
+        params = dict(params, part=self.parts)
+        if self.fields:
+            params['fields'] = f'nextPageToken,items({self.fields})'
+        return params
+
+    def emit(self, items):
+        with self._lock:
+            for item in items:
+                self.writer.write(item)
+            self.n_items += len(items)
+
+    def status(self):
+        """Get a one line summary of progress so far."""
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        status = (f"{self.n_items} items ({self.n_items / elapsed:.0f}/s), "
+                  f"{self.n_requests} requests, {self.quota_used} quota used")
+        if self.budget is not None:
+            status += f" of {self.budget.units}"
+        key_pool = getattr(self.youtube, 'key_pool', None)
+        if key_pool is not None:
+            status += f", {key_pool.remaining} left today"
+        if self.n_errors:
+            status += f", {self.n_errors} errors"
+        return status
+
+    def run(self, units, process):
+        """Process units of work concurrently.
+
+        :param units: iterable of units (json-serialisable, so they can be logged for resuming)
+        :param process: function taking a unit, which fetches and emits its items
+        :return: True if every unit was processed, False if the job stopped early
+
+        """
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for unit in units:
+                if self.stopped.is_set():
+                    break
+                if self.resume is not None and unit in self.resume:
+                    continue
+
+                if len(pending) >= 2 * self.concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._finish(done)
+
+                future = executor.submit(process, unit)
+                future.unit = unit
+                pending.add(future)
+
+            self._finish(wait(pending).done)
+
+        return not self.stopped.is_set() and not self.n_errors
+
+    def _finish(self, futures):
+        for future in futures:
+            try:
+                future.result()
+            except _BudgetExhausted:
+                if not self.stopped.is_set():
+                    log.warning(f"quota budget of {self.budget.units} units used up, stopping")
+                self.stopped.set()
+            except QuotaExhausted as error:
+                log.warning(f"{error}, stopping")
+                self.stopped.set()
+            except Exception as error:
+                log.error(f"failed to process {future.unit!r}: {error}")
+                self.n_errors += 1
+            else:
+                if self.resume is not None:
+                    self.resume.add(future.unit)
+
+    def fetch_videos(self, ids):
+        """Fetch and emit up to 50 videos."""
+        raw = self.request('videos', self.item_params({'id': ','.join(ids), 'maxResults': 50}))
+        self.emit(raw.get('items', []))
+
+    def uploads(self, channel_id):
+        """Fetch and emit all the uploads of a channel."""
+        raw = self.request('channels', {
+            'part': 'contentDetails',
+            'id': channel_id,
+            'fields': 'items(contentDetails(relatedPlaylists(uploads)))',
+        })
+        if not raw.get('items'):
+            log.warning(f"channel {channel_id} not found")
+            return
+
+        params = {
+            'part': 'contentDetails',
+            'playlistId': raw['items'][0]['contentDetails']['relatedPlaylists']['uploads'],
+            'maxResults': 50,
+            'fields': 'nextPageToken,items(contentDetails(videoId))',
+        }
+        while True:
+            raw = self.request('playlist_items', params)
+            ids = [item['contentDetails']['videoId'] for item in raw.get('items', [])]
+            if ids:
+                self.fetch_videos(ids)
+            if not raw.get('nextPageToken'):
+                return
+            params['pageToken'] = raw['nextPageToken']
+
+    def search(self, q, max_pages=None, **search_params):
+        """Fetch and emit the results of a search."""
+        params = self.item_params(dict(search_params, q=q, maxResults=50))
+        n_pages = 0
+        while max_pages is None or n_pages < max_pages:
+            raw = self.request('search', params)
+            n_pages += 1
+            self.emit(raw.get('items', []))
+            if not raw.get('nextPageToken'):
+                return
+            params['pageToken'] = raw['nextPageToken']
+
+
+def read_video_ids(lines):
+    """Get video ids from lines of text, each a video id or url.  Blank lines are skipped."""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if '/' in line or '?' in line:
+            video_id = youtube_url_to_id(line)
+            if video_id is None:
+                log.warning(f"couldn't find a video id in '{line}'")
+                continue
+            yield video_id
+        else:
+            yield line
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='pytaw', description="Bulk youtube api jobs, with output written as it arrives."
+    )
+    parser.add_argument('--key', action='append',
+                        help="developer key (can be given more than once; default: from the "
+                             "config file)")
+    parser.add_argument('-c', '--concurrency', type=int, default=8,
+                        help="maximum number of requests at once (default: %(default)s)")
+    parser.add_argument('-p', '--parts', default='snippet',
+                        help="comma separated parts to fetch for each item (default: "
+                             "%(default)s)")
+    parser.add_argument('--fields',
+                        help="fields filter for each item, e.g. 'id,snippet(title)'")
+    parser.add_argument('-q', '--quota-budget', type=int,
+                        help="stop once this much quota has been used")
+    parser.add_argument('-f', '--format', choices=sorted(WRITERS), default='ndjson',
+                        help="output format (default: %(default)s)")
+    parser.add_argument('-o', '--output',
+                        help="file to write to (default: stdout)")
+    parser.add_argument('-r', '--resume', metavar='PROGRESS_FILE',
+                        help="record completed work in this file, and skip work it lists as "
+                             "done.  output is appended to rather than overwritten.")
+    parser.add_argument('--quiet', action='store_true',
+                        help="don't show progress on stderr")
+    parser.add_argument('--remote', action='store_true',
+                        help="send requests through a running `pytaw daemon`")
+    parser.add_argument('--socket',
+                        help="path of the daemon's socket (default: a per-user path in "
+                             "$XDG_RUNTIME_DIR or the temp directory)")
+
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    uploads = commands.add_parser('uploads', help="fetch every upload of some channels")
+    uploads.add_argument('channel_ids', nargs='+', metavar='CHANNEL_ID')
+
+    videos = commands.add_parser('videos', help="fetch videos listed in a file")
+    videos.add_argument('file', nargs='?', default='-',
+                        help="file of video ids or urls, one per line (default: stdin)")
+
+    search = commands.add_parser('search', help="fetch search results")
+    search.add_argument('queries', nargs='+', metavar='QUERY')
+    search.add_argument('--max-pages', type=int,
+                        help="maximum number of pages (of 50 results) for each query")
+    search.add_argument('--type', help="only find this kind of resource, e.g. 'video'")
+    search.add_argument('--order', help="result order, e.g. 'date' or 'viewCount'")
+
+    daemon = commands.add_parser('daemon', help="run a daemon which other pytaw processes can "
+                                                "share an api client, cache and quota through")
+    daemon.add_argument('--cache-ttl', type=float, default=300,
+                        help="seconds to cache responses for (default: %(default)s)")
+    daemon.add_argument('--status', action='store_true',
+                        help="show the status of the running daemon, rather than starting one")
+
+    return parser
+
+
+def _show_progress(job, stop, interval=1.0):
+    while not stop.wait(interval):
+        sys.stderr.write('\r' + job.status())
+        sys.stderr.flush()
+
+
+def main(argv=None, youtube=None):
+    """Run the `pytaw` command.
+
+    :param argv: command line arguments (default: sys.argv[1:])
+    :param youtube: YouTube instance to use (default: one made with the --key options or the
+        config file)
+    :return: exit status
+
+    """
+    args = build_parser().parse_args(argv)
+    # pytaw's loggers are all set to DEBUG, so filter on the handler rather than the root logger
+    handler = logging.StreamHandler()
+    handler.setLevel(logging.WARNING)
+    handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    logging.basicConfig(level=logging.WARNING, handlers=[handler])
+
+    if args.command == 'daemon':
+        return run_daemon(args, youtube)
+
+    if youtube is None and args.remote:
+        youtube = RemoteYouTube(args.socket, max_connections=args.concurrency)
+    elif youtube is None:
+        youtube = YouTube(key=args.key, max_connections=args.concurrency)
+
+    resume = ResumeLog(args.resume) if args.resume else None
+    if args.output is None:
+        output = sys.stdout
+        write_header = resume is None or not len(resume)
+    else:
+        append = resume is not None and os.path.exists(args.output)
+        output = open(args.output, 'a' if append else 'w', newline='')
+        write_header = not append or os.path.getsize(args.output) == 0
+
+    if args.format == 'csv':
+        writer = CsvWriter(output, write_header=write_header)
+    else:
+        writer = WRITERS[args.format](output)
+
+    job = BulkJob(
+        youtube, writer,
+        concurrency=args.concurrency, parts=args.parts, fields=args.fields,
+        quota_budget=args.quota_budget, resume=resume,
+    )
+
+    input_file = None
+    if args.command == 'uploads':
+        units, process = args.channel_ids, job.uploads
+
+    elif args.command == 'videos':
+        input_file = sys.stdin if args.file == '-' else open(args.file)
+        # each unit is a comma separated batch of up to 50 ids
+        units = (','.join(chunk) for chunk in iterate_chunks(read_video_ids(input_file), 50))
+
+        def process(unit):
+            job.fetch_videos(unit.split(','))
+
+    else:
+        search_params = {k: v for k, v in (('type', args.type), ('order', args.order)) if v}
+        units = args.queries
+
+        def process(unit):
+            job.search(unit, max_pages=args.max_pages, **search_params)
+
+    stop_progress = threading.Event()
+    if not args.quiet:
+        threading.Thread(target=_show_progress, args=(job, stop_progress), daemon=True).start()
+
+    try:
+        complete = job.run(units, process)
+    finally:
+        stop_progress.set()
+        output.flush()
+        if output is not sys.stdout:
+            output.close()
+        if resume is not None:
+            resume.close()
+        if input_file not in (None, sys.stdin):
+            input_file.close()
+
+    if not args.quiet:
+        sys.stderr.write('\r' + job.status() + '\n')
+
+    return 0 if complete else 1
+
+
+def run_daemon(args, youtube=None):
+    """Run the `pytaw daemon` command, until interrupted or terminated."""
+    if args.status:
+        print(json.dumps(RemoteYouTube(args.socket).status(), indent=2))
+        return 0
+
+    if youtube is None:
+        youtube = YouTube(key=args.key, max_connections=args.concurrency)
+    daemon = Daemon(youtube, path=args.socket, cache_ttl=args.cache_ttl)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.errors import HttpError
+
+from .youtube import Query, Comment
+from .scheduler import BULK
+from .quota import error_reasons
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+class CommentHarvester(object):
+    """Streams every comment (and reply) on one or many videos.
+
+    Comment threads are paged through raw, 100 at a time, and Comment instances are handed to
+    the consumer through a bounded queue, so memory use stays constant however many comments
+    there are.  Each thread comes with up to five of its replies; a thread's replies are only
+    paged through separately if it has more than that.
+
+    Several videos are harvested at once, up to `max_workers`.  Videos whose comments can't be
+    fetched (e.g. because comments are disabled) are skipped, and the error is recorded in
+    `self.errors`.
+
+        >>> harvester = CommentHarvester(youtube, max_workers=8)
+        >>> for comment in harvester.harvest(video_ids):
+        ...     store(comment)
+
+    """
+
+    def __init__(self, youtube, max_workers=4, include_replies=True, order='time',
+                 queue_size=1000):
+        """Initialise the harvester.
+
+        :param youtube: YouTube instance
+        :param max_workers: maximum number of videos to harvest at once
+        :param include_replies: whether to fetch replies as well as top level comments
+        :param order: order of comment threads, 'time' or 'relevance'
+        :param queue_size: maximum number of comments waiting to be consumed
+
+        """
+        self.youtube = youtube
+        self.max_workers = max_workers
+        self.include_replies = include_replies
+        self.order = order
+        self.queue_size = queue_size
+
+        self.errors = {}
+        self.n_comments = 0
+        self.n_requests = 0
+
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<CommentHarvester max_workers={self.max_workers} n_comments={self.n_comments}>"
+
+    def harvest(self, video_ids):
+        """Harvest comments from a set of videos.
+
+        :param video_ids: iterable of video ids
+        :return: generator of Comment instances, in no particular order across videos
+
+        """
+        comments = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        slots = threading.BoundedSemaphore(self.max_workers)
+        done = object()
+        failures = []
+
+        def put(item):
+            # don't block forever if the consumer has gone away
+            while not stop.is_set():
+                try:
+                    comments.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            raise _Stopped()
+
+        def work(video_id):
+            try:
+                if not stop.is_set():
+                    for comment in self._video_comments(video_id):
+                        put(comment)
+            except _Stopped:
+                pass
+            except HttpError as error:
+                log.warning(f"couldn't harvest comments for video {video_id}: "
+                            f"{error_reasons(error) or error}")
+                self.errors[video_id] = error
+            except Exception as error:
+                log.exception(f"error harvesting comments for video {video_id}")
+                self.errors[video_id] = error
+            finally:
+                slots.release()
+
+        def run():
+            try:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    for video_id in video_ids:
+                        # only take the next video id when a worker is free
+                        slots.acquire()
+                        if stop.is_set():
+                            break
+                        executor.submit(work, video_id)
+            except Exception as error:
+                # e.g. video_ids raised.  the consumer raises it again, after the comments
+                # already harvested
+                failures.append(error)
+            finally:
+                try:
+                    put(done)
+                except _Stopped:
+                    pass
+
+        # submitting videos from a separate thread means we can start consuming right away,
+        # even if video_ids is itself a (slow) generator
+        producer = threading.Thread(target=run, daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = comments.get()
+                if item is done:
+                    if failures:
+                        raise failures[0]
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    def _pages(self, endpoint, api_params):
+        for raw in Query(self.youtube, endpoint, api_params, priority=BULK).pages():
+            with self._lock:
+                self.n_requests += 1
+            yield raw
+
+    def _video_comments(self, video_id):
+        """Generate the comments of a single video."""
+        part = 'snippet,replies' if self.include_replies else 'snippet'
+        api_params = {
+            'part': part,
+            'videoId': video_id,
+            'maxResults': 100,
+            'order': self.order,
+            'textFormat': 'plainText',
+        }
+        for raw in self._pages('comment_threads', api_params):
+            for thread in raw['items']:
+                top_level = thread['snippet']['topLevelComment']
+                yield self._comment(top_level)
+
+                if not self.include_replies:
+                    continue
+
+                n_replies = thread['snippet'].get('totalReplyCount', 0)
+                replies = thread.get('replies', {}).get('comments', [])
+                if len(replies) >= n_replies:
+                    for reply in replies:
+                        yield self._comment(reply)
+                else:
+                    yield from self._replies(thread['id'])
+
+    def _replies(self, parent_id):
+        """Generate all replies to a comment."""
+        api_params = {
+            'part': 'snippet',
+            'parentId': parent_id,
+            'maxResults': 100,
+            'textFormat': 'plainText',
+        }
+        for raw in self._pages('comments', api_params):
+            for item in raw['items']:
+                yield self._comment(item)
+
+    def _comment(self, item):
+        with self._lock:
+            self.n_comments += 1
+        return Comment(self.youtube, item['id'], item)
+
+
+class _Stopped(Exception):
+    """Raised inside worker threads when the consumer has stopped consuming."""
+    pass
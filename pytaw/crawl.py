@@ -0,0 +1,416 @@
+import os
+import json
+import time
+import zlib
+import logging
+import collections
+import multiprocessing
+
+from .youtube import YouTube, Query, ListResponse, Video
+from .store import ResourceStore, connect
+from .scheduler import BULK, request_priority
+from .utils import iterate_chunks
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+Task = collections.namedtuple('Task', ['id', 'kind', 'value', 'attempts'])
+
+
+class LeaseLost(Exception):
+    """Exception raised if a worker's claim on a task has been given to another worker."""
+    pass
+
+
+class WorkQueue(object):
+    """A durable queue of crawl tasks, stored in a sqlite database.
+
+    Tasks are (kind, value) pairs, e.g. ('channel', 'UCMDQxm7cUx3yXkfeHa5zJIQ').  Adding a task
+    which is already in the queue does nothing, so the crawl never does the same work twice.
+
+    Each task is assigned to a shard by hashing its value.  Workers claim tasks from their own
+    shard first and steal from the other shards when theirs is empty.  Claimed tasks carry a
+    timestamp and the name of the worker that claimed them, so that the tasks of a crashed (or
+    stalled) worker can be put back in the queue.  Workers renew the timestamp as they make
+    progress on a long task (see `renew()`), so it isn't taken to be lost.
+
+    Many processes can use the same queue at once, each with its own WorkQueue instance.
+
+    """
+
+    def __init__(self, path, n_shards=1):
+        self.path = path
+        self.n_shards = n_shards
+        self.connection = connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                claimed_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                UNIQUE (kind, value)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status_shard ON tasks (status, shard);
+        """)
+
+    def __repr__(self):
+        return f"<WorkQueue '{self.path}' {self.counts()}>"
+
+    def _shard(self, value):
+        return zlib.crc32(value.encode()) % self.n_shards
+
+    def put(self, kind, values):
+        """Add tasks of the given kind to the queue.
+
+        :param kind: task kind, e.g. 'channel'
+        :param values: iterable of task values (ids etc.)
+
+        """
+        rows = [(kind, value, self._shard(value)) for value in values]
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO tasks (kind, value, shard) VALUES (?, ?, ?)', rows
+            )
+
+    def claim(self, worker, shard=None):
+        """Claim the next pending task.
+
+        :param worker: name of the claiming worker
+        :param shard: preferred shard.  if it has no pending tasks, a task is stolen from another.
+        :return: Task, or None if there are no pending tasks
+
+        """
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            row = None
+            if shard is not None:
+                row = self.connection.execute(
+                    "SELECT id, kind, value, attempts FROM tasks "
+                    "WHERE status = 'pending' AND shard = ? LIMIT 1", (shard,)
+                ).fetchone()
+            if row is None:
+                row = self.connection.execute(
+                    "SELECT id, kind, value, attempts FROM tasks WHERE status = 'pending' LIMIT 1"
+                ).fetchone()
+            if row is None:
+                return None
+
+            self.connection.execute(
+                "UPDATE tasks SET status = 'claimed', worker = ?, claimed_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?", (worker, time.time(), row[0])
+            )
+
+        return Task(*row)
+
+    def renew(self, task, worker):
+        """Renew a worker's claim on a task.
+
+        :return: True if the worker still holds the task, False if it's been requeued
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "UPDATE tasks SET claimed_at = ? WHERE id = ? AND status = 'claimed' "
+                "AND worker = ?", (time.time(), task.id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, task):
+        with self.connection:
+            self.connection.execute("UPDATE tasks SET status = 'done' WHERE id = ?", (task.id,))
+
+    def fail(self, task, error, max_attempts=3):
+        """Put a failed task back in the queue, or mark it failed if it's used all its attempts."""
+        status = 'failed' if task.attempts + 1 >= max_attempts else 'pending'
+        with self.connection:
+            self.connection.execute(
+                "UPDATE tasks SET status = ?, error = ? WHERE id = ?", (status, str(error), task.id)
+            )
+
+    def requeue(self, worker=None, older_than=None):
+        """Put claimed tasks back in the queue.
+
+        :param worker: only requeue tasks claimed by this worker
+        :param older_than: only requeue tasks claimed (or last renewed) more than this many
+            seconds ago
+        :return: number of tasks requeued
+
+        """
+        conditions = ["status = 'claimed'"]
+        params = []
+        if worker is not None:
+            conditions.append('worker = ?')
+            params.append(worker)
+        if older_than is not None:
+            conditions.append('claimed_at < ?')
+            params.append(time.time() - older_than)
+
+        with self.connection:
+            cursor = self.connection.execute(
+                f"UPDATE tasks SET status = 'pending', worker = NULL "
+                f"WHERE {' AND '.join(conditions)}", params
+            )
+        return cursor.rowcount
+
+    def counts(self):
+        """Get the number of tasks with each status."""
+        rows = self.connection.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status')
+        return dict(rows.fetchall())
+
+    def is_drained(self):
+        """True if there are no pending or claimed tasks left."""
+        counts = self.counts()
+        return not counts.get('pending') and not counts.get('claimed')
+
+    def close(self):
+        self.connection.close()
+
+
+class CrawlWorker(object):
+    """Processes tasks from a WorkQueue, writing the results to a ResourceStore.
+
+    Each kind of task may create more tasks: a channel adds its uploads playlist to the queue,
+    playlists and searches add batches of (up to 50) video ids.
+
+    Progress through the pages of playlists and searches is checkpointed to the store every
+    `checkpoint_every` pages, so a task which fails part way through (or whose worker dies)
+    carries on from its last checkpoint when it's retried.  The worker's claim on the task is
+    renewed after each page.
+
+    """
+
+    def __init__(self, youtube, queue, store, name, shard=None, video_parts=None,
+                 max_attempts=3, checkpoint_every=1):
+        self.youtube = youtube
+        self.queue = queue
+        self.store = store
+        self.name = name
+        self.shard = shard
+        self.video_parts = video_parts or 'snippet,contentDetails,statistics'
+        self.max_attempts = max_attempts
+        self.checkpoint_every = checkpoint_every
+
+        # task being worked on, whose claim is renewed as we go
+        self._task = None
+
+        self.handlers = {
+            'channel': self.crawl_channel,
+            'playlist': self.crawl_playlist,
+            'search': self.crawl_search,
+            'videos': self.crawl_videos,
+        }
+
+    def __repr__(self):
+        return f"<CrawlWorker '{self.name}'>"
+
+    def run(self, poll_interval=1.0):
+        """Process tasks until the queue is drained."""
+        while True:
+            task = self.queue.claim(self.name, shard=self.shard)
+            if task is None:
+                if self.queue.is_drained():
+                    return
+                # other workers are busy and may yet add more tasks
+                time.sleep(poll_interval)
+                continue
+
+            self._task = task
+            try:
+                with request_priority(BULK):
+                    self.handlers[task.kind](task.value)
+            except LeaseLost:
+                log.warning(f"worker {self.name} lost its claim on {task.kind} task "
+                            f"'{task.value}' to another worker, leaving it")
+            except Exception as error:
+                log.exception(f"worker {self.name} failed on {task.kind} task '{task.value}'")
+                self.queue.fail(task, error, max_attempts=self.max_attempts)
+            else:
+                self.queue.complete(task)
+            finally:
+                self._task = None
+
+    def _pages(self, query, name):
+        """Page through a query, starting from its checkpoint if there is one.
+
+        The checkpoint (see `ListResponse.checkpoint()`) is saved once each page has been dealt
+        with, and deleted when the query is finished.
+
+        :return: generator of lists of Resources, a page at a time
+        :raises LeaseLost: if the task has been given to another worker in the meantime
+        """
+        response = ListResponse(query).checkpoint(self.store, name, every=self.checkpoint_every)
+        for page in response.by_page():
+            yield page
+            if self._task is not None and not self.queue.renew(self._task, self.name):
+                raise LeaseLost(f"lost the claim on '{name}'")
+
+        self.store.delete_cursor(name)
+
+    def _queue_videos(self, video_ids):
+        self.queue.put('videos', (','.join(chunk) for chunk in iterate_chunks(video_ids, 50)))
+
+    def crawl_channel(self, channel_id):
+        raw = Query(self.youtube, 'channels', {
+            'part': 'id,snippet,contentDetails,statistics',
+            'id': channel_id,
+        }).execute()
+        self.store.upsert(raw['items'])
+
+        for item in raw['items']:
+            uploads = item.get('contentDetails', {}).get('relatedPlaylists', {}).get('uploads')
+            if uploads:
+                self.queue.put('playlist', [uploads])
+
+    def crawl_playlist(self, playlist_id):
+        query = Query(self.youtube, 'playlist_items', {
+            'part': 'id,snippet,contentDetails',
+            'playlistId': playlist_id,
+            'maxResults': 50,
+        })
+        for items in self._pages(query, f'crawl:playlist:{playlist_id}'):
+            self.store.upsert(items)
+            self._queue_videos([item.resource_video_id for item in items])
+
+    def crawl_search(self, params_json):
+        api_params = {'part': 'id', 'maxResults': 50}
+        api_params.update(json.loads(params_json))
+
+        query = Query(self.youtube, 'search', api_params)
+        for results in self._pages(query, f'crawl:search:{params_json}'):
+            self._queue_videos([result.id for result in results if isinstance(result, Video)])
+
+    def crawl_videos(self, video_ids):
+        raw = Query(self.youtube, 'videos', {
+            'part': f'id,{self.video_parts}',
+            'id': video_ids,
+        }).execute()
+        self.store.upsert(raw['items'])
+
+
+def _worker_main(name, shard, n_shards, queue_path, store_path, youtube_kwargs, worker_kwargs):
+    """Entry point for crawler worker processes."""
+    queue = WorkQueue(queue_path, n_shards=n_shards)
+    store = ResourceStore(store_path)
+    youtube = YouTube(**youtube_kwargs)
+
+    CrawlWorker(youtube, queue, store, name, shard=shard, **worker_kwargs).run()
+
+    queue.close()
+    store.close()
+
+
+class Crawler(object):
+    """Runs a crawl over a pool of worker processes.
+
+    Seeds (channel ids, playlist ids, search parameters or video ids) are added to a durable
+    WorkQueue.  Each worker process has its own YouTube client and works through the queue,
+    writing results to a shared ResourceStore.  Since all state lives in the queue database, a
+    crawl that's interrupted can be resumed by running it again with the same queue path.
+
+    A worker process that dies has its claimed tasks put back in the queue and is restarted.
+
+    """
+
+    def __init__(self, queue_path, store_path, n_workers=None, youtube_kwargs=None,
+                 video_parts=None, lease_timeout=600, max_attempts=3, max_restarts=3,
+                 checkpoint_every=1):
+        """Initialise the crawler.
+
+        :param queue_path: path of the sqlite database for the work queue
+        :param store_path: path of the sqlite database for the results
+        :param n_workers: number of worker processes (default: number of cpus)
+        :param youtube_kwargs: keyword arguments for the YouTube instance of each worker
+        :param video_parts: comma separated parts to fetch for videos
+        :param lease_timeout: tasks whose worker hasn't renewed its claim for this long (in
+            seconds) are assumed lost and are put back in the queue.  workers renew their claim
+            after each page of a playlist or search.
+        :param max_attempts: number of times to try a task before marking it failed
+        :param max_restarts: number of times a worker which dies is restarted
+        :param checkpoint_every: no. of pages of a playlist or search between checkpoints
+
+        """
+        self.queue_path = queue_path
+        self.store_path = store_path
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.youtube_kwargs = youtube_kwargs or dict()
+        self.lease_timeout = lease_timeout
+        self.max_restarts = max_restarts
+        self.worker_kwargs = {
+            'video_parts': video_parts,
+            'max_attempts': max_attempts,
+            'checkpoint_every': checkpoint_every,
+        }
+
+        self.queue = WorkQueue(queue_path, n_shards=self.n_workers)
+
+    def __repr__(self):
+        return f"<Crawler n_workers={self.n_workers} queue='{self.queue_path}'>"
+
+    def seed(self, channels=(), playlists=(), searches=(), videos=()):
+        """Add seeds to the work queue.
+
+        :param channels: iterable of channel ids
+        :param playlists: iterable of playlist ids
+        :param searches: iterable of dictionaries of search api parameters
+        :param videos: iterable of video ids
+
+        """
+        self.queue.put('channel', channels)
+        self.queue.put('playlist', playlists)
+        self.queue.put('search', (json.dumps(params, sort_keys=True) for params in searches))
+        self.queue.put('videos', (','.join(chunk) for chunk in iterate_chunks(videos, 50)))
+
+    def _start_worker(self, i):
+        name = f"worker-{i}"
+        process = multiprocessing.Process(
+            target=_worker_main,
+            name=name,
+            args=(name, i, self.n_workers, self.queue_path, self.store_path,
+                  self.youtube_kwargs, self.worker_kwargs),
+        )
+        process.start()
+        return process
+
+    def run(self, poll_interval=1.0):
+        """Run the crawl until the queue is drained.
+
+        :return: dictionary giving the number of tasks with each status
+        """
+        # anything claimed by a previous run is lost
+        requeued = self.queue.requeue()
+        if requeued:
+            log.info(f"requeued {requeued} tasks left over from a previous run")
+
+        processes = {i: self._start_worker(i) for i in range(self.n_workers)}
+        n_restarts = 0
+
+        while processes:
+            time.sleep(poll_interval)
+            self.queue.requeue(older_than=self.lease_timeout)
+
+            for i, process in list(processes.items()):
+                if process.is_alive():
+                    continue
+
+                process.join()
+                del processes[i]
+                if process.exitcode != 0:
+                    requeued = self.queue.requeue(worker=process.name)
+                    log.warning(f"{process.name} died (exit code {process.exitcode}), "
+                                f"requeued {requeued} tasks")
+                    if n_restarts < self.max_restarts:
+                        n_restarts += 1
+                        processes[i] = self._start_worker(i)
+
+                elif not self.queue.is_drained():
+                    # the worker ran out of tasks just before more were added
+                    processes[i] = self._start_worker(i)
+
+        return self.queue.counts()
@@ -0,0 +1,455 @@
+import os
+import json
+import stat
+import time
+import queue
+import socket
+import logging
+import tempfile
+import threading
+import itertools
+import collections
+import socketserver
+
+from .youtube import YouTube, Query
+from .quota import QuotaExhausted
+from .utils import SingleFlight, normalise_api_params
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+def default_socket_path():
+    """Get the default path of the daemon's socket, in a directory private to the current user.
+
+    The directory (which the daemon creates, with mode 0700) is in $XDG_RUNTIME_DIR if it's set,
+    or else the temp directory.
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, f'pytaw-{os.getuid()}', 'daemon.sock')
+
+
+class DaemonError(Exception):
+    """Exception raised if the daemon can't be reached, or a request to it fails."""
+    pass
+
+
+def check_socket_path(path):
+    """Check that nobody else can have put a socket at `path`, or could replace ours.
+
+    The socket's directory must belong to the current user, or to root and be sticky (like /tmp)
+    so that other users can't remove our files from it.  If there's already something at the
+    path, it must belong to the current user too.
+
+    :raises DaemonError: if the path isn't safe to use
+    """
+    uid = os.getuid()
+    directory = os.path.dirname(os.path.abspath(path))
+    info = os.stat(directory)
+    if info.st_uid != uid and not (info.st_uid == 0 and info.st_mode & stat.S_ISVTX):
+        raise DaemonError(f"refusing to use {path}, since another user owns {directory}")
+    try:
+        info = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if info.st_uid != uid:
+        raise DaemonError(f"refusing to use {path}, since it belongs to another user")
+
+
+class ResponseCache(object):
+    """An LRU cache of raw api responses, each kept for a limited time."""
+
+    def __init__(self, max_entries=10000, ttl=300):
+        """Initialise the cache.
+
+        :param max_entries: maximum number of responses kept
+        :param ttl: seconds a response is kept for (0 to cache nothing)
+
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self.n_hits = 0
+        self.n_misses = 0
+
+        self._entries = collections.OrderedDict()       # key -> (expires at, response)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<ResponseCache n={len(self)} hits={self.n_hits} misses={self.n_misses}>"
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                self._entries.pop(key, None)
+                self.n_misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.n_hits += 1
+            return entry[1]
+
+    def put(self, key, response, now=None):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[key] = (now + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Handles a client connection: one JSON request per line, one JSON response per line."""
+
+    def handle(self):
+        daemon = self.server.pytaw_daemon
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                request_id = request.get('id')
+            except ValueError:
+                request, request_id = None, None
+
+            if request is None:
+                response = {'id': None, 'error': {'type': 'DaemonError',
+                                                  'message': "request isn't valid json"}}
+            else:
+                response = daemon.handle(request)
+                response['id'] = request_id
+
+            self.wfile.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Daemon(object):
+    """A long-lived process holding a YouTube client, which scripts share over a unix socket.
+
+    Each script that builds its own YouTube instance pays for the client's startup, and has its
+    own connections, cache and view of the quota.  Instead, a daemon holds one client - with its
+    developer keys (and their quota ledger), connection pool and any rate limiting Scheduler -
+    and scripts use a RemoteYouTube, which has the same interface but sends each query through
+    the daemon:
+
+        $ pytaw daemon &
+
+        >>> youtube = RemoteYouTube()
+        >>> video = youtube.video('jNQXAC9IVRw')
+
+    Responses are cached for `cache_ttl` seconds, so scripts asking for the same things get a
+    warm cache, and identical queries in flight from different scripts at once are sent once.
+
+    The protocol is JSON lines: each request is a line like
+        {"id": 1, "method": "execute", "params": {"endpoint": "videos", "api_params": {...}}}
+    answered by a line with the same id and either a "result" or an "error".  Methods are
+    'execute' (with an optional "priority" param), 'status' and 'ping'.
+
+    """
+
+    def __init__(self, youtube, path=None, cache_ttl=300, cache_size=10000):
+        """Initialise the daemon.
+
+        :param youtube: YouTube instance to send queries with
+        :param path: path of the unix socket to listen on (default: `default_socket_path()`)
+        :param cache_ttl: seconds to cache responses for (0 to not cache them)
+        :param cache_size: maximum number of responses to cache
+
+        """
+        self.youtube = youtube
+        self.path = path or default_socket_path()
+        self.cache = ResponseCache(max_entries=cache_size, ttl=cache_ttl)
+
+        self.n_requests = 0
+        self.started_at = None
+
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Daemon path={self.path} n_requests={self.n_requests}>"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _listen(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700)
+        check_socket_path(self.path)
+
+        # a socket file left behind by a daemon that died is in the way, but one that's still
+        # being listened on means another daemon is running
+        if os.path.exists(self.path):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                    s.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise DaemonError(f"a daemon is already listening at {self.path}")
+
+        # create the socket with only the owner able to connect, rather than tightening its
+        # permissions after it's been bound
+        umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        self._server.pytaw_daemon = self
+        self.started_at = time.time()
+        log.info(f"listening at {self.path}")
+
+    def serve_forever(self):
+        """Serve requests until `stop()` is called (e.g. from a signal handler)."""
+        if self._server is None:
+            self._listen()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._close()
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self._listen()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is None:
+            return
+        if self._thread is None:
+            # serve_forever() is running in another thread, and will close the server itself
+            threading.Thread(target=self._server.shutdown).start()
+            return
+        self._server.shutdown()
+        self._thread.join()
+        self._thread = None
+        self._close()
+
+    def _close(self):
+        self._server.server_close()
+        self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def handle(self, request):
+        """Handle a request.
+
+        :param request: request dictionary (see the class docstring)
+        :return: response dictionary, with a 'result' or an 'error'
+        """
+        method, params = request.get('method'), request.get('params') or {}
+        try:
+            if method == 'execute':
+                return {'result': self.execute(**params)}
+            elif method == 'status':
+                return {'result': self.status()}
+            elif method == 'ping':
+                return {'result': 'pong'}
+            raise DaemonError(f"unknown method '{method}'")
+        except Exception as error:
+            if not isinstance(error, (DaemonError, QuotaExhausted)):
+                log.warning(f"{method} request failed: {error!r}")
+            return {'error': _error_dictionary(error)}
+
+    def execute(self, endpoint, api_params, priority=None):
+        """Execute a query, or get its response from the cache."""
+        with self._lock:
+            self.n_requests += 1
+
+        query = Query(self.youtube, endpoint, api_params, priority=priority)
+        key = (endpoint, normalise_api_params(query.api_params))
+        response = self.cache.get(key)
+        if response is None:
+            response = query.execute()
+            self.cache.put(key, response)
+        return response
+
+    def status(self):
+        """Get the daemon's request, cache and quota counts."""
+        key_pool = self.youtube.key_pool
+        return {
+            'uptime': time.time() - self.started_at if self.started_at else 0.0,
+            'n_requests': self.n_requests,
+            'n_coalesced': self.youtube.single_flight.n_coalesced,
+            'cache': {'size': len(self.cache), 'n_hits': self.cache.n_hits,
+                      'n_misses': self.cache.n_misses},
+            'quota_remaining': key_pool.remaining if key_pool is not None else None,
+        }
+
+
+def _error_dictionary(error):
+    """Describe an exception so it can be raised again by the client."""
+    description = {'type': type(error).__name__, 'message': str(error)}
+    response = getattr(error, 'resp', None)
+    if response is not None:
+        # a googleapiclient HttpError
+        description['status'] = response.status
+        content = error.content
+        description['content'] = content.decode('utf-8', 'replace') \
+            if isinstance(content, bytes) else content
+        description['uri'] = getattr(error, 'uri', None)
+    return description
+
+
+def _raise_error(description):
+    """Raise the exception described by `_error_dictionary()`."""
+    error_type, message = description.get('type'), description.get('message')
+    if error_type == 'QuotaExhausted':
+        raise QuotaExhausted(message)
+    if 'status' in description:
+        # raise it as an HttpError, so callers can handle it just as if they'd sent the request
+        import httplib2
+        from googleapiclient.errors import HttpError
+        response = httplib2.Response({'status': description['status']})
+        raise HttpError(response, description['content'].encode(), uri=description.get('uri'))
+    raise DaemonError(f"{error_type}: {message}")
+
+
+class DaemonClient(object):
+    """Sends requests to a Daemon, over a pool of connections to its socket."""
+
+    def __init__(self, path=None, max_connections=10, timeout=None):
+        """Initialise the client.  No connection is made until the first request.
+
+        :param path: path of the daemon's socket (default: `default_socket_path()`)
+        :param max_connections: maximum number of connections open at once
+        :param timeout: socket timeout in seconds (default: wait as long as it takes)
+
+        """
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._ids = itertools.count(1)
+
+    def __repr__(self):
+        return f"<DaemonClient path={self.path}>"
+
+    def _connect(self):
+        if os.path.exists(self.path):
+            check_socket_path(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as error:
+            sock.close()
+            raise DaemonError(f"can't connect to a daemon at {self.path} ({error}).  is it "
+                              f"running? (start one with `pytaw daemon`)") from None
+        return sock, sock.makefile('rb')
+
+    def call(self, method, **params):
+        """Send a request to the daemon.
+
+        :return: the request's result
+        :raises: the request's error, if it failed
+        """
+        request_id = next(self._ids)
+        line = json.dumps({'id': request_id, 'method': method, 'params': params},
+                          separators=(',', ':')).encode() + b'\n'
+
+        self._slots.acquire()
+        try:
+            # idle connections may have been closed by a daemon restart.  if sending over one
+            # fails, the rest are probably stale too, so drop them and use a new connection.
+            fresh = False
+            while True:
+                connection = None
+                if not fresh:
+                    try:
+                        connection = self._idle.get_nowait()
+                    except queue.Empty:
+                        pass
+                reused = connection is not None
+                if not reused:
+                    connection = self._connect()
+
+                sock, reader = connection
+                try:
+                    sock.sendall(line)
+                    response = reader.readline()
+                except OSError:
+                    response = b''
+                if response.endswith(b'\n'):
+                    break
+                sock.close()
+                if not reused:
+                    raise DaemonError(f"lost connection to the daemon at {self.path}")
+                self.close()
+                fresh = True
+
+            self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+        response = json.loads(response)
+        if 'error' in response:
+            _raise_error(response['error'])
+        return response['result']
+
+    def execute(self, endpoint, api_params, priority=None):
+        return self.call('execute', endpoint=endpoint, api_params=api_params, priority=priority)
+
+    def status(self):
+        return self.call('status')
+
+    def ping(self):
+        return self.call('ping') == 'pong'
+
+    def close(self):
+        while True:
+            try:
+                sock, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            sock.close()
+
+
+class RemoteYouTube(YouTube):
+    """A YouTube instance which sends its queries through a Daemon.
+
+    It has the same interface as YouTube, but is almost free to create: there's no api client to
+    build, since the daemon holds it (along with the developer keys, caches and quota ledger).
+
+    """
+
+    def __init__(self, path=None, max_connections=10, timeout=None):
+        """Initialise the instance.
+
+        :param path: path of the daemon's socket (default: `default_socket_path()`)
+        :param max_connections: maximum number of connections to the daemon at once
+        :param timeout: socket timeout in seconds
+
+        """
+        # deliberately not calling YouTube.__init__(), which builds an api client
+        self.remote = DaemonClient(path, max_connections=max_connections, timeout=timeout)
+        self.key_pool = None
+        self.builds = {}
+        self.build = None
+        self.http_pool = None
+        self.single_flight = SingleFlight()
+        self.scheduler = None
+
+    def __repr__(self):
+        return f"<RemoteYouTube path={self.remote.path}>"
+
+    def status(self):
+        """Get the daemon's request, cache and quota counts."""
+        return self.remote.status()
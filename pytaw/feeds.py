@@ -0,0 +1,257 @@
+import logging
+import threading
+import collections
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+
+from .transport import HttpPool
+from .youtube import Video, hydrate_resources
+from .utils import string_to_datetime
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+# public atom feed of a channel's latest uploads (the 15 most recent)
+FEED_URL = 'https://www.youtube.com/feeds/videos.xml?channel_id={}'
+FEED_SIZE = 15
+
+NAMESPACES = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'yt': 'http://www.youtube.com/xml/schemas/2015',
+    'media': 'http://search.yahoo.com/mrss/',
+    'at': 'http://purl.org/atompub/tombstones/1.0',
+}
+
+AtomEntry = collections.namedtuple('AtomEntry', [
+    'video_id', 'channel_id', 'channel_title', 'title', 'description', 'thumbnails',
+    'published_at', 'updated_at', 'deleted',
+])
+
+FeedResult = collections.namedtuple('FeedResult', ['channel_id', 'videos', 'status'])
+
+
+class FeedError(Exception):
+    """Exception raised if a channel's feed can't be read."""
+    pass
+
+
+def parse_atom(body):
+    """Parse the entries of a youtube atom feed, or of a WebSub notification (which is an atom
+    feed of the new or changed entries).
+
+    :param body: feed xml, as bytes or a string
+    :return: list of AtomEntry tuples, in the order given (newest first, for a feed).  thumbnails
+        are in the same form as in the api, e.g. {'high': {'url': ..., 'width': 480, ...}}.
+        deleted videos have `deleted` set, and only their video id, channel id and the time of
+        deletion (as updated_at).
+
+    """
+    root = ElementTree.fromstring(body)
+    entries = []
+
+    for entry in root.iterfind('atom:entry', NAMESPACES):
+        thumbnails = {}
+        thumbnail = entry.find('media:group/media:thumbnail', NAMESPACES)
+        if thumbnail is not None:
+            thumbnails['high'] = {
+                'url': thumbnail.get('url'),
+                'width': int(thumbnail.get('width', 0)) or None,
+                'height': int(thumbnail.get('height', 0)) or None,
+            }
+
+        entries.append(AtomEntry(
+            video_id=entry.findtext('yt:videoId', None, NAMESPACES),
+            channel_id=entry.findtext('yt:channelId', None, NAMESPACES),
+            channel_title=entry.findtext('atom:author/atom:name', None, NAMESPACES),
+            title=entry.findtext('atom:title', None, NAMESPACES),
+            description=entry.findtext('media:group/media:description', None, NAMESPACES),
+            thumbnails=thumbnails,
+            published_at=string_to_datetime(entry.findtext('atom:published', None, NAMESPACES)),
+            updated_at=string_to_datetime(entry.findtext('atom:updated', None, NAMESPACES)),
+            deleted=False,
+        ))
+
+    for entry in root.iterfind('at:deleted-entry', NAMESPACES):
+        # the ref is 'yt:video:<id>', and the channel is only given as a url
+        channel_url = entry.findtext('at:by/atom:uri', '', NAMESPACES)
+        entries.append(AtomEntry(
+            video_id=entry.get('ref', '').rpartition(':')[2] or None,
+            channel_id=channel_url.rstrip('/').rpartition('/')[2] or None,
+            channel_title=entry.findtext('at:by/atom:name', None, NAMESPACES),
+            title=None,
+            description=None,
+            thumbnails={},
+            published_at=None,
+            updated_at=string_to_datetime(entry.get('when')),
+            deleted=True,
+        ))
+
+    return [entry for entry in entries if entry.video_id]
+
+
+def video_from_entry(youtube, entry):
+    """Create a Video stub from a feed entry.
+
+    The entry's data is given to the Video as if it were a search result, so the title,
+    published_at etc. are there straight away, and anything else is fetched when it's first
+    used (or in batches, with `hydrate_resources()`).
+
+    :param youtube: YouTube instance to attach the video to
+    :param entry: AtomEntry
+    :return: Video
+
+    """
+    snippet = {
+        'title': entry.title,
+        'description': entry.description or '',
+        'channelId': entry.channel_id,
+        'channelTitle': entry.channel_title,
+        'publishedAt': entry.published_at.isoformat() if entry.published_at else None,
+        'thumbnails': entry.thumbnails,
+    }
+    data = {
+        'kind': 'youtube#searchResult',
+        'id': {'kind': 'youtube#video', 'videoId': entry.video_id},
+        'snippet': {k: v for k, v in snippet.items() if v is not None},
+    }
+    return Video(youtube, entry.video_id, data)
+
+
+class FeedReader(object):
+    """Reads channels' latest uploads from their public atom feeds, without using any quota.
+
+    Each channel's feed has its 15 most recent uploads, with their titles, descriptions and
+    publish times - so checking for new uploads this way is free, where `search` costs 100
+    units a time.  Feeds for many channels are fetched concurrently.  The validators (etag, last
+    modified) and entries of each feed are remembered, so reading it again is a conditional GET,
+    which is cheap if nothing has changed.
+
+        >>> reader = FeedReader(youtube)
+        >>> for result in reader.read(channel_ids):
+        ...     print(result.channel_id, [video.title for video in result.videos])
+
+    Videos are stubs with only their feed data (see `video_from_entry()`).  Use `hydrate()` to
+    fetch more data for many of them at once.
+
+    """
+
+    def __init__(self, youtube=None, max_workers=16, timeout=30, feed_url=None):
+        """Initialise the reader.
+
+        :param youtube: YouTube instance to attach videos to, and hydrate them with
+        :param max_workers: maximum number of feeds fetched at once
+        :param timeout: socket timeout in seconds
+        :param feed_url: feed url, with '{}' in place of the channel id (default: FEED_URL)
+
+        """
+        self.youtube = youtube
+        self.max_workers = max_workers
+        self.feed_url = feed_url or FEED_URL
+
+        self.n_requests = 0
+        self.n_not_modified = 0
+        self.n_failed = 0
+
+        self.http_pool = HttpPool(max_connections=max_workers, timeout=timeout)
+        self._feeds = {}        # channel id -> (etag, last modified, entries)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<FeedReader n_feeds={len(self._feeds)} n_requests={self.n_requests}>"
+
+    def read(self, channel_ids):
+        """Read the feeds of channels.
+
+        :param channel_ids: iterable of channel ids
+        :return: generator of FeedResult tuples, in the order the channels were given.  status
+            is 'fetched', 'not_modified' or 'failed' (in which case videos is empty).
+
+        """
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+
+        def read_one(channel_id):
+            try:
+                return self._read(channel_id)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = collections.deque()
+            for channel_id in channel_ids:
+                # limit the number of submitted requests so we don't hold the whole input
+                slots.acquire()
+                in_flight.append(executor.submit(read_one, channel_id))
+
+                while in_flight and in_flight[0].done():
+                    yield in_flight.popleft().result()
+
+            for future in in_flight:
+                yield future.result()
+
+    def recent_uploads(self, channel_id, n=FEED_SIZE):
+        """Get a channel's most recent uploads (at most 15).
+
+        :return: list of Video stubs, newest first
+        :raises FeedError: if the feed couldn't be read (the reason is logged)
+        """
+        if n > FEED_SIZE:
+            raise ValueError(f"n must be at most {FEED_SIZE}, not {n}")
+        result = self._read(channel_id)
+        if result.status == 'failed':
+            raise FeedError(f"couldn't read the feed of channel {channel_id}")
+        return result.videos[:n]
+
+    def _read(self, channel_id):
+        url = self.feed_url.format(channel_id)
+        with self._lock:
+            known = self._feeds.get(channel_id)
+
+        headers = {}
+        if known is not None:
+            etag, last_modified, _ = known
+            if etag:
+                headers['if-none-match'] = etag
+            if last_modified:
+                headers['if-modified-since'] = last_modified
+
+        try:
+            with self.http_pool.connection() as http:
+                response, content = http.request(url, 'GET', headers=headers)
+        except Exception as error:
+            log.warning(f"failed to read feed of {channel_id}: {error}")
+            return self._result(channel_id, None, 'failed')
+
+        if response.status == 304 and known is not None:
+            return self._result(channel_id, known[2], 'not_modified')
+
+        if response.status != 200:
+            log.warning(f"failed to read feed of {channel_id}: http status {response.status}")
+            return self._result(channel_id, None, 'failed')
+
+        try:
+            entries = [e for e in parse_atom(content) if not e.deleted]
+        except ElementTree.ParseError as error:
+            log.warning(f"failed to parse feed of {channel_id}: {error}")
+            return self._result(channel_id, None, 'failed')
+
+        with self._lock:
+            self._feeds[channel_id] = (response.get('etag'), response.get('last-modified'),
+                                       entries)
+        return self._result(channel_id, entries, 'fetched')
+
+    def _result(self, channel_id, entries, status):
+        with self._lock:
+            self.n_requests += 1
+            if status == 'not_modified':
+                self.n_not_modified += 1
+            elif status == 'failed':
+                self.n_failed += 1
+
+        videos = [video_from_entry(self.youtube, entry) for entry in entries or ()]
+        return FeedResult(channel_id, videos, status)
+
+    def hydrate(self, videos, parts='snippet,contentDetails,statistics'):
+        """Fetch full data for video stubs, 50 at a time (see `hydrate_resources()`)."""
+        return hydrate_resources(self.youtube, videos, parts)
@@ -0,0 +1,323 @@
+import math
+import hashlib
+import logging
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .youtube import Query
+from .quota import QuotaBudget, quota_cost
+from .scheduler import BULK, request_priority
+from .utils import iterate_chunks
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+# resources are fetched this many at a time (the most the api gives per request)
+BATCH_SIZE = 50
+
+# kinds of node in the graph, and the endpoint each is fetched from by id
+NODE_ENDPOINTS = {
+    'channel': 'channels',
+    'playlist': 'playlists',
+    'video': 'videos',
+}
+
+# parts needed to find each kind of node's edges
+EDGE_PARTS = {
+    'channel': 'snippet,contentDetails',
+    'playlist': 'snippet',
+    'video': 'snippet',
+}
+
+# a node, with its raw api item
+Node = collections.namedtuple('Node', ['kind', 'id', 'depth', 'item'])
+
+# an edge between two nodes, each given as a (kind, id) tuple.  relations are:
+#   'uploads'       channel -> its uploads playlist
+#   'playlist'      channel -> one of its other playlists (if listed, see `GraphCrawler`)
+#   'owned_by'      playlist -> the channel that made it
+#   'contains'      playlist -> a video in it
+#   'uploaded_by'   video -> the channel that uploaded it
+Edge = collections.namedtuple('Edge', ['source', 'relation', 'target'])
+
+
+class VisitedSet(object):
+    """A set of the nodes a crawl has visited, as a bloom filter.
+
+    Remembering a node takes a few bytes (about 29 bits at the default error rate) rather than
+    the hundred or so of a string in a python set, so millions of nodes fit in a few megabytes.
+    The price is that, rarely, a node which hasn't been visited is taken to have been: at most
+    `error_rate` of the time while there are fewer than `capacity` nodes, and more often after.
+
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=1e-6):
+        """Initialise the set.
+
+        :param capacity: number of nodes expected
+        :param error_rate: chance of a node being wrongly taken to be in the set, with `capacity`
+            nodes in it
+
+        """
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        self.n_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.n_bits + 7) // 8)
+        self._length = 0
+
+    def __repr__(self):
+        return f"<VisitedSet n={self._length} capacity={self.capacity} " \
+               f"size={len(self._bits)} bytes>"
+
+    def __len__(self):
+        # the number of keys added which weren't (thought to be) in the set already
+        return self._length
+
+    def _positions(self, key):
+        # double hashing: k positions from two 64-bit hashes
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        bits = self._bits
+        added = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                added = True
+        if added:
+            self._length += 1
+            if self._length == self.capacity + 1:
+                log.warning(f"{self} is over capacity, so will wrongly skip more nodes")
+
+
+class GraphCrawler(object):
+    """Walks the graph of channels, playlists and videos breadth first.
+
+    Starting from some seed nodes, each level of the graph is resolved in one go: the nodes of
+    each kind are fetched 50 at a time, and playlists' items are listed page by page, all with
+    several requests in flight.  That gives the edges out of the level (see `Edge`), and the
+    nodes at the other end which haven't been visited make up the next level.
+
+        >>> crawler = GraphCrawler(youtube, max_depth=3, quota_budget=5000)
+        >>> for thing in crawler.crawl(channels=['UCGm3CO6LPcN-Y7HIuyE0Rew']):
+        ...     if isinstance(thing, Edge):
+        ...         print(thing.source, thing.relation, thing.target)
+
+    Nodes and edges are generated as each request completes.  Nodes have the depth they were
+    found at (seeds are at depth 0), and the crawl stops after `max_depth`, so edges out of the
+    last level lead to nodes which are never generated themselves.  Nodes which aren't found (e.g.
+    private videos) aren't generated either.
+
+    """
+
+    def __init__(self, youtube, max_depth=2, quota_budget=None, max_workers=8,
+                 max_playlist_items=None, channel_playlists=False, video_parts='snippet',
+                 visited=None):
+        """Initialise the crawler.
+
+        :param youtube: YouTube instance
+        :param max_depth: depth of the last level to resolve
+        :param quota_budget: maximum number of quota units to use (default: no limit).  when it
+            runs out, requests that haven't been sent aren't, and the crawl ends with the level
+            it's on.
+        :param max_workers: maximum number of requests at once
+        :param max_playlist_items: maximum number of videos to follow from each playlist
+        :param channel_playlists: list each channel's playlists (as well as its uploads), at a
+            request per 50 playlists
+        :param video_parts: parts to fetch for videos (snippet is always fetched)
+        :param visited: set of the '<kind>:<id>' keys of nodes visited (default: a VisitedSet).
+            nodes in it aren't crawled, so giving the set from one crawl to another carries on
+            where it left off.  a node is only added once it's been fully resolved, so nodes
+            past `max_depth`, or left out when the budget ran out or a request failed, are
+            crawled next time.
+
+        """
+        self.youtube = youtube
+        self.max_depth = max_depth
+        self.budget = QuotaBudget(quota_budget) if quota_budget is not None else None
+        self.max_workers = max_workers
+        self.max_playlist_items = max_playlist_items
+        self.channel_playlists = channel_playlists
+        self.parts = dict(EDGE_PARTS, video=','.join(dict.fromkeys(
+            ['snippet'] + video_parts.split(','))))
+        self.visited = VisitedSet() if visited is None else visited
+
+        self.n_requests = 0
+        self.n_nodes = 0
+        self.n_edges = 0
+        self.n_failed = 0
+        self.budget_exhausted = False
+
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<GraphCrawler nodes={self.n_nodes} edges={self.n_edges} " \
+               f"requests={self.n_requests}>"
+
+    def crawl(self, channels=(), playlists=(), videos=()):
+        """Crawl the graph from seed nodes.
+
+        :param channels: iterable of channel ids
+        :param playlists: iterable of playlist ids
+        :param videos: iterable of video ids
+        :return: generator of Node and Edge tuples
+        """
+        # nodes found in this crawl (resolved or not), so each is only queued once
+        pending = set()
+
+        frontier = {kind: [] for kind in NODE_ENDPOINTS}
+        for kind, ids in (('channel', channels), ('playlist', playlists), ('video', videos)):
+            for id in ids:
+                self._queue(kind, id, frontier, pending)
+
+        depth = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while depth <= self.max_depth and any(frontier.values()):
+                if self.budget_exhausted:
+                    break
+                log.debug(f"resolving level {depth}: "
+                          f"{ {kind: len(ids) for kind, ids in frontier.items()} }")
+                next_frontier = {kind: [] for kind in NODE_ENDPOINTS}
+
+                # number of requests each node needs to be fully resolved
+                n_tasks = {'channel': 2 if self.channel_playlists else 1, 'playlist': 2,
+                           'video': 1}
+                remaining = {f'{kind}:{id}': n_tasks[kind]
+                             for kind, ids in frontier.items() for id in ids}
+
+                for future in as_completed(self._submit_level(executor, frontier)):
+                    nodes, edges, done = future.result()
+                    for kind, item in nodes:
+                        self.n_nodes += 1
+                        yield Node(kind, item['id'], depth, item)
+                    for edge in edges:
+                        self.n_edges += 1
+                        yield edge
+                        self._queue(*edge.target, next_frontier, pending)
+                    for key in done:
+                        remaining[key] -= 1
+                        if remaining[key] == 0:
+                            self.visited.add(key)
+
+                frontier = next_frontier
+                depth += 1
+
+    def _queue(self, kind, id, frontier, pending):
+        key = f'{kind}:{id}'
+        if key not in pending and key not in self.visited:
+            pending.add(key)
+            frontier[kind].append(id)
+
+    def _submit_level(self, executor, frontier):
+        futures = []
+        for kind, ids in frontier.items():
+            for chunk in iterate_chunks(ids, BATCH_SIZE):
+                futures.append(executor.submit(self._resolve, kind, chunk))
+
+        for playlist_id in frontier['playlist']:
+            futures.append(executor.submit(self._list_playlist_items, playlist_id))
+        if self.channel_playlists:
+            for channel_id in frontier['channel']:
+                futures.append(executor.submit(self._list_channel_playlists, channel_id))
+        return futures
+
+    def _execute(self, endpoint, api_params):
+        """Send a request, if the budget allows.
+
+        :return: raw response, or None if the budget has run out or the request failed
+        """
+        if self.budget is not None and not self.budget.spend(quota_cost(endpoint)):
+            self.budget_exhausted = True
+            return None
+
+        with self._lock:
+            self.n_requests += 1
+        try:
+            with request_priority(BULK):
+                return Query(self.youtube, endpoint, api_params).execute()
+        except Exception as error:
+            log.warning(f"{endpoint} request failed: {error!r}")
+            with self._lock:
+                self.n_failed += 1
+            return None
+
+    def _pages(self, endpoint, api_params, max_items=None):
+        """Fetch the items of a list request, page by page.
+
+        :return: (items, complete) tuple, where complete is False if a request failed or the
+            budget ran out part way through
+        """
+        api_params = dict(api_params, maxResults=BATCH_SIZE)
+        items = []
+        while True:
+            raw = self._execute(endpoint, api_params)
+            if raw is None:
+                return items, False
+            items.extend(raw['items'])
+
+            if max_items is not None and len(items) >= max_items:
+                return items[:max_items], True
+            if not raw.get('nextPageToken'):
+                return items, True
+            api_params['pageToken'] = raw['nextPageToken']
+
+    def _resolve(self, kind, ids):
+        """Fetch a batch of nodes of one kind, and the edges their data gives.
+
+        :return: (nodes, edges, done) tuple, where nodes is a list of (kind, raw item) tuples and
+            done is a list of the keys of the nodes found
+        """
+        raw = self._execute(NODE_ENDPOINTS[kind], {
+            'part': f'id,{self.parts[kind]}',
+            'id': ','.join(ids),
+            'maxResults': BATCH_SIZE,
+        })
+        if raw is None:
+            return [], [], []
+
+        nodes, edges = [], []
+        for item in raw['items']:
+            nodes.append((kind, item))
+            source = (kind, item['id'])
+            snippet = item.get('snippet', {})
+            if kind == 'channel':
+                related = item.get('contentDetails', {}).get('relatedPlaylists', {})
+                if related.get('uploads'):
+                    edges.append(Edge(source, 'uploads', ('playlist', related['uploads'])))
+            elif kind == 'playlist' and snippet.get('channelId'):
+                edges.append(Edge(source, 'owned_by', ('channel', snippet['channelId'])))
+            elif kind == 'video' and snippet.get('channelId'):
+                edges.append(Edge(source, 'uploaded_by', ('channel', snippet['channelId'])))
+        return nodes, edges, [f"{kind}:{item['id']}" for _, item in nodes]
+
+    def _list_playlist_items(self, playlist_id):
+        """List the videos in a playlist, as edges."""
+        items, complete = self._pages(
+            'playlist_items', {'part': 'contentDetails', 'playlistId': playlist_id},
+            max_items=self.max_playlist_items,
+        )
+        edges = [Edge(('playlist', playlist_id), 'contains',
+                      ('video', item['contentDetails']['videoId'])) for item in items]
+        return [], edges, [f'playlist:{playlist_id}'] if complete else []
+
+    def _list_channel_playlists(self, channel_id):
+        """List a channel's playlists, as edges."""
+        items, complete = self._pages('playlists', {'part': 'id', 'channelId': channel_id})
+        edges = [Edge(('channel', channel_id), 'playlist', ('playlist', item['id']))
+                 for item in items]
+        return [], edges, [f'channel:{channel_id}'] if complete else []
@@ -0,0 +1,294 @@
+import re
+import math
+import heapq
+import logging
+import threading
+import collections
+from datetime import timezone
+
+from .youtube import resource_from_record
+from .store import record_from_item
+from .serialization import encode_resources, decode_resources
+from .utils import string_to_datetime
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# snippet fields which are indexed, and how much a match in each counts for
+FIELD_WEIGHTS = (
+    ('title', 3.0),
+    ('tags', 2.0),
+    ('channelTitle', 1.5),
+    ('description', 1.0),
+)
+
+# kinds of resource which are indexed
+KINDS = ('video', 'channel', 'playlist')
+
+
+def tokenize(text):
+    """Split text into lower case word tokens."""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def _timestamp(dt):
+    if dt.tzinfo is None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.timestamp()
+
+
+def _record(item):
+    """Get a resource record from a Resource or a raw api item (or None if it's not indexed)."""
+    record = record_from_item(item)
+    return record if record is not None and record[0] in KINDS else None
+
+
+class SearchIndex(object):
+    """An in-memory full text index of videos, channels and playlists, ranked with BM25.
+
+    Titles, tags, channel titles and descriptions are indexed (with matches in titles counting
+    the most), so searches of things we've already crawled can be answered locally, without
+    using any quota:
+
+        >>> index = SearchIndex.from_store(store, youtube=youtube)
+        >>> index.search('dead parrot', kind='video', published_after=datetime(2010, 1, 1))
+        [<Video 4vuW6tQ0218 "Monty Python ...">, ...]
+
+    Resources can be added (or updated) at any time.  Updates are merged part by part, so adding
+    a video's statistics doesn't lose its snippet.  Only each resource's record is kept (see
+    `Resource.to_record()`), and Resources are created for the results of each search.  Results
+    of recent searches are cached until the index next changes.
+
+    """
+
+    # bm25 parameters: term frequency saturation and document length normalisation
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, youtube=None, cache_size=1024):
+        """Initialise an empty index.
+
+        :param youtube: YouTube instance to attach the resources returned by searches to
+        :param cache_size: maximum number of search results to cache
+
+        """
+        self.youtube = youtube
+        self.cache_size = cache_size
+
+        self._doc_ids = {}          # (kind, id) -> doc id
+        self._records = []          # doc id -> resource record, or None if removed
+        self._filters = []          # doc id -> (kind, channel id, published timestamp)
+        self._terms = []            # doc id -> {term: weighted frequency}
+        self._lengths = []          # doc id -> weighted no. of tokens
+        self._postings = collections.defaultdict(dict)     # term -> {doc id: frequency}
+        self._total_length = 0.0
+        self._n_docs = 0
+
+        self._cache = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return f"<SearchIndex n={self._n_docs} terms={len(self._postings)}>"
+
+    def __len__(self):
+        return self._n_docs
+
+    def __contains__(self, key):
+        return key in self._doc_ids and self._records[self._doc_ids[key]] is not None
+
+    @classmethod
+    def from_store(cls, store, kinds=KINDS, youtube=None, **kwargs):
+        """Build an index of the resources in a ResourceStore."""
+        index = cls(youtube=youtube, **kwargs)
+        for kind in kinds:
+            index.add(store.query(kind))
+        return index
+
+    @classmethod
+    def load(cls, path, youtube=None, **kwargs):
+        """Build an index from a file written by `save()` (or by `encode_resources()`)."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        index = cls(youtube=youtube, **kwargs)
+        index.add(decode_resources(data))
+        return index
+
+    def save(self, path):
+        """Save the indexed resources to a file, as a batch encoded by `encode_resources()`."""
+        with self._lock:
+            resources = [resource_from_record(r) for r in self._records if r is not None]
+        with open(path, 'wb') as f:
+            f.write(encode_resources(resources))
+
+    def add(self, items):
+        """Add resources to the index, or update them if they're already there.
+
+        :param items: iterable of Resources and/or raw api items, or a raw api page
+        :return: number of resources added or updated
+
+        """
+        if isinstance(items, dict) and 'items' in items:
+            items = items['items']
+
+        n_added = 0
+        with self._lock:
+            for item in items:
+                if item is None:
+                    continue
+                record = _record(item)
+                if record is not None:
+                    self._add_record(record)
+                    n_added += 1
+            if n_added:
+                self._cache.clear()
+        return n_added
+
+    def _add_record(self, record):
+        kind, id, etag, fetched_at, parts, partial = record
+        key = (kind, id)
+
+        doc_id = self._doc_ids.get(key)
+        if doc_id is not None and self._records[doc_id] is not None:
+            # merge the new parts into what we've got, and re-index.  a search result snippet
+            # has less in it than a full one, so never let it replace a full one.
+            old_parts, old_partial = self._records[doc_id][4], self._records[doc_id][5]
+            if partial and not old_partial:
+                parts = dict(old_parts, **{k: v for k, v in parts.items() if k != 'snippet'})
+            else:
+                parts = dict(old_parts, **parts)
+            partial = partial and old_partial
+            self._unindex(doc_id)
+        elif doc_id is None:
+            doc_id = len(self._records)
+            self._doc_ids[key] = doc_id
+            self._records.append(None)
+            self._filters.append(None)
+            self._terms.append(None)
+            self._lengths.append(0.0)
+
+        snippet = parts.get('snippet', {})
+        terms = collections.Counter()
+        for field, weight in FIELD_WEIGHTS:
+            value = snippet.get(field)
+            if not value:
+                continue
+            for token in tokenize(' '.join(value) if isinstance(value, list) else value):
+                terms[token] += weight
+
+        published_at = snippet.get('publishedAt')
+        self._records[doc_id] = (kind, id, etag, fetched_at, parts, partial)
+        self._filters[doc_id] = (
+            kind,
+            id if kind == 'channel' else snippet.get('channelId'),
+            _timestamp(string_to_datetime(published_at)) if published_at else None,
+        )
+        self._terms[doc_id] = terms
+        self._lengths[doc_id] = sum(terms.values())
+        for term, frequency in terms.items():
+            self._postings[term][doc_id] = frequency
+        self._total_length += self._lengths[doc_id]
+        self._n_docs += 1
+
+    def _unindex(self, doc_id):
+        for term in self._terms[doc_id]:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths[doc_id]
+        self._n_docs -= 1
+        self._records[doc_id] = None
+
+    def remove(self, kind, id):
+        """Remove a resource from the index.
+
+        :return: True if it was there
+        """
+        with self._lock:
+            doc_id = self._doc_ids.get((kind, id))
+            if doc_id is None or self._records[doc_id] is None:
+                return False
+            self._unindex(doc_id)
+            self._cache.clear()
+            return True
+
+    def search(self, query, limit=10, kind=None, channel_id=None, published_after=None,
+               published_before=None, require_all=False):
+        """Search the index.
+
+        :param query: search text
+        :param limit: maximum number of results
+        :param kind: only find resources of this kind, e.g. 'video'
+        :param channel_id: only find resources belonging to this channel
+        :param published_after: datetime (inclusive, as in the api)
+        :param published_before: datetime (inclusive)
+        :param require_all: only find resources matching every word of the query (default:
+            any word)
+        :return: list of Resources, best match first
+
+        """
+        return [resource_from_record(self._records[doc_id], self.youtube)
+                for doc_id, _ in self._ranked(query, limit, kind, channel_id, published_after,
+                                              published_before, require_all)]
+
+    def _ranked(self, query, limit, kind, channel_id, published_after, published_before,
+                require_all):
+        """Get the (doc id, score) of the best matches, using the cache if possible."""
+        after = _timestamp(published_after) if published_after is not None else None
+        before = _timestamp(published_before) if published_before is not None else None
+        terms = tuple(dict.fromkeys(tokenize(query)))
+        cache_key = (terms, limit, kind, channel_id, after, before, require_all)
+
+        with self._lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key]
+
+            results = self._search(terms, limit, kind, channel_id, after, before, require_all)
+
+            self._cache[cache_key] = results
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return results
+
+    def _search(self, terms, limit, kind, channel_id, after, before, require_all):
+        postings = [self._postings.get(term, {}) for term in terms]
+        if not postings or (require_all and not all(postings)):
+            return []
+
+        n_docs = self._n_docs
+        average_length = self._total_length / n_docs if n_docs else 1.0
+        k1, b = self.K1, self.B
+
+        scores = collections.defaultdict(float)
+        matches = collections.Counter()
+        for term_postings in postings:
+            if not term_postings:
+                continue
+            df = len(term_postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, frequency in term_postings.items():
+                norm = k1 * (1 - b + b * self._lengths[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (k1 + 1) / (frequency + norm)
+                matches[doc_id] += 1
+
+        def wanted(doc_id):
+            doc_kind, doc_channel_id, published = self._filters[doc_id]
+            if require_all and matches[doc_id] < len(terms):
+                return False
+            if kind is not None and doc_kind != kind:
+                return False
+            if channel_id is not None and doc_channel_id != channel_id:
+                return False
+            if after is not None and (published is None or published < after):
+                return False
+            if before is not None and (published is None or published > before):
+                return False
+            return True
+
+        candidates = ((doc_id, score) for doc_id, score in scores.items() if wanted(doc_id))
+        return heapq.nlargest(limit, candidates, key=lambda pair: (pair[1], -pair[0]))
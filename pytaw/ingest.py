@@ -0,0 +1,175 @@
+import logging
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from .youtube import Query, create_resource_from_api_response
+from .utils import classify_youtube_url
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+# resources are fetched this many at a time (the most the api gives per request)
+BATCH_SIZE = 50
+
+# endpoint each kind of resource is fetched from by id
+KIND_ENDPOINTS = {
+    'video': 'videos',
+    'playlist': 'playlists',
+    'channel': 'channels',
+}
+
+# api parameter each kind of channel name is looked up with (one per request)
+CHANNEL_LOOKUPS = {
+    'channel_handle': 'forHandle',
+    'channel_username': 'forUsername',
+}
+
+
+class IngestStats(object):
+    """Counts of what an UrlIngester has done."""
+
+    def __init__(self):
+        self.n_urls = 0
+        self.n_unrecognised = 0
+        self.n_duplicates = 0
+        self.n_requests = 0
+        self.n_found = 0
+        self.n_missing = 0
+
+    def __repr__(self):
+        return f"<IngestStats urls={self.n_urls} unrecognised={self.n_unrecognised} " \
+               f"duplicates={self.n_duplicates} requests={self.n_requests} " \
+               f"found={self.n_found} missing={self.n_missing}>"
+
+
+class UrlIngester(object):
+    """Turns a stream of youtube urls into the resources they link to.
+
+    Each url is classified (see `classify_youtube_url()`) and duplicates are dropped, then the
+    ids of each kind are gathered into batches of 50 and fetched from the videos, channels and
+    playlists endpoints, with several batches in flight at once.  Channel handles and usernames
+    can't be batched, so are looked up one per request.
+
+        >>> ingester = UrlIngester(youtube, parts='snippet,statistics')
+        >>> with open('urls.txt') as f:
+        ...     store.upsert(ingester.ingest(line.strip() for line in f))
+
+    Urls are read lazily and resources are generated as their batches arrive, so memory use
+    depends on the number of distinct ids seen (for deduplication), not the number of urls.
+
+    """
+
+    def __init__(self, youtube, parts='snippet', max_workers=8, seen=None):
+        """Initialise the ingester.
+
+        :param youtube: YouTube instance
+        :param parts: part string (or list of parts) to fetch for each resource
+        :param max_workers: maximum number of requests at once
+        :param seen: set of (kind, id) tuples already ingested, which are skipped (default: an
+            empty set).  it's added to as urls are ingested, so the same set can be given to
+            another ingester later to carry on deduplicating.
+
+        """
+        self.youtube = youtube
+        self.parts = parts if isinstance(parts, str) else ','.join(parts)
+        self.max_workers = max_workers
+        self.seen = set() if seen is None else seen
+
+        self.stats = IngestStats()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<UrlIngester {self.stats}>"
+
+    def classify(self, urls):
+        """Classify urls, dropping any that aren't recognised or are duplicates.
+
+        :param urls: iterable of url strings
+        :return: generator of (kind, id) tuples, each one new
+        """
+        stats, seen = self.stats, self.seen
+        for url in urls:
+            stats.n_urls += 1
+            classified = classify_youtube_url(url)
+            if classified is None:
+                stats.n_unrecognised += 1
+            elif classified in seen:
+                stats.n_duplicates += 1
+            else:
+                seen.add(classified)
+                yield classified
+
+    def batches(self, urls):
+        """Group the new ids linked to by urls into batches for fetching.
+
+        :return: generator of (kind, ids) tuples.  for 'video', 'playlist' and 'channel' kinds
+            there are up to 50 ids, and for channel handles and usernames there's one.
+        """
+        pending = collections.defaultdict(list)
+        for kind, id in self.classify(urls):
+            if kind in CHANNEL_LOOKUPS:
+                yield kind, [id]
+                continue
+            ids = pending[kind]
+            ids.append(id)
+            if len(ids) == BATCH_SIZE:
+                yield kind, ids
+                pending[kind] = []
+
+        for kind, ids in pending.items():
+            if ids:
+                yield kind, ids
+
+    def ingest(self, urls):
+        """Fetch the resources urls link to.
+
+        :param urls: iterable of url strings
+        :return: generator of Resources, a batch at a time in the order the batches were made.
+            resources which aren't found (e.g. deleted videos) are counted in `stats`.
+        """
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+
+        def fetch(kind, ids):
+            try:
+                return self._fetch(kind, ids)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = collections.deque()
+            for kind, ids in self.batches(urls):
+                # limit the number of submitted batches, so we don't read all the urls up front
+                slots.acquire()
+                in_flight.append(executor.submit(fetch, kind, ids))
+
+                while in_flight and in_flight[0].done():
+                    yield from in_flight.popleft().result()
+
+            for future in in_flight:
+                yield from future.result()
+
+    def _fetch(self, kind, ids):
+        """Fetch a batch of resources.
+
+        :return: list of the Resources found
+        """
+        if kind in CHANNEL_LOOKUPS:
+            api_params = {'part': f'id,{self.parts}', CHANNEL_LOOKUPS[kind]: ids[0]}
+            endpoint = 'channels'
+        else:
+            api_params = {'part': f'id,{self.parts}', 'id': ','.join(ids),
+                          'maxResults': BATCH_SIZE}
+            endpoint = KIND_ENDPOINTS[kind]
+
+        raw = Query(self.youtube, endpoint, api_params).execute()
+        resources = [create_resource_from_api_response(self.youtube, item)
+                     for item in raw.get('items', [])]
+
+        with self._lock:
+            self.stats.n_requests += 1
+            self.stats.n_found += len(resources)
+            self.stats.n_missing += len(ids) - len(resources)
+        return resources
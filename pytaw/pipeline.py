@@ -0,0 +1,302 @@
+import logging
+import itertools
+import collections
+from datetime import timedelta, timezone
+
+from .youtube import ListResponse, Query, hydrate_resources, join_resources
+from .utils import iterate_chunks, datetime_to_string
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+# resources are hydrated and joined this many at a time (the most the api gives per request)
+BATCH_SIZE = 50
+
+# search api values of videoDuration, and the durations they cover
+DURATIONS = {
+    'short': (timedelta(0), timedelta(minutes=4)),
+    'medium': (timedelta(minutes=4), timedelta(minutes=20)),
+    'long': (timedelta(minutes=20), None),
+}
+
+# part holding the data each filter condition is checked against
+CONDITION_PARTS = {
+    'kind': 'id',
+    'channel_id': 'snippet',
+    'published_after': 'snippet',
+    'published_before': 'snippet',
+    'duration': 'contentDetails',
+}
+
+FETCH_STAGES = ('hydrate', 'join')
+
+Stage = collections.namedtuple('Stage', ['kind', 'value'])
+
+
+def _utc(dt):
+    return dt if dt.tzinfo is not None else dt.astimezone(timezone.utc)
+
+
+def check_condition(resource, name, value):
+    """Check a filter condition (see `Pipeline.filter()`) against a resource."""
+    if name == 'kind':
+        return resource.KIND == value
+    elif name == 'channel_id':
+        channel_id = resource.id if resource.KIND == 'channel' else resource.channel_id
+        return channel_id == value
+    elif name == 'published_after':
+        # inclusive, as the api's publishedAfter and publishedBefore are, so that a condition
+        # gives the same results whether it's checked here or sent to the api
+        return resource.published_at >= _utc(value)
+    elif name == 'published_before':
+        return resource.published_at <= _utc(value)
+    elif name == 'duration':
+        if resource.KIND != 'video':
+            return False
+        shortest, longest = DURATIONS[value]
+        return resource.duration >= shortest and (longest is None or resource.duration < longest)
+    raise ValueError(f"unknown filter condition '{name}'")
+
+
+def search_params(name, value):
+    """Get the search api parameters which apply a filter condition."""
+    if name == 'kind':
+        return {'type': value}
+    elif name == 'channel_id':
+        return {'channelId': value}
+    elif name == 'published_after':
+        return {'publishedAfter': datetime_to_string(value)}
+    elif name == 'published_before':
+        return {'publishedBefore': datetime_to_string(value)}
+    elif name == 'duration':
+        # the api only accepts videoDuration in searches for videos
+        return {'type': 'video', 'videoDuration': value}
+    raise ValueError(f"unknown filter condition '{name}'")
+
+
+class Pipeline(object):
+    """A lazy chain of processing stages over a stream of resources.
+
+    Each method adds a stage and returns a new Pipeline - nothing is fetched until the pipeline
+    is iterated over (or sent to a sink with `to()`), and then resources stream through the
+    stages one at a time, so no stage holds more than a batch in memory.
+
+        >>> pipeline = (youtube.search(q='monty python')
+        ...             .filter(kind='video', published_after=datetime(2015, 1, 1))
+        ...             .hydrate('statistics')
+        ...             .filter(lambda video: video.n_views > 1000)
+        ...             .map(lambda video: (video.title, video.n_views))
+        ...             .take(100))
+        >>> for title, n_views in pipeline:
+        ...     print(title, n_views)
+
+    Before running, the stages are optimised:
+        - filters given as keyword conditions are moved ahead of hydrate and join stages if the
+          data they need is already there (e.g. in search result snippets), so that we don't
+          fetch data for resources which are going to be thrown away
+        - conditions of filters at the start of a search pipeline are sent to the api as search
+          parameters (type, channelId, publishedAfter, publishedBefore, videoDuration), so
+          they're never fetched at all.  so is a `take()` of less than a page.
+        - adjacent hydrate and join stages are fused, so each batch of 50 resources goes through
+          all of them together
+
+    """
+
+    def __init__(self, source, youtube=None, stages=()):
+        """Initialise the pipeline.
+
+        :param source: ListResponse, or any iterable of Resources
+        :param youtube: YouTube instance used to hydrate and join resources (default: the
+            source's, or failing that the one the resources are attached to)
+        :param stages: list of Stages
+
+        """
+        self.source = source
+        self.youtube = youtube or getattr(source, 'youtube', None)
+        self.stages = tuple(stages)
+
+    def __repr__(self):
+        return f"<Pipeline stages={[stage.kind for stage in self.stages]}>"
+
+    def _add(self, kind, value):
+        return Pipeline(self.source, self.youtube, self.stages + (Stage(kind, value),))
+
+    def filter(self, predicate=None, **conditions):
+        """Only keep resources for which a predicate is true and/or conditions hold.
+
+        Conditions can be checked before the data is fetched, so are preferable to predicates:
+            kind: resource kind, e.g. 'video'
+            channel_id: id of the channel the resource belongs to
+            published_after, published_before: datetimes
+            duration: 'short' (under 4 minutes), 'medium' (4-20 minutes) or 'long' (videos only)
+
+        :param predicate: function taking a resource and returning True to keep it
+        :param conditions: filter conditions (see above)
+
+        """
+        for name, value in conditions.items():
+            if name not in CONDITION_PARTS:
+                raise ValueError(f"unknown filter condition '{name}'")
+            if name == 'duration' and value not in DURATIONS:
+                raise ValueError(f"duration must be one of {tuple(DURATIONS)}, not '{value}'")
+        return self._add('filter', (predicate, conditions))
+
+    def map(self, function):
+        """Replace each item with the result of a function applied to it."""
+        return self._add('map', function)
+
+    def hydrate(self, parts):
+        """Fetch data parts for the resources, 50 at a time (see `hydrate_resources()`)."""
+        if isinstance(parts, str):
+            parts = parts.split(',')
+        return self._add('hydrate', list(parts))
+
+    def join(self, name, parts='snippet'):
+        """Fetch related resources, 50 at a time (see `join_resources()`)."""
+        return self._add('join', (name, parts))
+
+    def batch(self, n):
+        """Group items into lists of up to n items."""
+        if n < 1:
+            raise ValueError(f"batch size must be at least 1, not {n}")
+        return self._add('batch', n)
+
+    def take(self, n):
+        """Stop after n items."""
+        if n < 0:
+            raise ValueError(f"can't take a negative number of items ({n})")
+        return self._add('take', n)
+
+    def to(self, sink):
+        """Run the pipeline, sending each item to a sink.
+
+        :param sink: function called with each item (e.g. `store.upsert` after a batch stage),
+            or an object with an append() or write() method
+        :return: number of items sent to the sink
+
+        """
+        for method in ('append', 'write'):
+            if not callable(sink) and hasattr(sink, method):
+                sink = getattr(sink, method)
+        n_items = 0
+        for item in self:
+            sink(item)
+            n_items += 1
+        return n_items
+
+    def __iter__(self):
+        source, stages = self.plan()
+        stream = (resource for resource in source if resource is not None)
+        for stage in stages:
+            stream = getattr(self, f'_run_{stage.kind}')(stream, stage.value)
+        return stream
+
+    def _source_parts(self):
+        """Get the parts we'll have for each resource from the source."""
+        if isinstance(self.source, ListResponse):
+            return {'id'} | set(self.source.query.api_params.get('part', 'id').split(','))
+        return {'id'}
+
+    def plan(self):
+        """Optimise the stages, as described in the class docstring.
+
+        :return: (source, stages) to run
+        """
+        stages = list(self.stages)
+        source_parts = self._source_parts()
+
+        # move filters on data we already have ahead of fetch stages
+        moved = True
+        while moved:
+            moved = False
+            for i in range(1, len(stages)):
+                stage, previous = stages[i], stages[i - 1]
+                if (stage.kind == 'filter' and stage.value[0] is None
+                        and previous.kind in FETCH_STAGES
+                        and all(CONDITION_PARTS[name] in source_parts
+                                for name in stage.value[1])):
+                    stages[i - 1], stages[i] = stage, previous
+                    moved = True
+
+        source = self.source
+        if isinstance(source, ListResponse):
+            source, stages = self._push_down(source, stages)
+
+        # fuse adjacent fetch stages
+        fused = []
+        for stage in stages:
+            if stage.kind in FETCH_STAGES:
+                if fused and fused[-1].kind == 'fetch':
+                    fused[-1].value.append(stage)
+                else:
+                    fused.append(Stage('fetch', [stage]))
+            else:
+                fused.append(stage)
+
+        return source, fused
+
+    def _push_down(self, source, stages):
+        """Send leading filter conditions and takes to the api, as query parameters."""
+        query = source.query
+        params = dict(query.api_params)
+
+        i = 0
+        while i < len(stages) and stages[i].kind == 'filter' and query.endpoint == 'search':
+            predicate, conditions = stages[i].value
+            local = {}
+            for name, value in conditions.items():
+                new_params = search_params(name, value)
+                if any(params.get(k, v) != v for k, v in new_params.items()):
+                    # conflicts with a parameter we've already got, so check it ourselves
+                    local[name] = value
+                else:
+                    params.update(new_params)
+
+            if predicate is None and not local:
+                del stages[i]
+            else:
+                stages[i] = Stage('filter', (predicate, local))
+                i += 1
+
+        # if all that's wanted is the first few results, don't ask for a whole page of them
+        if i == 0 and stages and stages[0].kind == 'take' \
+                and stages[0].value < int(params.get('maxResults', 5)):
+            params['maxResults'] = max(stages[0].value, 1)
+
+        if params == query.api_params:
+            return source, stages
+
+        log.debug(f"pushed filters down into {query}: {params}")
+        query = Query(query.youtube, query.endpoint, params, priority=query.priority)
+        return ListResponse(query), stages
+
+    def _run_filter(self, stream, value):
+        predicate, conditions = value
+        for resource in stream:
+            if all(check_condition(resource, name, v) for name, v in conditions.items()) \
+                    and (predicate is None or predicate(resource)):
+                yield resource
+
+    def _run_map(self, stream, function):
+        return map(function, stream)
+
+    def _run_fetch(self, stream, fetch_stages):
+        for chunk in iterate_chunks(stream, BATCH_SIZE):
+            # without a youtube instance of our own, use the one the resources are attached to
+            youtube = self.youtube or chunk[0].youtube
+            for stage in fetch_stages:
+                if stage.kind == 'hydrate':
+                    hydrate_resources(youtube, chunk, stage.value)
+                else:
+                    name, parts = stage.value
+                    join_resources(youtube, chunk, name, parts)
+            yield from chunk
+
+    def _run_batch(self, stream, n):
+        for chunk in iterate_chunks(stream, n):
+            yield list(chunk)
+
+    def _run_take(self, stream, n):
+        return itertools.islice(stream, n)
@@ -0,0 +1,322 @@
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .youtube import Query
+from .scheduler import BACKGROUND
+from .store import connect
+from .utils import iterate_chunks
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+# statistics we track, and their names in the api response
+STATISTICS = (
+    ('n_views', 'viewCount'),
+    ('n_likes', 'likeCount'),
+    ('n_comments', 'commentCount'),
+)
+
+# indexes into the per-video state lists
+TIER, NEXT_DUE, UNCHANGED, VALUES = 0, 1, 2, 3
+
+
+class StatisticsPoller(object):
+    """Polls the statistics of a large set of videos on a schedule.
+
+    Only the 'statistics' part is fetched (filtered down to the counts we track), 50 videos per
+    request, over a pool of worker threads.  No Resource instances are created.  Results are
+    stored as a compact time series in a sqlite database: a row is written only when a count
+    changes, and only the changed counts are filled in.
+
+    Each video belongs to a tier, and each tier has its own polling interval.  Tiers are given
+    hottest (most frequently polled) first.  If a video's counts change when it's polled it moves
+    up a tier; if they don't change for `demote_after` polls in a row it moves down.  This keeps
+    quota use (and cpu) roughly proportional to how much is changing.
+
+        >>> poller = StatisticsPoller(youtube, 'stats.db', tiers=(300, 900, 3600))
+        >>> poller.add(video_ids)
+        >>> poller.run()
+
+    """
+
+    def __init__(self, youtube, path, tiers=(900,), default_tier=None, demote_after=3,
+                 max_workers=4, retry_delay=60):
+        """Initialise the poller, loading any videos already in the database.
+
+        :param youtube: YouTube instance
+        :param path: path of the sqlite database to store statistics in
+        :param tiers: polling interval (in seconds) of each tier, hottest first
+        :param default_tier: tier of newly added videos (default: the coldest)
+        :param demote_after: no. of unchanged polls in a row before a video moves down a tier
+        :param max_workers: maximum number of requests at once
+        :param retry_delay: seconds to wait before polling videos again if their request failed
+
+        """
+        self.youtube = youtube
+        self.path = path
+        self.tiers = tuple(tiers)
+        self.default_tier = len(self.tiers) - 1 if default_tier is None else default_tier
+        self.demote_after = demote_after
+        self.max_workers = max_workers
+        self.retry_delay = retry_delay
+
+        self.n_requests = 0
+        self.n_failed = 0
+        self.n_polled = 0
+        self.n_changed = 0
+
+        # video id -> [tier, next due time, no. of unchanged polls, last values]
+        self._videos = {}
+        # heap of (next due time, video id).  entries are left in place when a video is
+        # rescheduled or removed, and skipped if they don't match the video's state.
+        self._due = []
+
+        self.connection = connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS videos (
+                id TEXT PRIMARY KEY,
+                tier INTEGER NOT NULL,
+                n_views INTEGER,
+                n_likes INTEGER,
+                n_comments INTEGER
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS deltas (
+                video_id TEXT NOT NULL,
+                time INTEGER NOT NULL,
+                n_views INTEGER,
+                n_likes INTEGER,
+                n_comments INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS deltas_video_time ON deltas (video_id, time);
+        """)
+        self._load()
+
+    def __repr__(self):
+        return f"<StatisticsPoller n_videos={len(self._videos)} tiers={self.tiers}>"
+
+    def __len__(self):
+        return len(self._videos)
+
+    def _load(self):
+        now = time.time()
+        rows = self.connection.execute(
+            'SELECT id, tier, n_views, n_likes, n_comments FROM videos'
+        )
+        for id, tier, *values in rows:
+            tier = min(tier, len(self.tiers) - 1)
+            self._videos[id] = [tier, now, 0, tuple(values)]
+            self._due.append((now, id))
+        heapq.heapify(self._due)
+
+    def _schedule(self, id, due):
+        self._videos[id][NEXT_DUE] = due
+        heapq.heappush(self._due, (due, id))
+
+    def add(self, video_ids, tier=None):
+        """Start polling videos.  Videos which are already being polled are left alone.
+
+        :param video_ids: iterable of video ids
+        :param tier: tier to put the videos in (default: `default_tier`)
+
+        """
+        tier = self.default_tier if tier is None else tier
+        now = time.time()
+
+        new_ids = [id for id in dict.fromkeys(video_ids) if id not in self._videos]
+        for id in new_ids:
+            self._videos[id] = [tier, now, 0, (None, None, None)]
+            self._schedule(id, now)
+
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO videos (id, tier) VALUES (?, ?)',
+                ((id, tier) for id in new_ids)
+            )
+
+    def remove(self, video_ids):
+        """Stop polling videos.  Their history is kept."""
+        video_ids = [id for id in video_ids if self._videos.pop(id, None) is not None]
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM videos WHERE id = ?', ((id,) for id in video_ids)
+            )
+
+    def set_tier(self, video_ids, tier):
+        """Move videos to a different tier."""
+        for id in video_ids:
+            self._videos[id][TIER] = tier
+        with self.connection:
+            self.connection.executemany(
+                'UPDATE videos SET tier = ? WHERE id = ?', ((tier, id) for id in video_ids)
+            )
+
+    def due(self, now=None):
+        """Get the ids of all videos which are due to be polled."""
+        now = time.time() if now is None else now
+        due = []
+        while self._due and self._due[0][0] <= now:
+            due_time, id = heapq.heappop(self._due)
+            state = self._videos.get(id)
+            if state is not None and state[NEXT_DUE] == due_time:
+                due.append(id)
+        return due
+
+    def _fetch(self, video_ids):
+        """Fetch the statistics of up to 50 videos.
+
+        :return: dictionary of statistics tuples keyed by video id
+        """
+        fields = ','.join(name for _, name in STATISTICS)
+        raw = Query(self.youtube, 'videos', {
+            'part': 'statistics',
+            'id': ','.join(video_ids),
+            'maxResults': 50,
+            'fields': f'items(id,statistics({fields}))',
+        }, priority=BACKGROUND).execute()
+
+        results = dict()
+        for item in raw.get('items', []):
+            statistics = item.get('statistics', {})
+            results[item['id']] = tuple(
+                int(statistics[name]) if name in statistics else None for _, name in STATISTICS
+            )
+        return results
+
+    def poll(self, now=None):
+        """Poll every video which is due, and store the changes.
+
+        :return: number of videos polled
+        """
+        now = time.time() if now is None else now
+        due = self.due(now)
+        if not due:
+            return 0
+
+        def fetch(video_ids):
+            try:
+                return self._fetch(video_ids)
+            except Exception as error:
+                log.warning(f"failed to poll {len(video_ids)} videos: {error!r}")
+                return None
+
+        chunks = list(iterate_chunks(due, 50))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            batches = list(executor.map(fetch, chunks))
+        self.n_requests += len(batches)
+
+        # videos whose request failed are tried again after a short wait
+        failed = set()
+        for video_ids, results in zip(chunks, batches):
+            if results is None:
+                self.n_failed += 1
+                failed.update(video_ids)
+                for id in video_ids:
+                    if id in self._videos:
+                        self._schedule(id, now + self.retry_delay)
+        batches = [results for results in batches if results is not None]
+
+        deltas = []
+        updates = []
+        timestamp = int(now)
+        for results in batches:
+            for id, values in results.items():
+                state = self._videos.get(id)
+                if state is None:
+                    continue
+
+                tier = state[TIER]
+                previous = self._update(state, values)
+                if previous is not None:
+                    deltas.append((id, timestamp) + tuple(
+                        new if new != old else None for new, old in zip(values, previous)
+                    ))
+                if previous is not None or state[TIER] != tier:
+                    updates.append((state[TIER],) + state[VALUES] + (id,))
+
+                self._schedule(id, now + self.tiers[state[TIER]])
+
+        # videos which weren't returned have been deleted (or made private)
+        found = set().union(*batches)
+        missing = [id for id in due if id not in found and id not in failed]
+        if missing:
+            log.info(f"{len(missing)} videos not found, no longer polling them")
+            self.remove(missing)
+
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany(
+                'INSERT INTO deltas (video_id, time, n_views, n_likes, n_comments) '
+                'VALUES (?, ?, ?, ?, ?)', deltas
+            )
+            self.connection.executemany(
+                'UPDATE videos SET tier = ?, n_views = ?, n_likes = ?, n_comments = ? '
+                'WHERE id = ?', updates
+            )
+
+        self.n_polled += len(found)
+        self.n_changed += len(deltas)
+        return len(found)
+
+    def _update(self, state, values):
+        """Update a video's state after polling it, moving it between tiers if necessary.
+
+        :return: the previous values if they've changed, else None
+        """
+        previous = state[VALUES]
+        if values == previous:
+            state[UNCHANGED] += 1
+            if state[UNCHANGED] >= self.demote_after and state[TIER] < len(self.tiers) - 1:
+                state[TIER] += 1
+                state[UNCHANGED] = 0
+            return None
+
+        state[VALUES] = values
+        state[UNCHANGED] = 0
+        if state[TIER] > 0 and previous != (None, None, None):
+            state[TIER] -= 1
+        return previous
+
+    def run(self, stop=None, tick=1.0):
+        """Poll videos as they become due, until `stop` is set.
+
+        :param stop: threading.Event
+        :param tick: how often to check for due videos, in seconds
+
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                n_polled = self.poll()
+            except Exception:
+                log.exception("polling failed, will try again")
+                n_polled = 0
+            if n_polled:
+                log.debug(f"polled {n_polled} videos ({self.n_requests} requests so far)")
+            stop.wait(tick)
+
+    def history(self, video_id):
+        """Get the statistics history of a video.
+
+        :return: list of (unix time, n_views, n_likes, n_comments) tuples, one for each time a
+            change was seen
+        """
+        rows = self.connection.execute(
+            'SELECT time, n_views, n_likes, n_comments FROM deltas '
+            'WHERE video_id = ? ORDER BY time', (video_id,)
+        )
+
+        history = []
+        values = (None, None, None)
+        for timestamp, *changes in rows:
+            values = tuple(old if new is None else new for new, old in zip(changes, values))
+            history.append((timestamp,) + values)
+        return history
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,216 @@
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+# quota cost of a single list request for each endpoint.  see
+#   https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COSTS = {
+    'search': 100,
+}
+DEFAULT_QUOTA_COST = 1
+DEFAULT_DAILY_QUOTA = 10000
+
+# daily quotas are reset at midnight pacific time
+QUOTA_RESET_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+# error reasons which mean a key has run out of quota for the day
+QUOTA_ERROR_REASONS = ('quotaExceeded', 'dailyLimitExceeded')
+
+
+class QuotaExhausted(Exception):
+    """Exception raised if every key in a KeyPool is out of quota."""
+    pass
+
+
+def quota_cost(endpoint):
+    """Get the quota cost of a single request to the given endpoint."""
+    return QUOTA_COSTS.get(endpoint, DEFAULT_QUOTA_COST)
+
+
+def next_quota_reset(now=None):
+    """Get the unix time of the next daily quota reset (midnight pacific time)."""
+    now = datetime.now(QUOTA_RESET_TIMEZONE) if now is None else now
+    tomorrow = now.astimezone(QUOTA_RESET_TIMEZONE).date() + timedelta(days=1)
+    midnight = datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=QUOTA_RESET_TIMEZONE)
+    return midnight.timestamp()
+
+
+def error_reasons(error):
+    """Get the list of error reasons from a googleapiclient HttpError."""
+    try:
+        content = json.loads(error.content)
+        return [e.get('reason') for e in content['error']['errors']]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return []
+
+
+def is_quota_error(error):
+    """Check whether an HttpError means that the key used has run out of quota."""
+    return any(reason in QUOTA_ERROR_REASONS for reason in error_reasons(error))
+
+
+class QuotaBudget(object):
+    """A limit on the quota a job may use, shared between threads."""
+
+    def __init__(self, units):
+        self.units = units
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<QuotaBudget spent={self.spent}/{self.units}>"
+
+    @property
+    def remaining(self):
+        return self.units - self.spent
+
+    def spend(self, cost):
+        """Spend quota from the budget, if there's enough left.
+
+        :return: True if the quota was spent, False if there wasn't enough
+        """
+        with self._lock:
+            if self.spent + cost > self.units:
+                return False
+            self.spent += cost
+            return True
+
+
+class KeyState(object):
+    """Usage and error statistics for a single developer key."""
+
+    # weight given to the latest request outcome when updating the error rate
+    ERROR_RATE_ALPHA = 0.1
+
+    def __init__(self, key, daily_quota=DEFAULT_DAILY_QUOTA):
+        self.key = key
+        self.daily_quota = daily_quota
+        self.used = 0
+        self.error_rate = 0.0
+        self.exhausted_until = None
+        self.reset_at = next_quota_reset()
+
+    def __repr__(self):
+        return (f"<KeyState {self.key[:6]}... used={self.used}/{self.daily_quota} "
+                f"error_rate={self.error_rate:.2f}>")
+
+    @property
+    def remaining(self):
+        return max(self.daily_quota - self.used, 0)
+
+    def check_reset(self, now):
+        """Reset usage if we've passed the daily quota reset time."""
+        if now >= self.reset_at:
+            self.used = 0
+            self.exhausted_until = None
+            self.reset_at = next_quota_reset()
+
+    def is_available(self, now, cost):
+        if self.exhausted_until is not None and now < self.exhausted_until:
+            return False
+        return self.remaining >= cost
+
+    def score(self):
+        """Higher is better: keys with lots of quota left and few recent errors are preferred."""
+        return self.remaining * (1.0 - self.error_rate)
+
+    def record_outcome(self, failed):
+        self.error_rate += self.ERROR_RATE_ALPHA * (float(failed) - self.error_rate)
+
+
+class KeyPool(object):
+    """A set of developer keys, with queries routed to whichever key is in the best shape.
+
+    Each request is charged against the chosen key's daily quota when it is sent (so that
+    concurrent requests spread out over the keys), and we keep a running error rate for each
+    key.  A key which gets a quota error is taken out of rotation until the next daily reset.
+
+    Note the quota used is only what this pool has seen - if keys are shared with other
+    processes the estimate will be optimistic, but quota errors will still remove the key.
+
+    """
+
+    def __init__(self, keys, daily_quota=DEFAULT_DAILY_QUOTA):
+        """Initialise the pool.
+
+        :param keys: iterable of developer keys
+        :param daily_quota: daily quota for each key, in units
+
+        """
+        keys = list(dict.fromkeys(keys))    # remove duplicates but keep order
+        if not keys:
+            raise ValueError("a KeyPool needs at least one key")
+
+        self.states = {key: KeyState(key, daily_quota) for key in keys}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<KeyPool n_keys={len(self.states)} remaining={self.remaining}>"
+
+    def __len__(self):
+        return len(self.states)
+
+    @property
+    def keys(self):
+        return list(self.states)
+
+    @property
+    def remaining(self):
+        """Total quota remaining over all keys which are in rotation."""
+        now = time.time()
+        with self._lock:
+            return sum(s.remaining for s in self.states.values() if s.is_available(now, 0))
+
+    def choose(self, cost=DEFAULT_QUOTA_COST):
+        """Choose a key for a request, and charge the request's cost to it.
+
+        :param cost: quota cost of the request
+        :return: developer key
+        :raises QuotaExhausted: if no key has enough quota left
+
+        """
+        now = time.time()
+        with self._lock:
+            best = None
+            for state in self.states.values():
+                state.check_reset(now)
+                if state.is_available(now, cost) and (best is None or
+                                                      state.score() > best.score()):
+                    best = state
+
+            if best is None:
+                raise QuotaExhausted(f"no key has {cost} units of quota remaining")
+
+            best.used += cost
+            return best.key
+
+    def record_success(self, key):
+        with self._lock:
+            self.states[key].record_outcome(failed=False)
+
+    def record_error(self, key, error):
+        """Record a failed request.
+
+        :param key: the key used for the request
+        :param error: the HttpError raised
+        :return: True if the key has run out of quota (and has been taken out of rotation)
+
+        """
+        quota_error = is_quota_error(error)
+        with self._lock:
+            state = self.states[key]
+            state.record_outcome(failed=True)
+            if quota_error:
+                state.exhausted_until = state.reset_at
+                log.warning(f"key {key[:6]}... is out of quota, removing it from rotation until "
+                            f"{datetime.fromtimestamp(state.reset_at, QUOTA_RESET_TIMEZONE)}")
+
+        return quota_error
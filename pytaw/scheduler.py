@@ -0,0 +1,288 @@
+import time
+import logging
+import itertools
+import threading
+import contextlib
+import collections
+
+from .quota import quota_cost
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+# request priorities, most urgent first
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, BULK, BACKGROUND)
+
+# priority of requests made outside any `request_priority()` block
+DEFAULT_PRIORITY = INTERACTIVE
+
+# no. of recent wait times kept for each priority, for percentiles
+WAIT_SAMPLES = 1000
+
+_local = threading.local()
+
+
+class SchedulerFull(Exception):
+    """Exception raised if a request can't join a Scheduler's queue before its timeout."""
+    pass
+
+
+def check_priority(priority):
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {PRIORITIES}, not '{priority}'")
+    return priority
+
+
+def current_priority():
+    """Get the priority of requests made from this thread (see `request_priority()`)."""
+    return getattr(_local, 'priority', DEFAULT_PRIORITY)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Context manager giving a priority to the queries made in this thread within it.
+
+        >>> with request_priority('background'):
+        ...     for video in youtube.playlist_items(playlist_id):
+        ...         ...
+
+    The priority is fixed when a Query is created, so a ListResponse created within the block
+    keeps its priority however long it's paged through for.
+
+    """
+    previous = current_priority()
+    _local.priority = check_priority(priority)
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class TokenBucket(object):
+    """A token bucket rate limit.
+
+    Tokens are added at `rate` per second, up to `capacity`.  Taking more tokens than there are
+    is allowed as long as the bucket is full enough (at least `capacity` tokens, or as many as
+    are being taken), leaving it in debt - so an expensive request (like a search) isn't starved
+    by a bucket smaller than its cost, but is still paid for.
+
+    """
+
+    def __init__(self, rate, capacity=None, now=None):
+        """Initialise the bucket, full.
+
+        :param rate: tokens added per second
+        :param capacity: maximum tokens held (default: one second's worth, and at least one)
+        :param now: time the bucket is created (default: time.monotonic())
+
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, not {rate}")
+
+        self.rate = rate
+        self.capacity = max(rate, 1) if capacity is None else capacity
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic() if now is None else now
+
+    def __repr__(self):
+        return f"<TokenBucket rate={self.rate} tokens={self.tokens:.1f}/{self.capacity}>"
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, n, now):
+        """Get the time in seconds until n tokens can be taken (0 if they can be now)."""
+        self._refill(now)
+        needed = min(n, self.capacity)
+        return max(needed - self.tokens, 0) / self.rate
+
+    def take(self, n, now):
+        self._refill(now)
+        self.tokens -= n
+
+
+class _Ticket(object):
+    """A request waiting to be dispatched."""
+
+    __slots__ = ('priority', 'rank', 'seq', 'endpoint', 'key', 'cost', 'queued_at', 'granted')
+
+    def __init__(self, priority, seq, endpoint, key, queued_at):
+        self.priority = priority
+        self.rank = PRIORITIES.index(priority)
+        self.seq = seq
+        self.endpoint = endpoint
+        self.key = key
+        self.cost = quota_cost(endpoint)
+        self.queued_at = queued_at
+        self.granted = threading.Event()
+
+
+class Scheduler(object):
+    """Decides when each request of a YouTube instance may be sent.
+
+    Requests are rate limited by token buckets: one for each endpoint (in requests per second)
+    and one for each developer key (in quota units per second, matching google's per-user quota
+    per 100 seconds).  When a request can't go straight away it waits in a queue for its
+    priority: 'interactive', 'bulk' or 'background'.  Whenever tokens are available the most
+    urgent waiting request that can use them is sent, so interactive lookups overtake a large
+    backfill rather than queueing behind it.  Waiting requests age, gaining one priority level
+    every `aging` seconds, so background work isn't starved forever.
+
+    Each priority's queue is bounded.  A request finding its queue full blocks until there's
+    space (or raises SchedulerFull after `timeout`), which pushes back on whoever's producing the
+    requests.
+
+        >>> scheduler = Scheduler(endpoint_rates={'search': 1}, key_rate=30)
+        >>> youtube = YouTube(key=key, scheduler=scheduler)
+
+    """
+
+    def __init__(self, endpoint_rates=None, key_rate=None, default_rate=None, queue_size=1000,
+                 aging=30.0, clock=time.monotonic):
+        """Initialise the scheduler.
+
+        :param endpoint_rates: dictionary of maximum requests per second, keyed by endpoint
+            (e.g. 'search', 'videos')
+        :param key_rate: maximum quota units per second for each developer key
+        :param default_rate: maximum requests per second for endpoints not in `endpoint_rates`
+            (default: unlimited)
+        :param queue_size: maximum number of requests waiting at each priority
+        :param aging: seconds a request waits to gain a priority level
+        :param clock: function giving the current time in seconds (e.g. for testing)
+
+        """
+        self.endpoint_rates = dict(endpoint_rates or {})
+        self.key_rate = key_rate
+        self.default_rate = default_rate
+        self.queue_size = queue_size
+        self.aging = aging
+        self.clock = clock
+
+        self._endpoint_buckets = {}
+        self._key_buckets = {}
+        self._waiting = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._slots = {p: threading.BoundedSemaphore(queue_size) for p in PRIORITIES}
+
+        # metrics, for each priority
+        self._n_dispatched = dict.fromkeys(PRIORITIES, 0)
+        self._max_depth = dict.fromkeys(PRIORITIES, 0)
+        self._waits = {p: collections.deque(maxlen=WAIT_SAMPLES) for p in PRIORITIES}
+
+    def __repr__(self):
+        return f"<Scheduler waiting={len(self._waiting)}>"
+
+    def _buckets(self, ticket, now):
+        """Get the token buckets (and no. of tokens) a request needs."""
+        buckets = []
+
+        rate = self.endpoint_rates.get(ticket.endpoint, self.default_rate)
+        if rate is not None:
+            if ticket.endpoint not in self._endpoint_buckets:
+                self._endpoint_buckets[ticket.endpoint] = TokenBucket(rate, now=now)
+            buckets.append((self._endpoint_buckets[ticket.endpoint], 1))
+
+        if self.key_rate is not None and ticket.key is not None:
+            if ticket.key not in self._key_buckets:
+                self._key_buckets[ticket.key] = TokenBucket(self.key_rate, now=now)
+            buckets.append((self._key_buckets[ticket.key], ticket.cost))
+
+        return buckets
+
+    def _dispatch(self, now):
+        """Grant every waiting request that can go now, most urgent first.
+
+        Must be called with the lock held.
+
+        :return: seconds until another request may be able to go, or None if none are waiting
+
+        """
+        while self._waiting:
+            best, best_rank = None, None
+            for ticket in self._waiting:
+                if any(bucket.delay(n, now) for bucket, n in self._buckets(ticket, now)):
+                    continue
+                rank = (ticket.rank - (now - ticket.queued_at) / self.aging, ticket.seq)
+                if best is None or rank < best_rank:
+                    best, best_rank = ticket, rank
+
+            if best is None:
+                break
+
+            for bucket, n in self._buckets(best, now):
+                bucket.take(n, now)
+            self._waiting.remove(best)
+            self._n_dispatched[best.priority] += 1
+            self._waits[best.priority].append(now - best.queued_at)
+            best.granted.set()
+
+        if not self._waiting:
+            return None
+        return min(
+            max(bucket.delay(n, now) for bucket, n in self._buckets(ticket, now))
+            for ticket in self._waiting
+        )
+
+    def wait(self, endpoint, key=None, priority=None, timeout=None):
+        """Block until a request may be sent.
+
+        :param endpoint: endpoint of the request, e.g. 'videos'
+        :param key: developer key the request will be sent with, if any
+        :param priority: 'interactive', 'bulk' or 'background' (default: the current
+            `request_priority()`)
+        :param timeout: maximum seconds to wait to join the queue
+        :raises SchedulerFull: if the queue for the priority stays full for `timeout` seconds
+
+        """
+        priority = check_priority(priority or current_priority())
+
+        slots = self._slots[priority]
+        if not slots.acquire(timeout=timeout):
+            raise SchedulerFull(f"{self.queue_size} {priority} requests are already waiting")
+
+        try:
+            with self._lock:
+                now = self.clock()
+                ticket = _Ticket(priority, next(self._seq), endpoint, key, now)
+                self._waiting.append(ticket)
+                depth = sum(1 for t in self._waiting if t.priority == priority)
+                self._max_depth[priority] = max(self._max_depth[priority], depth)
+                delay = self._dispatch(now)
+
+            # whichever waiting thread wakes first after the buckets refill dispatches for
+            # everyone, so there's no need for a separate dispatcher thread
+            while not ticket.granted.wait(delay):
+                with self._lock:
+                    delay = self._dispatch(self.clock())
+        finally:
+            slots.release()
+
+    def metrics(self):
+        """Get queue and wait time metrics for each priority.
+
+        :return: dictionary keyed by priority, of dictionaries with the current queue depth,
+            the maximum depth seen, the no. of requests dispatched and the median, 99th
+            percentile and maximum of recent wait times (in seconds)
+
+        """
+        with self._lock:
+            depths = collections.Counter(t.priority for t in self._waiting)
+            metrics = {}
+            for priority in PRIORITIES:
+                waits = sorted(self._waits[priority])
+                metrics[priority] = {
+                    'depth': depths[priority],
+                    'max_depth': self._max_depth[priority],
+                    'n_dispatched': self._n_dispatched[priority],
+                    'wait_p50': waits[len(waits) // 2] if waits else 0.0,
+                    'wait_p99': waits[int(len(waits) * 0.99)] if waits else 0.0,
+                    'wait_max': waits[-1] if waits else 0.0,
+                }
+        return metrics
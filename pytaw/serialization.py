@@ -0,0 +1,52 @@
+import json
+import zlib
+
+from .youtube import resource_from_record
+
+
+# first byte of every encoded batch, so the format can be changed later
+FORMAT_VERSION = 1
+
+
+def encode_resources(resources, level=6):
+    """Encode a batch of resources as compact bytes.
+
+    Only each resource's record (kind, id, etag, fetch time and data parts, see
+    `Resource.to_record()`) is encoded, never the YouTube instance it's attached to, so the
+    result is cheap to send between processes or keep in a cache.  Records are encoded as
+    minimal json and zlib compressed - a batch compresses far better than single resources,
+    since they share most of their keys.
+
+    :param resources: iterable of Resource instances
+    :param level: zlib compression level (0 for none, 9 for smallest)
+    :return: bytes
+
+    """
+    records = [resource.to_record() for resource in resources]
+    payload = json.dumps(records, separators=(',', ':'), ensure_ascii=False).encode()
+    return bytes([FORMAT_VERSION]) + zlib.compress(payload, level)
+
+
+def decode_resources(data, youtube=None):
+    """Decode a batch of resources encoded with `encode_resources()`.
+
+    :param data: bytes
+    :param youtube: YouTube instance to attach the resources to
+    :return: list of Resource instances
+
+    """
+    if not data or data[0] != FORMAT_VERSION:
+        raise ValueError("data wasn't encoded with encode_resources(), or is a different version")
+
+    records = json.loads(zlib.decompress(data[1:]))
+    return [resource_from_record(record, youtube) for record in records]
+
+
+def encode_resource(resource, level=6):
+    """Encode a single resource.  See `encode_resources()`."""
+    return encode_resources([resource], level=level)
+
+
+def decode_resource(data, youtube=None):
+    """Decode a single resource encoded with `encode_resource()`."""
+    return decode_resources(data, youtube=youtube)[0]
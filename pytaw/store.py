@@ -0,0 +1,308 @@
+import json
+import time
+import logging
+import sqlite3
+from datetime import timezone
+
+from .youtube import Resource, resource_from_record
+from .utils import string_to_datetime
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+def connect(path):
+    """Open a sqlite database that can be shared between threads and processes."""
+    connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+def normalise_timestamp(value):
+    """Convert a datetime or api timestamp string to a sortable utc string, e.g. for indexing.
+
+    Most api timestamps are already utc strings like '2005-04-24T03:31:52Z' (or '...52.000Z'),
+    so for speed we handle those without parsing.
+
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value.endswith('Z') and len(value) >= 20:
+            return value[:19] + 'Z'
+        value = string_to_datetime(value)
+    if value.tzinfo is None:
+        value = value.astimezone(timezone.utc)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def normalise_item(item):
+    """Turn a search result item into a resource item.  Other items are returned as they are."""
+    if item['kind'] != 'youtube#searchResult':
+        return item
+
+    kind = item['id'].get('kind', '')
+    id_label = kind.replace('youtube#', '') + 'Id'
+    if id_label not in item['id']:
+        return None
+
+    normalised = {'kind': kind, 'etag': item.get('etag'), 'id': item['id'][id_label]}
+    if 'snippet' in item:
+        normalised['snippet'] = item['snippet']
+    return normalised
+
+
+def record_from_item(item):
+    """Get a resource record (see `Resource.to_record()`) from a Resource or a raw api item.
+
+    :return: record tuple, or None if the item is a search result for something other than a
+        video, channel or playlist
+    """
+    if isinstance(item, Resource):
+        return item.to_record()
+
+    partial = item['kind'] == 'youtube#searchResult'
+    item = normalise_item(item)
+    if item is None:
+        return None
+    kind = item['kind'].replace('youtube#', '')
+    parts = {k: v for k, v in item.items() if k not in ('kind', 'etag', 'id')}
+    return kind, item['id'], item.get('etag'), None, parts, partial
+
+
+class ResourceStore(object):
+    """A local store of videos, channels, playlists and playlist items, in a sqlite database.
+
+    Resources (or raw api items, or whole raw api pages) are upserted: if a resource is already
+    in the store, the parts we've been given are merged into what's there, so that e.g. storing
+    the statistics of a video doesn't lose its snippet.  The etag and fetch time of the latest
+    data are also stored.  Search results are stored as partial resources, whose snippet is
+    never merged over a full one.
+
+    The channel id, playlist id and publication time of each resource are indexed, so we can
+    answer questions like "videos of channel X published after date Y" locally.  Results are
+    returned as pytaw Resources.  If a YouTube instance is given, the Resources can fetch any
+    missing parts from the api as usual.
+
+    The database uses write-ahead logging, so one process can write while others read.
+
+    """
+
+    KINDS = ('video', 'channel', 'playlist', 'playlistItem')
+
+    # columns a resource is read back from
+    COLUMNS = 'kind, id, etag, fetched_at, partial, data'
+
+    def __init__(self, path, youtube=None):
+        """Initialise the store.
+
+        :param path: path of the sqlite database (it's created if it doesn't exist)
+        :param youtube: YouTube instance given to the Resources returned by the store
+
+        """
+        self.path = path
+        self.youtube = youtube
+        self.connection = connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS resources (
+                kind TEXT NOT NULL,
+                id TEXT NOT NULL,
+                etag TEXT,
+                fetched_at REAL NOT NULL,
+                partial INTEGER NOT NULL,
+                channel_id TEXT,
+                playlist_id TEXT,
+                published_at TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (kind, id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS resources_channel
+                ON resources (kind, channel_id, published_at);
+            CREATE INDEX IF NOT EXISTS resources_playlist
+                ON resources (kind, playlist_id, published_at);
+            CREATE INDEX IF NOT EXISTS resources_published
+                ON resources (kind, published_at);
+            CREATE TABLE IF NOT EXISTS cursors (
+                name TEXT PRIMARY KEY,
+                cursor TEXT NOT NULL,
+                saved_at REAL NOT NULL
+            ) WITHOUT ROWID;
+        """)
+
+    def __repr__(self):
+        return f"<ResourceStore '{self.path}'>"
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM resources').fetchone()[0]
+
+    def _row(self, record, fetched_at):
+        """Build a database row from a resource record, or None if we don't store its kind."""
+        kind, id, etag, _, parts, partial = record
+        if kind not in self.KINDS:
+            return None
+
+        item = dict(parts, kind=f'youtube#{kind}', etag=etag, id=id)
+        snippet = parts.get('snippet', {})
+        channel_id = id if kind == 'channel' else snippet.get('channelId')
+        return (
+            kind,
+            id,
+            etag,
+            fetched_at,
+            int(partial),
+            channel_id,
+            snippet.get('playlistId'),
+            normalise_timestamp(snippet.get('publishedAt')),
+            json.dumps(item, separators=(',', ':')),
+        )
+
+    def upsert(self, resources, fetched_at=None):
+        """Add or update resources in the store, in a single transaction.
+
+        :param resources: iterable of Resource instances and/or raw api items.  a raw api page
+            (a dictionary with an 'items' list) or a ListResponse can also be given.
+        :param fetched_at: unix time the data was fetched (default: the fetch time recorded by
+            each Resource, or now for raw items)
+        :return: number of resources stored
+
+        """
+        now = time.time()
+        if isinstance(resources, dict) and 'items' in resources:
+            resources = resources['items']
+
+        rows = []
+        for resource in resources:
+            if resource is None:
+                continue
+            record = record_from_item(resource)
+            if record is None:
+                continue
+
+            row = self._row(record, fetched_at or record[3] or now)
+            if row is not None:
+                rows.append(row)
+
+        # a search result's snippet has less in it than a full one, so it's only merged into
+        # what's there if that's from a search result too
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany("""
+                INSERT INTO resources (kind, id, etag, fetched_at, partial, channel_id,
+                                       playlist_id, published_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, id) DO UPDATE SET
+                    etag = excluded.etag,
+                    fetched_at = excluded.fetched_at,
+                    partial = partial AND excluded.partial,
+                    channel_id = coalesce(excluded.channel_id, channel_id),
+                    playlist_id = coalesce(excluded.playlist_id, playlist_id),
+                    published_at = coalesce(excluded.published_at, published_at),
+                    data = CASE WHEN excluded.partial AND NOT partial
+                        THEN json_patch(data, json_remove(excluded.data, '$.snippet'))
+                        ELSE json_patch(data, excluded.data) END
+            """, rows)
+
+        return len(rows)
+
+    def _resources(self, rows):
+        for kind, id, etag, fetched_at, partial, data in rows:
+            parts = {k: v for k, v in json.loads(data).items() if k not in ('kind', 'etag', 'id')}
+            yield resource_from_record((kind, id, etag, fetched_at, parts, bool(partial)),
+                                       self.youtube)
+
+    def get(self, kind, id):
+        """Get a single resource, or None if it's not in the store.
+
+        :param kind: resource kind, e.g. 'video'
+        :param id: resource id
+
+        """
+        row = self.connection.execute(
+            f'SELECT {self.COLUMNS} FROM resources WHERE kind = ? AND id = ?', (kind, id)
+        ).fetchone()
+        return next(self._resources([row])) if row else None
+
+    def fetched_at(self, kind, id):
+        """Get the unix time a resource was last fetched, or None if it's not in the store."""
+        row = self.connection.execute(
+            'SELECT fetched_at FROM resources WHERE kind = ? AND id = ?', (kind, id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def query(self, kind, channel_id=None, playlist_id=None, published_after=None,
+              published_before=None, newest_first=False, limit=None):
+        """Find resources in the store.
+
+        :param kind: resource kind, e.g. 'video'
+        :param channel_id: only return resources belonging to this channel
+        :param playlist_id: only return resources in this playlist (i.e. playlist items)
+        :param published_after: datetime (inclusive, as in the api)
+        :param published_before: datetime (inclusive)
+        :param newest_first: order by publication time, newest first (default: oldest first)
+        :param limit: maximum number of resources to return
+        :return: generator of Resource instances
+
+        """
+        conditions = ['kind = ?']
+        params = [kind]
+        if channel_id is not None:
+            conditions.append('channel_id = ?')
+            params.append(channel_id)
+        if playlist_id is not None:
+            conditions.append('playlist_id = ?')
+            params.append(playlist_id)
+        if published_after is not None:
+            conditions.append('published_at >= ?')
+            params.append(normalise_timestamp(published_after))
+        if published_before is not None:
+            conditions.append('published_at <= ?')
+            params.append(normalise_timestamp(published_before))
+
+        sql = (f"SELECT {self.COLUMNS} FROM resources WHERE {' AND '.join(conditions)} "
+               f"ORDER BY published_at {'DESC' if newest_first else 'ASC'}")
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        return self._resources(self.connection.execute(sql, params))
+
+    def videos(self, channel_id=None, **kwargs):
+        """Find videos in the store.  See `query()` for keyword arguments."""
+        return self.query('video', channel_id=channel_id, **kwargs)
+
+    def channels(self, **kwargs):
+        """Find channels in the store.  See `query()` for keyword arguments."""
+        return self.query('channel', **kwargs)
+
+    def playlists(self, channel_id=None, **kwargs):
+        """Find playlists in the store.  See `query()` for keyword arguments."""
+        return self.query('playlist', channel_id=channel_id, **kwargs)
+
+    def playlist_items(self, playlist_id, **kwargs):
+        """Find the items of a playlist in the store.  See `query()` for keyword arguments."""
+        return self.query('playlistItem', playlist_id=playlist_id, **kwargs)
+
+    def save_cursor(self, name, cursor):
+        """Save a ListResponse cursor (see `ListResponse.checkpoint()`), replacing any of the
+        same name."""
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO cursors (name, cursor, saved_at) VALUES (?, ?, ?)',
+                (name, json.dumps(cursor, separators=(',', ':')), time.time())
+            )
+
+    def load_cursor(self, name):
+        """Get a saved ListResponse cursor, or None if there isn't one of that name."""
+        row = self.connection.execute(
+            'SELECT cursor FROM cursors WHERE name = ?', (name,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_cursor(self, name):
+        with self.connection:
+            self.connection.execute('DELETE FROM cursors WHERE name = ?', (name,))
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,283 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from .transport import HttpPool
+from .store import connect
+from .youtube import Resource
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+DownloadResult = collections.namedtuple('DownloadResult', ['thumbnail', 'digest', 'status'])
+
+
+def best_thumbnail(thumbnails, width=None):
+    """Choose a thumbnail from a collection of thumbnails (e.g. the sizes given for a video).
+
+    :param thumbnails: list of Thumbnail instances
+    :param width: preferred width.  we choose the narrowest thumbnail at least this wide, or the
+        widest thumbnail if none are wide enough.  if not given, choose the widest.
+    :return: Thumbnail, or None if there are no thumbnails
+
+    """
+    thumbnails = [t for t in thumbnails if t.url]
+    if not thumbnails:
+        return None
+
+    widest = max(thumbnails, key=lambda t: t.width or 0)
+    if width is None:
+        return widest
+
+    wide_enough = [t for t in thumbnails if (t.width or 0) >= width]
+    if not wide_enough:
+        return widest
+    return min(wide_enough, key=lambda t: t.width)
+
+
+class ThumbnailStore(object):
+    """A content-addressed store of thumbnail images on disk.
+
+    Images are stored under their sha256 digest, so an image used by many videos (e.g. a
+    default thumbnail) is only stored once.  An index maps each url to the digest of the image
+    we got from it, along with the http validators (etag, last modified) needed to check
+    whether it's changed.
+
+    """
+
+    def __init__(self, root):
+        """Initialise the store.
+
+        :param root: directory to store images (and the index) in
+
+        """
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.connection = connect(os.path.join(root, 'index.db'))
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            );
+        """)
+
+    def __repr__(self):
+        return f"<ThumbnailStore '{self.root}'>"
+
+    def path(self, digest):
+        """Get the path of the image with the given digest."""
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """Store image data, unless it's already stored.
+
+        :param data: image bytes
+        :return: (digest, is_new) tuple
+
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+
+        # linking is atomic and fails if the image has been stored in the meantime (by another
+        # thread or process), so readers never see a partial file and we never store it twice
+        try:
+            os.link(temp_path, path)
+            return digest, True
+        except FileExistsError:
+            return digest, False
+        finally:
+            os.remove(temp_path)
+
+    def get(self, digest):
+        """Get image data by digest."""
+        with open(self.path(digest), 'rb') as f:
+            return f.read()
+
+    def lookup(self, url):
+        """Get the index entry for a url.
+
+        :return: (digest, etag, last_modified) tuple, or None if we've not fetched the url
+        """
+        with self._lock:
+            return self.connection.execute(
+                'SELECT digest, etag, last_modified FROM urls WHERE url = ?', (url,)
+            ).fetchone()
+
+    def record(self, url, digest, etag=None, last_modified=None):
+        """Add or update the index entry for a url."""
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO urls (url, digest, etag, last_modified, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?)', (url, digest, etag, last_modified, time.time())
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class DownloadStats(object):
+    """Counts for a ThumbnailDownloader."""
+
+    def __init__(self):
+        self.n_requests = 0
+        self.n_downloaded = 0       # new images stored
+        self.n_duplicates = 0       # downloaded, but the image was already stored
+        self.n_not_modified = 0     # conditional request said the image hasn't changed
+        self.n_cached = 0           # already in the store, no request made
+        self.n_failed = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return (f"<DownloadStats requests={self.n_requests} bytes={self.bytes} "
+                f"bytes/s={self.bytes_per_second:.0f} hit_rate={self.hit_rate:.2f}>")
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    @property
+    def hit_rate(self):
+        """Fraction of thumbnails we didn't need to store a new image for."""
+        hits = self.n_duplicates + self.n_not_modified + self.n_cached
+        total = hits + self.n_downloaded + self.n_failed
+        return hits / total if total else 0.0
+
+
+class ThumbnailDownloader(object):
+    """Downloads thumbnails into a ThumbnailStore with a pool of concurrent workers.
+
+    For each collection of thumbnails (e.g. a video's `thumbnails` attribute) we choose one
+    size (see `best_thumbnail()`) and download it.  Urls that are already in the store are
+    skipped, unless `refresh` is set, in which case we make a conditional request and only
+    download the image again if it's changed.
+
+    """
+
+    def __init__(self, store, max_workers=16, width=None, refresh=False, timeout=30):
+        """Initialise the downloader.
+
+        :param store: ThumbnailStore
+        :param max_workers: maximum number of downloads at once
+        :param width: preferred thumbnail width (default: the widest available)
+        :param refresh: whether to check urls that are already in the store for changes
+        :param timeout: socket timeout in seconds
+
+        """
+        self.store = store
+        self.max_workers = max_workers
+        self.width = width
+        self.refresh = refresh
+
+        self.http_pool = HttpPool(max_connections=max_workers, timeout=timeout)
+        self.stats = DownloadStats()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<ThumbnailDownloader max_workers={self.max_workers} {self.stats}>"
+
+    def download(self, thumbnail_collections):
+        """Download a thumbnail from each of a number of collections.
+
+        :param thumbnail_collections: iterable of thumbnail lists, or of Resources with a
+            `thumbnails` attribute
+        :return: generator of DownloadResult tuples, in the order the collections were given.
+            status is one of 'downloaded', 'duplicate', 'not_modified', 'cached' or 'failed'.
+
+        """
+        start = time.time()
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+
+        def fetch(thumbnail):
+            try:
+                return self._fetch(thumbnail)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = collections.deque()
+            for collection in thumbnail_collections:
+                if isinstance(collection, Resource):
+                    collection = collection.thumbnails
+
+                thumbnail = best_thumbnail(collection, width=self.width)
+                if thumbnail is None:
+                    continue
+
+                # limit the number of submitted downloads so we don't hold the whole input
+                slots.acquire()
+                in_flight.append(executor.submit(fetch, thumbnail))
+
+                while in_flight and in_flight[0].done():
+                    yield in_flight.popleft().result()
+
+            for future in in_flight:
+                yield future.result()
+
+        with self._lock:
+            self.stats.seconds += time.time() - start
+
+    def _fetch(self, thumbnail):
+        url = thumbnail.url
+        known = self.store.lookup(url)
+        if known is not None and not self.refresh:
+            self._count('n_cached')
+            return DownloadResult(thumbnail, known[0], 'cached')
+
+        headers = {}
+        if known is not None:
+            digest, etag, last_modified = known
+            if etag:
+                headers['if-none-match'] = etag
+            if last_modified:
+                headers['if-modified-since'] = last_modified
+
+        try:
+            with self.http_pool.connection() as http:
+                response, content = http.request(url, 'GET', headers=headers)
+        except Exception as error:
+            log.warning(f"failed to download thumbnail {url}: {error}")
+            self._count('n_failed', n_requests=1)
+            return DownloadResult(thumbnail, None, 'failed')
+
+        if response.status == 304:
+            self._count('n_not_modified', n_requests=1)
+            return DownloadResult(thumbnail, known[0], 'not_modified')
+
+        if response.status != 200:
+            log.warning(f"failed to download thumbnail {url}: http status {response.status}")
+            self._count('n_failed', n_requests=1)
+            return DownloadResult(thumbnail, None, 'failed')
+
+        digest, is_new = self.store.put(content)
+        self.store.record(url, digest, response.get('etag'), response.get('last-modified'))
+        self._count('n_downloaded' if is_new else 'n_duplicates', n_requests=1,
+                    bytes=len(content))
+        return DownloadResult(thumbnail, digest, 'downloaded' if is_new else 'duplicate')
+
+    def _count(self, counter, **increments):
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+            for name, value in increments.items():
+                setattr(self.stats, name, getattr(self.stats, name) + value)
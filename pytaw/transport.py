@@ -0,0 +1,103 @@
+import queue
+import logging
+import threading
+import contextlib
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+class HttpPool(object):
+    """A bounded pool of keep-alive HTTP connections, safe to share between threads.
+
+    httplib2.Http objects (and so the googleapiclient service built on top of one) must not be
+    used by more than one thread at a time.  Rather than locking around every request, each
+    request checks out an Http object of its own from this pool and returns it afterwards.
+    Connections are created lazily, up to `max_connections`, and are reused last-in-first-out so
+    that the most recently used (and therefore most likely still open) connection is handed out
+    first.  Each Http object keeps its underlying TLS connection alive between requests, so we
+    only pay for a handshake when a new connection is created.
+
+    Responses are gzip-compressed: googleapiclient sends 'accept-encoding: gzip' along with the
+    '(gzip)' user-agent token google requires, and httplib2 decompresses transparently.
+
+    """
+
+    def __init__(self, max_connections=10, timeout=60, credentials=None):
+        """Initialise the pool.
+
+        :param max_connections: maximum number of connections open at any one time.  threads
+            asking for a connection when all of them are checked out will block until one is
+            returned.
+        :param timeout: socket timeout in seconds for each connection
+        :param credentials: optional oauth2client credentials used to authorize each connection
+
+        """
+        if max_connections < 1:
+            raise ValueError(f"max_connections must be at least 1, not {max_connections}")
+
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.credentials = credentials
+
+        self._idle = queue.LifoQueue()
+        self._n_created = 0
+        self._create_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def __repr__(self):
+        return f"<HttpPool max_connections={self.max_connections} created={self._n_created}>"
+
+    def _new_http(self):
+        """Create a new Http object, authorized with our credentials if we have any."""
+        import httplib2     # slow to import, so wait until we need a connection
+
+        http = httplib2.Http(timeout=self.timeout)
+        if self.credentials is not None:
+            http = self.credentials.authorize(http)
+
+        with self._create_lock:
+            self._n_created += 1
+        log.debug(f"opened http connection #{self._n_created}")
+
+        return http
+
+    def acquire(self):
+        """Check out a connection, blocking if all `max_connections` are in use."""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            return self._new_http()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, http):
+        """Return a connection to the pool."""
+        self._idle.put(http)
+        self._slots.release()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Context manager which checks out a connection and returns it when done."""
+        http = self.acquire()
+        try:
+            yield http
+        finally:
+            self.release(http)
+
+    def close(self):
+        """Close all idle connections.  Checked out connections are left alone."""
+        while True:
+            try:
+                http = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            for conn in getattr(http, 'connections', {}).values():
+                conn.close()
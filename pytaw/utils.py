@@ -1,15 +1,21 @@
 import re
+import copy
 import urllib.parse
 import typing
+import threading
 from datetime import datetime, timezone
-
-import dateutil.parser
 import itertools
 
 def string_to_datetime(string):
     if string is None:
         return None
-    else:
+
+    # api timestamps are iso 8601, which datetime can parse directly (and much faster).  fall
+    # back to dateutil, which is slow to import, for anything else.
+    try:
+        return datetime.fromisoformat(string)
+    except ValueError:
+        import dateutil.parser
         return dateutil.parser.parse(string)
 
 
@@ -21,15 +27,94 @@ def datetime_to_string(dt):
     return dt.isoformat()
 
 
+# the common shapes of youtube url, matched in one go.  each group is named after the kind of
+# resource its id is for (with a suffix, since group names must be unique).
+YOUTUBE_URL_PATTERN = re.compile(
+    r"(?:https?://)?(?:(?:www|m|music)\.)?(?:"
+    r"youtube\.com/watch\?(?:[^#]*?&)?v=(?P<video_watch>[\w-]{11})"
+    r"|youtu\.be/(?P<video_short>[\w-]{11})"
+    r"|youtube(?:-nocookie)?\.com/(?:embed|v|shorts|live)/(?P<video_embed>[\w-]{11})"
+    r"|youtube\.com/playlist\?(?:[^#]*?&)?list=(?P<playlist>[\w-]+)"
+    r"|youtube\.com/channel/(?P<channel>UC[\w-]{22})"
+    r"|youtube\.com/(?P<channel_handle>@[\w.-]+)"
+    r"|youtube\.com/user/(?P<channel_username>\w+)"
+    r")(?![\w-])"
+)
+
+# kind of resource for each group of YOUTUBE_URL_PATTERN
+URL_KINDS = {
+    'video_watch': 'video',
+    'video_short': 'video',
+    'video_embed': 'video',
+    'playlist': 'playlist',
+    'channel': 'channel',
+    'channel_handle': 'channel_handle',
+    'channel_username': 'channel_username',
+}
+
+
+def classify_youtube_url(url):
+    """Find the kind of resource a youtube url links to, and its id.
+
+    Watch, youtu.be, embed, shorts and live links are to videos (even if they're in a playlist,
+    as in 'watch?v=...&list=...').  Channels can be linked to by id, by handle (youtube.com/@name)
+    or by legacy username (youtube.com/user/name), which are given as 'channel_handle' (with the
+    '@') and 'channel_username' kinds.
+
+    The common url shapes are matched with a single compiled regex.  Anything else (e.g. a
+    percent-encoded url, or one with its parameters in an unusual order) is parsed properly.
+
+    :param url: url string
+    :return: (kind, id) tuple, where kind is 'video', 'playlist', 'channel', 'channel_handle' or
+        'channel_username', or None if the url isn't recognised
+
+    """
+    match = YOUTUBE_URL_PATTERN.match(url)
+    if match is None and '%' in url:
+        match = YOUTUBE_URL_PATTERN.match(urllib.parse.unquote(url))
+    if match is not None:
+        return URL_KINDS[match.lastgroup], match.group(match.lastgroup)
+
+    # the slow path
+    url_data = urllib.parse.urlparse(urllib.parse.unquote(url.strip()))
+    host = url_data.netloc.lower().rpartition('@')[2].split(':')[0]
+    if host not in ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+                    'youtu.be', 'www.youtube-nocookie.com', 'youtube-nocookie.com'):
+        return None
+    query = urllib.parse.parse_qs(url_data.query)
+    path = url_data.path.strip('/').split('/')
+
+    if host == 'youtu.be':
+        return ('video', path[0]) if path[0] else None
+    if 'v' in query:
+        return 'video', query['v'][0]
+    if path[0] in ('embed', 'v', 'shorts', 'live') and len(path) > 1:
+        return 'video', path[1]
+    if path[0] == 'playlist' and 'list' in query:
+        return 'playlist', query['list'][0]
+    if path[0] == 'channel' and len(path) > 1:
+        return 'channel', path[1]
+    if path[0].startswith('@'):
+        return 'channel_handle', path[0]
+    if path[0] == 'user' and len(path) > 1:
+        return 'channel_username', path[1]
+    return None
+
+
 def youtube_url_to_id(url):
     """Extract video id from a youtube url.
 
-    If parsing fails, try regex.  If that fails, return None.
+    Common urls are recognised quickly by `classify_youtube_url()`.  Otherwise, parse the url,
+    and if that fails, try regex.  If that fails, return None.
 
     The regex is from somewhere in this thread, I think:
         https://stackoverflow.com/questions/3452546/how-do-i-get-the-youtube-video-id-from-a-url
 
     """
+    match = YOUTUBE_URL_PATTERN.match(url)
+    if match is not None and URL_KINDS[match.lastgroup] == 'video':
+        return match.group(match.lastgroup)
+
     url = urllib.parse.unquote(url)
     url_data = urllib.parse.urlparse(url)
     query = urllib.parse.parse_qs(url_data.query)
@@ -89,4 +174,87 @@ def iterate_chunks(iterable: typing.Iterable, chunk_size: int):
         chunk = tuple(itertools.islice(it, chunk_size))
         if not chunk:
             return
-        yield chunk
\ No newline at end of file
+        yield chunk
+
+
+def normalise_api_params(api_params):
+    """Turn a dictionary of api parameters into a hashable key which ignores ordering.
+
+    Comma separated 'part' and 'id' values are sorted, so e.g. part='id,snippet' and
+    part='snippet,id' give the same key.
+
+    """
+    items = []
+    for name, value in api_params.items():
+        if name in ('part', 'id') and isinstance(value, str):
+            value = ','.join(sorted(value.split(',')))
+        items.append((name, str(value)))
+    return tuple(sorted(items))
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls with the same key into a single call.
+
+    The first caller for a key (the leader) makes the call.  Anyone else asking for the same
+    key while the leader's call is in flight waits for it to finish, and gets a copy of the
+    leader's result (or the same exception).  Once the call has finished, the next call for that
+    key is made afresh - nothing is cached.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.n_calls = 0            # no. of calls actually made
+        self.n_coalesced = 0        # no. of calls which waited for someone else's result
+
+    def __repr__(self):
+        return f"<SingleFlight n_calls={self.n_calls} n_coalesced={self.n_coalesced}>"
+
+    def do(self, key, func):
+        """Call func(), unless a call with the same key is already in flight.
+
+        :param key: hashable key identifying the call
+        :param func: function taking no arguments
+        :return: the result of the call
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+                self.n_calls += 1
+            else:
+                self.n_coalesced += 1
+
+        if is_leader:
+            try:
+                call.result = func()
+            except BaseException as error:
+                call.error = error
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+
+        # waiters get their own copy, so nobody can change anybody else's result
+        return copy.deepcopy(call.result)
+
+
+class _Call(object):
+    """A call in flight."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
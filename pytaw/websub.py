@@ -0,0 +1,411 @@
+import hmac
+import time
+import queue
+import hashlib
+import logging
+import secrets
+import threading
+import collections
+import http.server
+import urllib.parse
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+
+from .feeds import parse_atom
+from .scheduler import request_priority, BULK
+from .transport import HttpPool
+
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+# google's hub, which youtube publishes upload notifications to
+HUB_URL = 'https://pubsubhubbub.appspot.com/subscribe'
+
+# atom feed of a channel's uploads, which is the topic we subscribe to
+TOPIC_URL = 'https://www.youtube.com/xml/feeds/videos.xml?channel_id={}'
+
+# no. of recent notifications remembered, so repeats aren't hydrated again
+SEEN_SIZE = 10000
+
+
+class SubscriptionError(Exception):
+    """Exception raised if a hub refuses a subscription request."""
+    pass
+
+
+def topic_url(channel_id):
+    return TOPIC_URL.format(channel_id)
+
+
+def check_signature(secret, body, signature):
+    """Check the X-Hub-Signature of a notification, e.g. 'sha1=<hex digest>'."""
+    if not signature or '=' not in signature:
+        return False
+    method, _, digest = signature.partition('=')
+    if method not in ('sha1', 'sha256', 'sha384', 'sha512'):
+        return False
+    expected = hmac.new(secret.encode(), body, getattr(hashlib, method)).hexdigest()
+    return hmac.compare_digest(expected, digest.lower())
+
+
+class _CallbackHandler(http.server.BaseHTTPRequestHandler):
+    """Handles hub requests to a WebSubSubscriber's callback url."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('content-type', 'text/plain')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        challenge = self.server.subscriber._verify(params)
+        if challenge is None:
+            self._respond(404)
+        else:
+            self._respond(200, challenge.encode())
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('content-length', 0)))
+        self.server.subscriber._notify(body, self.headers.get('x-hub-signature'))
+        # the hub gets a success response even if the notification is rejected, so that a
+        # forger can't tell whether a signature worked
+        self._respond(204)
+
+    def log_message(self, format, *args):
+        log.debug(f"callback {self.address_string()}: {format % args}")
+
+
+class WebSubSubscriber(object):
+    """Receives new uploads as they're published, over WebSub (PubSubHubbub).
+
+    Rather than polling channels for new uploads, we subscribe to each channel's upload feed at
+    youtube's hub, and the hub POSTs a notification to our callback url within seconds of each
+    upload (or change of title or description).  No quota is used until the new videos are
+    hydrated, which is done in batches of up to 50 ids per `videos.list` request.
+
+        >>> subscriber = WebSubSubscriber(youtube, 'http://example.com:8080/', port=8080,
+        ...                               on_videos=print, store=store)
+        >>> with subscriber:
+        ...     subscriber.subscribe(channel_ids)
+        ...     threading.Event().wait()
+
+    The callback server is a plain http server, run in a background thread, which must be
+    reachable by the hub at `callback_url` (e.g. behind a reverse proxy).  Notifications are
+    signed with a secret shared with the hub, and ones with a bad signature are dropped.
+    Subscriptions expire after a lease (of `lease_seconds`, if the hub agrees) and are renewed
+    automatically shortly before they do.
+
+    """
+
+    def __init__(self, youtube, callback_url=None, on_videos=None, on_deleted=None, store=None,
+                 host='', port=0, hub_url=HUB_URL, secret=None, lease_seconds=432000,
+                 parts='snippet,contentDetails,statistics', batch_size=50, batch_delay=2.0,
+                 renew_margin=3600, max_workers=8):
+        """Initialise the subscriber.
+
+        :param youtube: YouTube instance to hydrate new videos with
+        :param callback_url: url the hub sends requests to (default: the callback server's own
+            address, which is only any use with a local hub)
+        :param on_videos: function called with each batch of hydrated Videos
+        :param on_deleted: function called with the AtomEntry of each deleted video
+        :param store: ResourceStore to add hydrated videos to
+        :param host: interface the callback server listens on (default: all)
+        :param port: port the callback server listens on (default: any free port)
+        :param hub_url: url of the hub's subscribe endpoint
+        :param secret: secret for signing notifications (default: a random one)
+        :param lease_seconds: subscription lease we ask the hub for
+        :param parts: parts to fetch for each new video
+        :param batch_size: maximum videos hydrated per request (at most 50)
+        :param batch_delay: seconds to wait for a batch to fill up before hydrating it
+        :param renew_margin: seconds before a lease expires to renew it
+        :param max_workers: maximum number of subscription requests to the hub at once
+
+        """
+        if not 1 <= batch_size <= 50:
+            raise ValueError(f"batch_size must be between 1 and 50, not {batch_size}")
+
+        self.youtube = youtube
+        self.callback_url = callback_url
+        self.on_videos = on_videos
+        self.on_deleted = on_deleted
+        self.store = store
+        self.host = host
+        self.port = port
+        self.hub_url = hub_url
+        self.secret = secret or secrets.token_hex(16)
+        self.lease_seconds = lease_seconds
+        self.parts = parts
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.renew_margin = renew_margin
+        self.max_workers = max_workers
+
+        self.n_notifications = 0
+        self.n_rejected = 0
+        self.n_requests = 0
+        self.n_videos = 0
+
+        self.http_pool = HttpPool(max_connections=max_workers)
+        self._pending = {}          # topic -> mode of our request awaiting verification
+        self._leases = {}           # topic -> unix time the subscription expires
+        self._seen = collections.OrderedDict()
+        self._ids = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+    def __repr__(self):
+        return f"<WebSubSubscriber callback_url={self.callback_url} " \
+               f"subscriptions={len(self._leases)}>"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def address(self):
+        """(host, port) the callback server is listening on."""
+        return self._server.server_address if self._server is not None else None
+
+    def start(self):
+        """Start the callback server, and the threads which hydrate videos and renew leases."""
+        self._stop.clear()
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), _CallbackHandler)
+        self._server.daemon_threads = True
+        self._server.subscriber = self
+        if self.callback_url is None:
+            host, port = self.address[:2]
+            self.callback_url = f"http://{host}:{port}/"
+
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+            threading.Thread(target=self._hydrate_loop, daemon=True),
+            threading.Thread(target=self._renew_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        log.info(f"listening for notifications at {self.callback_url}")
+        return self
+
+    def stop(self):
+        """Stop the callback server, after hydrating any videos still waiting."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._server = None
+        self._threads = []
+
+    def subscriptions(self):
+        """Get the channels we're subscribed to.
+
+        :return: dictionary of the unix time each subscription expires, keyed by channel id
+        """
+        with self._lock:
+            return {urllib.parse.parse_qs(urllib.parse.urlsplit(topic).query)['channel_id'][0]:
+                    expires_at for topic, expires_at in self._leases.items()}
+
+    def subscribe(self, channel_ids):
+        """Subscribe to the uploads of channels.
+
+        The hub confirms each subscription by calling back to us, usually after this returns
+        (see `subscriptions()`).
+
+        :param channel_ids: iterable of channel ids
+        :raises SubscriptionError: if the hub refuses any of the requests
+        """
+        self._request('subscribe', channel_ids)
+
+    def unsubscribe(self, channel_ids):
+        """Unsubscribe from the uploads of channels."""
+        self._request('unsubscribe', channel_ids)
+
+    def renew(self, now=None):
+        """Renew subscriptions which expire within `renew_margin` seconds.
+
+        :return: number of subscriptions renewed
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            topics = [topic for topic, expires_at in self._leases.items()
+                      if expires_at - now < self.renew_margin and topic not in self._pending]
+        if topics:
+            log.info(f"renewing {len(topics)} subscriptions")
+            self._request('subscribe', topics)
+        return len(topics)
+
+    def _request(self, mode, channel_ids):
+        topics = [id if id.startswith('http') else topic_url(id)
+                  for id in dict.fromkeys(channel_ids)]
+        with self._lock:
+            self._pending.update(dict.fromkeys(topics, mode))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            errors = [e for e in executor.map(lambda t: self._send(mode, t), topics) if e]
+        if errors:
+            raise SubscriptionError(f"{len(errors)} of {len(topics)} {mode} requests failed, "
+                                    f"e.g. {errors[0]}")
+
+    def _send(self, mode, topic):
+        """Send a (un)subscribe request to the hub.
+
+        :return: error message, or None if the hub accepted the request
+        """
+        params = {
+            'hub.callback': self.callback_url,
+            'hub.mode': mode,
+            'hub.topic': topic,
+            'hub.verify': 'async',
+            'hub.secret': self.secret,
+            'hub.lease_seconds': str(self.lease_seconds),
+        }
+        headers = {'content-type': 'application/x-www-form-urlencoded'}
+        try:
+            with self.http_pool.connection() as http:
+                response, content = http.request(
+                    self.hub_url, 'POST', body=urllib.parse.urlencode(params), headers=headers
+                )
+        except Exception as error:
+            response, content = None, str(error)
+
+        if response is not None and response.status in (202, 204):
+            return None
+
+        with self._lock:
+            self._pending.pop(topic, None)
+        if response is not None:
+            content = f"http status {response.status}: {content[:200]!r}"
+        log.warning(f"failed to {mode} to {topic}: {content}")
+        return f"{topic}: {content}"
+
+    def _verify(self, params):
+        """Check a verification request from the hub.
+
+        :return: the challenge to echo back if we made the request, else None
+        """
+        mode, topic = params.get('hub.mode'), params.get('hub.topic')
+        with self._lock:
+            if mode == 'denied':
+                log.warning(f"hub denied subscription to {topic}: {params.get('hub.reason')}")
+                self._pending.pop(topic, None)
+                self._leases.pop(topic, None)
+                return ''
+
+            # the hub may re-verify a subscription of its own accord, as well as ones we've
+            # just asked for
+            wanted = self._pending.get(topic) == mode or \
+                (mode == 'subscribe' and topic in self._leases)
+            if not wanted or 'hub.challenge' not in params:
+                log.warning(f"refused unexpected {mode} verification for {topic}")
+                return None
+
+            if self._pending.get(topic) == mode:
+                del self._pending[topic]
+            if mode == 'subscribe':
+                lease = int(params.get('hub.lease_seconds', self.lease_seconds))
+                self._leases[topic] = time.time() + lease
+            else:
+                self._leases.pop(topic, None)
+
+        log.debug(f"verified {mode} to {topic}")
+        return params['hub.challenge']
+
+    def _notify(self, body, signature):
+        """Handle a notification from the hub."""
+        if not check_signature(self.secret, body, signature):
+            log.warning("dropped notification with a bad signature")
+            with self._lock:
+                self.n_rejected += 1
+            return
+
+        try:
+            entries = parse_atom(body)
+        except ElementTree.ParseError as error:
+            log.warning(f"dropped notification which isn't valid xml: {error}")
+            return
+
+        with self._lock:
+            self.n_notifications += 1
+            new_entries = []
+            for entry in entries:
+                # the hub may send the same notification more than once
+                key = (entry.video_id, entry.updated_at, entry.deleted)
+                if key in self._seen:
+                    continue
+                self._seen[key] = None
+                if len(self._seen) > SEEN_SIZE:
+                    self._seen.popitem(last=False)
+                new_entries.append(entry)
+
+        for entry in new_entries:
+            if not entry.deleted:
+                self._ids.put(entry.video_id)
+            elif self.on_deleted is not None:
+                self.on_deleted(entry)
+
+    def _next_batch(self):
+        """Wait for the next batch of video ids to hydrate.
+
+        :return: list of ids (empty if we're stopping and there are none left)
+        """
+        while True:
+            try:
+                ids = [self._ids.get(timeout=0.1)]
+                break
+            except queue.Empty:
+                if self._stop.is_set():
+                    return []
+
+        deadline = time.monotonic() + self.batch_delay
+        while len(dict.fromkeys(ids)) < self.batch_size:
+            try:
+                ids.append(self._ids.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return list(dict.fromkeys(ids))
+
+    def _hydrate_loop(self):
+        while True:
+            ids = self._next_batch()
+            if not ids:
+                return
+            try:
+                self.hydrate(ids)
+            except Exception:
+                log.exception(f"failed to hydrate {len(ids)} new videos")
+
+    def hydrate(self, video_ids):
+        """Fetch new videos, and send them on to the store and `on_videos`.
+
+        :return: list of Videos found
+        """
+        with request_priority(BULK):
+            videos = self.youtube.videos(video_ids, parts=self.parts).found()
+        self.n_requests += 1
+        self.n_videos += len(videos)
+        log.debug(f"hydrated {len(videos)} of {len(video_ids)} notified videos")
+
+        if videos and self.store is not None:
+            self.store.upsert(videos)
+        if videos and self.on_videos is not None:
+            self.on_videos(videos)
+        return videos
+
+    def _renew_loop(self):
+        interval = max(min(self.renew_margin / 4, 60), 0.1)
+        while not self._stop.wait(interval):
+            try:
+                self.renew()
+            except SubscriptionError as error:
+                log.warning(f"failed to renew subscriptions: {error}")
@@ -4,19 +4,24 @@ import time
 import logging
 import configparser
 import collections
+import collections.abc
 import itertools
-from pprint import pprint, pformat
 from abc import ABC, abstractmethod
 import typing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-import googleapiclient.discovery
-from oauth2client.client import AccessTokenCredentials
-
+from .transport import HttpPool
+from .quota import KeyPool, QuotaBudget, DEFAULT_DAILY_QUOTA, quota_cost
+from .scheduler import check_priority, current_priority
 from .utils import (
     datetime_to_string,
     string_to_datetime,
     youtube_duration_to_seconds,
     iterate_chunks,
+    normalise_api_params,
+    SingleFlight,
 )
 
 
@@ -24,8 +29,46 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-class DataMissing(Exception):
-    """Exception raised if data is not found in a Resource data store."""
+def read_config():
+    """Read developer keys from the default config file, if there is one.
+
+    We look for "~/.pytaw.conf" then "/etc/pytaw.conf".  Keys are given in the [youtube] section,
+    either as a single `developer_key` or as a comma separated list of `developer_keys`.
+
+    :return: dictionary with 'developer_keys' and 'daily_quota' entries, or None if there's no
+        config file
+
+    """
+    config_file_path = os.path.join(os.path.expanduser('~'), ".pytaw.conf")
+    if not os.path.exists(config_file_path):
+        config_file_path = "/etc/pytaw.conf"
+
+    if not os.path.exists(config_file_path):
+        return None
+
+    config = configparser.ConfigParser()
+    config.read(config_file_path)
+    section = config['youtube']
+
+    developer_keys = []
+    if 'developer_key' in section:
+        developer_keys.append(section['developer_key'].strip())
+    if 'developer_keys' in section:
+        developer_keys.extend(
+            k.strip() for k in section['developer_keys'].replace('\n', ',').split(',') if k.strip()
+        )
+
+    daily_quota = section.getint('daily_quota', fallback=None)
+    return {'developer_keys': developer_keys, 'daily_quota': daily_quota}
+
+
+class DataMissing(AttributeError):
+    """Exception raised if data is not found in a Resource data store.
+
+    It's an AttributeError, since it's raised by attribute access, so `hasattr()` and `getattr()`
+    with a default work as usual.
+
+    """
     pass
 
 
@@ -37,50 +80,86 @@ class YouTube(object):
 
     """
 
-    def __init__(self, key=None, access_token=None):
+    def __init__(self, key=None, access_token=None, max_connections=10, daily_quota=None,
+                 scheduler=None):
         """Initialise the YouTube class.
 
-        :param key: developer api key (you need to get this from google)
+        A YouTube instance can be shared between threads: each query checks out its own http
+        connection from a pool (see `HttpPool`), so concurrent queries don't interfere.
+
+        Several developer keys can be given (as a list, or in the config file as a comma
+        separated `developer_keys` option).  Queries are then spread over the keys according to
+        how much quota each has left and how many errors it's been giving (see `KeyPool`).
+
+        :param key: developer api key (you need to get this from google), or a list of keys
         :param access_token: access token from some other oauth2 authentication flow
+        :param max_connections: maximum number of http connections to keep open at once
+        :param daily_quota: daily quota of each developer key, in units (default 10,000)
+        :param scheduler: Scheduler deciding when each request may be sent, to rate limit them
+            and let more urgent requests go first (default: send requests straight away)
 
         """
         if key is not None and access_token is not None:
             raise ValueError("you should provide a developer key or an access token, but not both")
 
+        # these are slow to import, so we only do so when a client is actually built
+        import googleapiclient.discovery
+        from oauth2client.client import AccessTokenCredentials
+
         build_kwargs = {
             'serviceName': 'youtube',
             'version': 'v3',
             'cache_discovery': False,    # suppress an annoying warning
         }
 
+        credentials = None
+        self.key_pool = None
+        self.builds = {}
+
         if access_token is not None:
             # build credentials using given access token
             credentials = AccessTokenCredentials(access_token=access_token, user_agent='pytaw')
             build_kwargs['credentials'] = credentials
 
+            self.build = googleapiclient.discovery.build(**build_kwargs)
+
         else:
             # use a develop key, either passed directly or from a config file
             if key is not None:
-                developer_key = key
+                developer_keys = [key] if isinstance(key, str) else list(key)
 
             else:
-                # neither an access token or a key has been given, so look for a developer key in
+                # neither an access token or a key has been given, so look for developer keys in
                 #  the default config file
-                config_file_path = os.path.join(os.path.expanduser('~'), ".pytaw.conf")
-                if not os.path.exists(config_file_path):
-                    config_file_path = "/etc/pytaw.conf"
-                    
-                if os.path.exists(config_file_path):
-                    config = configparser.ConfigParser()
-                    config.read(config_file_path)
-                    developer_key = config['youtube']['developer_key']
-                else:
+                config = read_config()
+                if config is None:
                     raise ValueError("didn't find a developer key or an access token.")
 
-            build_kwargs['developerKey'] = developer_key
+                developer_keys = config['developer_keys']
+                if daily_quota is None:
+                    daily_quota = config['daily_quota']
+
+            self.key_pool = KeyPool(developer_keys, daily_quota=daily_quota or DEFAULT_DAILY_QUOTA)
+
+            # the developer key is baked into a service object, so we need one for each key
+            for developer_key in self.key_pool.keys:
+                self.builds[developer_key] = googleapiclient.discovery.build(
+                    developerKey=developer_key, **build_kwargs
+                )
+            self.build = self.builds[self.key_pool.keys[0]]
+
+        # the service object's own http connection isn't thread safe, so queries are executed
+        # over connections checked out from this pool instead
+        self.http_pool = HttpPool(max_connections=max_connections, credentials=credentials)
 
-        # build_kwargs now contains credentials, or a developer key
-        self.build = googleapiclient.discovery.build(**build_kwargs)
+        # concurrent identical queries share a single request.  single_flight.n_coalesced gives
+        # the number of requests saved.
+        self.single_flight = SingleFlight()
+
+        self.scheduler = scheduler
+
+        # client of a daemon to send queries through instead, if any (see RemoteYouTube)
+        self.remote = None
 
     def __repr__(self):
         return "<YouTube object>"
@@ -113,6 +192,87 @@ class YouTube(object):
         query = Query(self, 'search', api_params)
         return ListResponse(query)
 
+    def search_many(self, searches, max_workers=8, quota_budget=None, max_pages=None,
+                    stream=True):
+        """Run many searches concurrently.
+
+        With `stream` set (the default), results are generated as (search, resource) tuples as
+        soon as each page arrives, where search is the dictionary of parameters given for that
+        search.  Otherwise, a list of ListResponses is returned (in the same order as the
+        searches) with all their pages already fetched.
+
+        Each page of search results costs 100 quota units.  If a quota budget is given, no more
+        pages are fetched once it's used up.
+
+        :param searches: list of dictionaries of search parameters (see `search()`)
+        :param max_workers: maximum number of searches running at once
+        :param quota_budget: maximum number of quota units to use, over all searches
+        :param max_pages: maximum number of pages to fetch for each search
+        :param stream: whether to stream results or return prefetched ListResponses
+        :return: generator of (search, resource) tuples, or list of ListResponses
+
+        """
+        searches = list(searches)
+        budget = QuotaBudget(quota_budget) if quota_budget is not None else None
+        responses = [self.search(**params) for params in searches]
+
+        if not stream:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(
+                    lambda response: response.prefetch(max_pages=max_pages, budget=budget),
+                    responses
+                ))
+            return responses
+
+        return self._stream_searches(searches, responses, max_workers, budget, max_pages)
+
+    def _stream_searches(self, searches, responses, max_workers, budget, max_pages):
+        pages = queue.Queue(maxsize=2 * max_workers)
+        done = object()
+        # set when the consumer stops (or finishes), so searches don't carry on fetching pages
+        # that nobody will read
+        stop = threading.Event()
+
+        def put(entry):
+            # the queue is bounded, so don't block on it after the consumer has gone
+            while not stop.is_set():
+                try:
+                    pages.put(entry, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def fetch(i):
+            try:
+                if stop.is_set():
+                    return
+                for raw in responses[i].raw_pages(max_pages=max_pages, budget=budget):
+                    put((i, raw))
+                    if stop.is_set():
+                        return
+            finally:
+                put((i, done))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch, i) for i in range(len(searches))]
+
+            try:
+                n_running = len(searches)
+                while n_running:
+                    i, raw = pages.get()
+                    if raw is done:
+                        n_running -= 1
+                        # re-raise any error from the search
+                        futures[i].result()
+                        continue
+
+                    for item in raw['items']:
+                        resource = create_resource_from_api_response(self, item)
+                        if resource is not None:
+                            yield searches[i], resource
+            finally:
+                stop.set()
+
     def subscriptions(self, **kwargs):
         """Fetch list of channels that the authenticated user is subscribed to.
 
@@ -149,24 +309,60 @@ class YouTube(object):
         query = Query(self, 'videos', api_params)
         return ListResponse(query).first()
 
-    def videos(self, id_list: typing.Iterable[str], **kwargs):
+    def videos(self, id_list: typing.Iterable[str], parts='snippet', **kwargs):
         """Fetch multiple videos.
 
+        Additional API parameters should be given as keyword arguments.
+
         :param id_list: List of video IDs to fetch
-        :return: Iterable list of video objects.
+        :param parts: part string (or list of parts) to fetch for each video
+        :return: BulkResponse of video objects, in the same order as id_list
+        """
+        return self._fetch_by_ids('videos', id_list, parts, **kwargs)
+
+    def channels(self, id_list: typing.Iterable[str], parts='snippet', **kwargs):
+        """Fetch multiple channels.
+
+        :param id_list: List of channel IDs to fetch
+        :param parts: part string (or list of parts) to fetch for each channel
+        :return: BulkResponse of channel objects, in the same order as id_list
+        """
+        return self._fetch_by_ids('channels', id_list, parts, **kwargs)
+
+    def playlists(self, id_list: typing.Iterable[str], parts='snippet', **kwargs):
+        """Fetch multiple playlists.
+
+        :param id_list: List of playlist IDs to fetch
+        :param parts: part string (or list of parts) to fetch for each playlist
+        :return: BulkResponse of playlist objects, in the same order as id_list
         """
-        response_list = []
-        for id_list_chunk in iterate_chunks(id_list, 50):
+        return self._fetch_by_ids('playlists', id_list, parts, **kwargs)
+
+    def _fetch_by_ids(self, endpoint, id_list, parts, **kwargs):
+        """Fetch resources from an endpoint by id, 50 at a time.
+
+        Duplicate ids are only fetched once.
+
+        :return: BulkResponse
+        """
+        id_list = list(id_list)
+        if not isinstance(parts, str):
+            parts = ','.join(parts)
+
+        resources = dict()
+        for id_list_chunk in iterate_chunks(dict.fromkeys(id_list), 50):
             api_params = {
-                'part': 'id',
+                'part': ','.join(dict.fromkeys(['id'] + parts.split(','))),
                 'id': ','.join(id_list_chunk),
+                'maxResults': 50,
             }
             api_params.update(kwargs)
 
-            query = Query(self, 'videos', api_params)
-            response_list.append(ListResponse(query))
+            raw = Query(self, endpoint, api_params).execute()
+            for item in raw['items']:
+                resources[item['id']] = create_resource_from_api_response(self, item)
 
-        return itertools.chain(response_list)
+        return BulkResponse(id_list, resources)
 
     def channel(self, id, **kwargs):
         """Fetch a Channel instance.
@@ -222,45 +418,95 @@ class YouTube(object):
         query = Query(self, 'playlist_items', api_params)
         return ListResponse(query)
 
+    def comment_threads(self, video_id, **kwargs):
+        """Fetch the comment threads of a video.
+
+        Additional API parameters should be given as keyword arguments.
+
+        :param video_id: youtube video id e.g. 'jNQXAC9IVRw'
+        :return: ListResponse object containing CommentThread instances
+
+        """
+        api_params = {
+            'part': 'id,snippet,replies',
+            'videoId': video_id,
+            'maxResults': 100,
+        }
+        api_params.update(kwargs)
+
+        query = Query(self, 'comment_threads', api_params)
+        return ListResponse(query)
+
+    def comments(self, parent_id, **kwargs):
+        """Fetch the replies to a comment.
+
+        Additional API parameters should be given as keyword arguments.
+
+        :param parent_id: id of the top level comment (which is also the comment thread id)
+        :return: ListResponse object containing Comment instances
+
+        """
+        api_params = {
+            'part': 'id,snippet',
+            'parentId': parent_id,
+            'maxResults': 100,
+        }
+        api_params.update(kwargs)
+
+        query = Query(self, 'comments', api_params)
+        return ListResponse(query)
+
 
 class Query(object):
     """Everything we need to execute a query and retrieve the raw response dictionary."""
 
-    def __init__(self, youtube, endpoint, api_params=None):
+    # name of the googleapiclient resource for each endpoint
+    ENDPOINT_RESOURCES = {
+        'search': 'search',
+        'videos': 'videos',
+        'channels': 'channels',
+        'subscriptions': 'subscriptions',
+        'playlists': 'playlists',
+        'playlist_items': 'playlistItems',
+        'comment_threads': 'commentThreads',
+        'comments': 'comments',
+    }
+
+    def __init__(self, youtube, endpoint, api_params=None, priority=None):
         """Initialise the query.
 
         :param youtube: YouTube instance
         :param endpoint: string giving the api endpoint to query, e.g. 'videos', 'search'...
         :param api_params: dict of keyword parameters to send (directly) to the api
+        :param priority: 'interactive', 'bulk' or 'background', used if the YouTube instance
+            has a Scheduler (default: the current `request_priority()`)
 
         """
         self.youtube = youtube
         self.endpoint = endpoint
         self.api_params = api_params or dict()
+        self.priority = check_priority(priority or current_priority())
 
-        if 'part' not in api_params:
-            api_params['part'] = 'id'
+        if 'part' not in self.api_params:
+            self.api_params['part'] = 'id'
 
-        endpoint_func_mapping = {
-            'search': self.youtube.build.search().list,
-            'videos': self.youtube.build.videos().list,
-            'channels': self.youtube.build.channels().list,
-            'subscriptions': self.youtube.build.subscriptions().list,
-            'playlists': self.youtube.build.playlists().list,
-            'playlist_items': self.youtube.build.playlistItems().list,
-        }
-
-        try:
-            self.query_func = endpoint_func_mapping[self.endpoint]
-        except KeyError:
+        if self.endpoint not in self.ENDPOINT_RESOURCES:
             raise ValueError(f"youtube api endpoint '{self.endpoint}' not recognised.")
 
     def __repr__(self):
         return "<Query '{}' api_params={}>".format(self.endpoint, self.api_params)
 
+    def _list_method(self, build):
+        """Get the 'list' method for our endpoint from a googleapiclient service object."""
+        return getattr(build, self.ENDPOINT_RESOURCES[self.endpoint])().list
+
     def execute(self, api_params=None):
         """Execute the query.
 
+        If the YouTube instance has a pool of developer keys, the query is sent using the key
+        chosen by the pool.  If that key turns out to be out of quota we try again with another,
+        until the pool runs out of keys (and raises QuotaExhausted).
+
         :param api_params: extra api parameters to send with the query.
         :return: api response dictionary
 
@@ -272,11 +518,73 @@ class Query(object):
         else:
             query_params = self.api_params
 
+        # identical queries sent at the same time (e.g. from different threads) are coalesced
+        # into a single request.  only those of the same priority are, so that an interactive
+        # query isn't held back behind an identical bulk one waiting in the scheduler.
+        flight_key = (self.endpoint, normalise_api_params(query_params), self.priority)
+        return self.youtube.single_flight.do(flight_key, lambda: self._execute(query_params))
+
+    def _execute(self, query_params):
+        """Execute the query with the given parameters, using the key pool if there is one."""
         log.debug(f"executing query with {str(query_params)}")
-        return self.query_func(**query_params).execute()
 
+        if self.youtube.remote is not None:
+            # the daemon chooses the key, waits for the scheduler etc. for us
+            return self.youtube.remote.execute(self.endpoint, query_params, self.priority)
+
+        key_pool = self.youtube.key_pool
+        scheduler = self.youtube.scheduler
+        if key_pool is None:
+            if scheduler is not None:
+                scheduler.wait(self.endpoint, priority=self.priority)
+            return self._send(self.youtube.build, query_params)
+
+        # already imported by the time we've got a key pool, since the client has been built
+        from googleapiclient.errors import HttpError
+
+        cost = quota_cost(self.endpoint)
+        while True:
+            key = key_pool.choose(cost)
+            if scheduler is not None:
+                scheduler.wait(self.endpoint, key, priority=self.priority)
+            try:
+                response = self._send(self.youtube.builds[key], query_params)
+            except HttpError as error:
+                if key_pool.record_error(key, error) and len(key_pool) > 1:
+                    continue
+                raise
+
+            key_pool.record_success(key)
+            return response
 
-class ListResponse(collections.Iterator):
+    def pages(self, api_params=None, page_token=None):
+        """Execute the query, yielding each raw page of the response in turn.
+
+        Unlike ListResponse this doesn't create any Resource instances, so it's the cheapest way
+        to page through a large response.
+
+        :param api_params: extra api parameters to send with the query.
+        :param page_token: page token of the page to start from (default: the first page)
+
+        """
+        params = dict(api_params or {})
+        if page_token:
+            params['pageToken'] = page_token
+        while True:
+            raw = self.execute(api_params=params)
+            yield raw
+            if not raw.get('nextPageToken'):
+                return
+            params['pageToken'] = raw['nextPageToken']
+
+    def _send(self, build, query_params):
+        """Send the request over a pooled http connection."""
+        request = self._list_method(build)(**query_params)
+        with self.youtube.http_pool.connection() as http:
+            return request.execute(http=http)
+
+
+class ListResponse(collections.abc.Iterator):
     """Executes a query and creates a data structure containing Resource instances.
 
     When iterated over, this object behaves like an iterator, paging through the results and
@@ -301,21 +609,49 @@ class ListResponse(collections.Iterator):
         self.total_results = None
         self.results_per_page = None
 
+        # raw pages fetched ahead of time (see prefetch()).  these survive _reset(), so the
+        # response can be iterated over again without re-fetching them.
+        self._prefetched = []
+
+        # cursor (see cursor()) the response starts from, if it's been resumed, and the store,
+        # name and interval for saving checkpoints (see checkpoint())
+        self._start = None
+        self._checkpoint = None
+
         self._reset()
 
     def _reset(self):
+        # go back to the start, which is the first page unless we've been resumed from a cursor
+        start = self._start or {}
+
         self._listing = None            # internal storage for current page listing
         self._list_index = None         # index of item within current listing
-        self._no_more_pages = False     # flagged when we reach the end of the available results
-        self._page_count = 0            # no. of pages processed
-        self._item_count = 0            # total no. of items yielded
-        self._next_page_token = None    # api page token required for the next page of results
+        self._page_token = None         # api page token of the current page
+
+        # flagged when we reach the end of the available results
+        self._no_more_pages = start.get('done', False)
+        # no. of pages processed, and total no. of items yielded
+        self._page_count = start.get('n_pages', 0)
+        self._item_count = start.get('n_items', 0)
+        # api page token required for the next page of results
+        self._next_page_token = start.get('page_token')
+        # no. of items to skip on the next page fetched
+        self._skip = start.get('offset', 0)
 
     def __repr__(self):
         return "<ListResponse endpoint='{}', n={}, per_page={}>".format(
             self.query.endpoint, self.total_results, self.results_per_page
         )
 
+    @property
+    def priority(self):
+        """Scheduler priority of the requests for this response's pages."""
+        return self.query.priority
+
+    @priority.setter
+    def priority(self, priority):
+        self.query.priority = check_priority(priority)
+
     def __iter__(self):
         """Allow this object to act as an iterator."""
         return self
@@ -344,6 +680,7 @@ class ListResponse(collections.Iterator):
             log.debug(f"exhausted all results at item {self._item_count} "
                       f"(item {self._list_index + 1} on page {self._page_count})")
             self._no_more_pages = True      # unnecessary but true
+            self._save_checkpoint(done=True)
             raise StopIteration()
 
         # return the resource.  might be None if api response is a "topic" or some bullshit.
@@ -439,21 +776,50 @@ class ListResponse(collections.Iterator):
         else:
             raise KeyError(f"you can't index a ListResponse with '{index}'")
 
+    def by_page(self):
+        """Iterate over the response a page at a time.
+
+        This is the same as iterating over the response itself (checkpoints included, see
+        `checkpoint()`), but the resources of each page are given together as a list.  A page's
+        checkpoint isn't saved until the next page is asked for, so it's only saved once
+        everything in the page has been dealt with.
+
+        :return: generator of lists of Resources
+        """
+        while True:
+            try:
+                page = [next(self)]
+            except StopIteration:
+                return
+            while self._list_index < len(self._listing):
+                page.append(next(self))
+            yield page
+
     def _fetch_next(self):
         """Fetch the next page of the API response and load into memory."""
         if self._no_more_pages:
             # we should only get here if results stop at a page boundary
             log.debug(f"exhausted all results at item {self._item_count} at page boundary "
-                      f"(item {self._list_index + 1} on page {self._page_count})")
+                      f"(page {self._page_count})")
+            self._save_checkpoint(done=True)
             raise StopIteration()
 
+        # every item of the last page has been used, so we've made progress worth saving
+        if self._listing is not None:
+            self._save_checkpoint()
+
         # pass the next page token if this is not the first page we're fetching
         params = dict()
         if self._next_page_token:
             params['pageToken'] = self._next_page_token
 
-        # execute query to get raw response dictionary
-        raw = self.query.execute(api_params=params)
+        # execute query to get raw response dictionary, unless we've already got this page.
+        # prefetched pages start from the first page, so can't be used if we've been resumed.
+        if self._start is None and self._page_count < len(self._prefetched):
+            raw = self._prefetched[self._page_count]
+        else:
+            raw = self.query.execute(api_params=params)
+        self._page_token = self._next_page_token
 
         # the following data shouldn't change, so store only if it's not been set yet
         # (i.e. this is the first fetch)
@@ -471,17 +837,320 @@ class ListResponse(collections.Iterator):
         if self._next_page_token is None:
             self._no_more_pages = True
 
-        # store items in raw format for processing by __next__()
+        # store items in raw format for processing by __next__().  if we've been resumed from
+        # part way through a page, skip the items which have already been used.
         self._listing = raw['items']    # would like a KeyError if this fails (it shouldn't)
-        self._list_index = 0
+        self._list_index = self._skip
+        self._skip = 0
         self._page_count += 1
 
+    def cursor(self):
+        """Get the position of this response, so it can be resumed later with `from_cursor()`.
+
+        The cursor is a dictionary of plain values (so it can be stored as json), giving the
+        query, the page token and offset of the next item, the no. of pages and items used so
+        far and whether the response is finished.
+
+        """
+        if self._listing is None:
+            page_token, offset, n_pages = self._next_page_token, self._skip, self._page_count
+        elif self._list_index < len(self._listing):
+            # part way through the current page
+            page_token, offset, n_pages = self._page_token, self._list_index, self._page_count - 1
+        else:
+            page_token, offset, n_pages = self._next_page_token, 0, self._page_count
+
+        return {
+            'endpoint': self.query.endpoint,
+            'api_params': dict(self.query.api_params),
+            'page_token': page_token,
+            'offset': offset,
+            'n_pages': n_pages,
+            'n_items': self._item_count,
+            'done': self._no_more_pages and (
+                self._listing is None or self._list_index >= len(self._listing)
+            ),
+        }
+
+    @classmethod
+    def from_cursor(cls, youtube, cursor):
+        """Create a response which carries on from a cursor made by `cursor()`.
+
+        Only the pages from the cursor's page on are fetched.  The response starts from the
+        cursor again if it's reset (e.g. by indexing it).
+
+        :param youtube: YouTube instance
+        :param cursor: cursor dictionary
+        :return: ListResponse
+
+        """
+        response = cls(Query(youtube, cursor['endpoint'], dict(cursor['api_params'])))
+        response._resume(cursor)
+        return response
+
+    def _resume(self, cursor):
+        self._start = dict(cursor)
+        self._reset()
+
+    def checkpoint(self, store, name, every=1):
+        """Save the position of this response to a store as it's iterated over.
+
+        If the store already has a checkpoint of this name, the response is resumed from it, so
+        a job which is restarted carries on from its last checkpoint rather than fetching (and
+        paying for) every page again.  A checkpoint is saved after every `every` pages have been
+        used, and when the response is finished.  Items are used at least once: those after the
+        last checkpoint are given again when the job is restarted.
+
+            >>> items = youtube.playlist_items(playlist_id).checkpoint(store, playlist_id)
+            >>> for item in items:
+            ...     process(item)
+
+        :param store: ResourceStore (or anything with `load_cursor()` and `save_cursor()`)
+        :param name: name of the checkpoint
+        :param every: no. of pages between checkpoints
+        :return: this ListResponse
+        :raises ValueError: if the checkpoint is for a different query
+
+        """
+        cursor = store.load_cursor(name)
+        if cursor is not None:
+            if (cursor['endpoint'] != self.query.endpoint or
+                    normalise_api_params(cursor['api_params']) !=
+                    normalise_api_params(self.query.api_params)):
+                raise ValueError(f"checkpoint '{name}' is for a different query: "
+                                 f"{cursor['endpoint']} {cursor['api_params']}")
+            log.debug(f"resuming {self.query} from checkpoint '{name}' at page "
+                      f"{cursor['n_pages']}")
+            self._resume(cursor)
+
+        self._checkpoint = (store, name, every)
+        return self
+
+    def _save_checkpoint(self, done=False):
+        if self._checkpoint is None:
+            return
+        store, name, every = self._checkpoint
+        if done or self._page_count % every == 0:
+            store.save_cursor(name, self.cursor())
+
+    def raw_pages(self, max_pages=None, budget=None):
+        """Fetch the raw pages of the response, from the first page on.
+
+        This doesn't affect iteration over the response.
+
+        :param max_pages: maximum number of pages to fetch
+        :param budget: QuotaBudget to charge each page to.  we stop when it runs out.
+        :return: generator of raw api response dictionaries
+
+        """
+        cost = quota_cost(self.query.endpoint)
+        params = dict()
+        n_pages = 0
+        while max_pages is None or n_pages < max_pages:
+            if budget is not None and not budget.spend(cost):
+                log.debug(f"quota budget exhausted after {n_pages} pages of {self.query}")
+                return
+
+            if n_pages < len(self._prefetched):
+                raw = self._prefetched[n_pages]
+            else:
+                raw = self.query.execute(api_params=params)
+            n_pages += 1
+            yield raw
+
+            if not raw.get('nextPageToken'):
+                return
+            params['pageToken'] = raw['nextPageToken']
+
+    def prefetch(self, max_pages=None, budget=None):
+        """Fetch pages of the response now, rather than as they're needed during iteration.
+
+        If the response has more pages than are prefetched, iteration carries on past the
+        prefetched pages by fetching the rest as usual.
+
+        :param max_pages: maximum number of pages to fetch
+        :param budget: QuotaBudget to charge each page to
+        :return: this ListResponse
+
+        """
+        self._prefetched = list(self.raw_pages(max_pages=max_pages, budget=budget))
+        return self
+
     def first(self):
         try:
             return self[0]
         except IndexError:
             return None
 
+    def pipeline(self):
+        """Start a lazy processing pipeline over this response (see `Pipeline`)."""
+        from .pipeline import Pipeline     # pipeline imports this module
+        return Pipeline(self)
+
+    def filter(self, predicate=None, **conditions):
+        """Start a pipeline which only keeps some resources.  See `Pipeline.filter()`."""
+        return self.pipeline().filter(predicate, **conditions)
+
+    def map(self, function):
+        """Start a pipeline which applies a function to each resource."""
+        return self.pipeline().map(function)
+
+    def join(self, name, parts='snippet'):
+        """Start a pipeline which joins a related resource onto each resource.
+
+        Resources are gathered in batches and their related resources fetched together (see
+        `join_resources()`), so e.g. reading `item.video` for every item of a playlist takes one
+        request per 50 items rather than one per item.
+
+            >>> for item in youtube.playlist_items(playlist_id).join('video', 'contentDetails'):
+            ...     print(item.video.duration)
+
+        :param name: join name, e.g. 'channel' or 'video'
+        :param parts: part string (or list of parts) to fetch for the related resources
+        :return: Pipeline
+
+        """
+        return self.pipeline().join(name, parts)
+
+    def hydrate(self, parts):
+        """Start a pipeline which fetches data parts for the resources in batches.
+
+        This is useful for e.g. search results or subscriptions, which only come with a partial
+        snippet:
+
+            >>> for channel in youtube.subscriptions().hydrate('statistics'):
+            ...     print(channel.n_subscribers)
+
+        :param parts: part string (or list of parts) to fetch
+        :return: Pipeline
+
+        """
+        return self.pipeline().hydrate(parts)
+
+    def batch(self, n):
+        """Start a pipeline which groups resources into lists of up to n."""
+        return self.pipeline().batch(n)
+
+    def take(self, n):
+        """Start a pipeline which stops after n resources."""
+        return self.pipeline().take(n)
+
+
+class BulkResponse(collections.abc.Sequence):
+    """Resources fetched by id, e.g. by `YouTube.videos()`.
+
+    This behaves like a list aligned with the ids that were asked for: the nth item is the
+    resource with the nth id, or None if that resource wasn't found.  Resources can also be
+    looked up by id with `get()`, and `missing` gives the set of ids that weren't found.
+
+    """
+
+    def __init__(self, ids, resources):
+        """Initialise the response.
+
+        :param ids: list of ids that were asked for
+        :param resources: dictionary of the resources found, keyed by id
+
+        """
+        self.ids = ids
+        self.resources = resources
+        self.missing = set(ids).difference(resources)
+
+    def __repr__(self):
+        return f"<BulkResponse n={len(self.ids)} missing={len(self.missing)}>"
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.resources.get(id) for id in self.ids[index]]
+        return self.resources.get(self.ids[index])
+
+    def get(self, id, default=None):
+        """Get a resource by id."""
+        return self.resources.get(id, default)
+
+    def found(self):
+        """Get the resources that were found (once each, in the order they were asked for)."""
+        return [self.resources[id] for id in dict.fromkeys(self.ids) if id in self.resources]
+
+
+def join_resources(youtube, resources, name, parts='snippet'):
+    """Fetch a related resource (e.g. the channel of each video) for many resources at once.
+
+    The ids of the related resources are gathered up and fetched 50 at a time, and each related
+    resource is attached to the resources which refer to it, so that e.g. `video.channel` doesn't
+    need a request of its own.  Resources which don't have a join of this name (see
+    `Resource.JOINS`), or which have already been joined, are left alone.
+
+    :param youtube: YouTube instance
+    :param resources: iterable of Resource instances (Nones are ignored)
+    :param name: join name, e.g. 'channel' or 'video'
+    :param parts: part string (or list of parts) to fetch for the related resources
+    :return: list of the resources given
+
+    """
+    resources = list(resources)
+    to_join = [r for r in resources
+               if r is not None and name in r.JOINS and name not in r._joined]
+
+    # we need the attribute holding each related id, so fetch the part it's in for any resources
+    # which don't have it yet (all together, rather than one by one as the attribute is read)
+    for resource_class in {type(r) for r in to_join}:
+        id_attribute = resource_class.JOINS[name][1]
+        part = resource_class.ATTRIBUTE_DEFS[id_attribute].part
+        hydrate_resources(youtube, [r for r in to_join if type(r) is resource_class
+                                    and id_attribute not in vars(r)], part)
+
+    # resources compare equal by id, so keep (resource, id) pairs rather than a dictionary
+    ids_by_endpoint = collections.defaultdict(list)
+    for resource in to_join:
+        endpoint, id_attribute = resource.JOINS[name]
+        ids_by_endpoint[endpoint].append((resource, getattr(resource, id_attribute)))
+
+    for endpoint, pairs in ids_by_endpoint.items():
+        related = youtube._fetch_by_ids(endpoint, [id for _, id in pairs if id], parts)
+        for resource, id in pairs:
+            resource._joined[name] = related.get(id) if id else None
+
+    return resources
+
+
+def hydrate_resources(youtube, resources, parts):
+    """Fetch data parts for many resources at once, 50 at a time.
+
+    Only resources which are missing one of the parts are fetched.  The new data is merged into
+    each resource in place.
+
+    :param youtube: YouTube instance
+    :param resources: iterable of Resource instances (Nones are ignored)
+    :param parts: part string (or list of parts) to fetch
+    :return: list of the resources given
+
+    """
+    resources = list(resources)
+    if isinstance(parts, str):
+        parts = parts.split(',')
+
+    to_fetch = collections.defaultdict(list)
+    for resource in resources:
+        if resource is not None and any(part not in resource._data for part in parts):
+            to_fetch[type(resource)].append(resource)
+
+    for resource_class, to_hydrate in to_fetch.items():
+        fetched = youtube._fetch_by_ids(resource_class.ENDPOINT, [r.id for r in to_hydrate],
+                                        parts)
+        for resource in to_hydrate:
+            new = fetched.get(resource.id)
+            if new is not None:
+                resource._data.update(new._data)
+                resource._fetched_at = new._fetched_at
+                for part in parts:
+                    resource._update_attributes(part)
+
+    return resources
+
 
 def create_resource_from_api_response(youtube, item):
     """Given a raw item from an API response, return the appropriate Resource instance."""
@@ -509,10 +1178,24 @@ def create_resource_from_api_response(youtube, item):
     elif kind == 'playlist':
         return Playlist(youtube, id, item)
     elif kind == 'subscription':
-        channel_id = item['snippet']['resourceId']['channelId']
-        return Channel(youtube, id=channel_id)
+        # the subscription snippet describes the channel subscribed to, so give the channel that
+        # data as if it were a search result, rather than leaving it to fetch everything itself
+        snippet = item['snippet']
+        channel_id = snippet['resourceId']['channelId']
+        data = {
+            'kind': 'youtube#searchResult',
+            'etag': item.get('etag'),
+            'id': {'kind': 'youtube#channel', 'channelId': channel_id},
+            'snippet': {k: snippet[k] for k in ('title', 'description', 'thumbnails')
+                        if k in snippet},
+        }
+        return Channel(youtube, channel_id, data)
     elif kind == 'playlistItem':
         return PlaylistItem(youtube, id, item)
+    elif kind == 'commentThread':
+        return CommentThread(youtube, id, item)
+    elif kind == 'comment':
+        return Comment(youtube, id, item)
     else:
         raise NotImplementedError(f"can't deal with resource kind '{kind}'")
 
@@ -541,6 +1224,22 @@ class Resource(ABC):
     def ATTRIBUTE_DEFS(self):
         pass
 
+    def __init_subclass__(cls, **kwargs):
+        # compile the attribute plan once per class, rather than for each instance (see
+        # `compile_attribute_plan()`)
+        super().__init_subclass__(**kwargs)
+        if isinstance(cls.ATTRIBUTE_DEFS, dict):
+            cls._ATTRIBUTE_PLAN = compile_attribute_plan(cls.ATTRIBUTE_DEFS)
+
+    @property
+    @abstractmethod
+    def KIND(self):
+        pass
+
+    # related resources which can be fetched in batches with join_resources().  each join name
+    # maps to the endpoint the related resource is fetched from, and the attribute holding its id.
+    JOINS = {}
+
     def __init__(self, youtube, id, data=None):
         """Initialise a Resource object.
 
@@ -575,23 +1274,57 @@ class Resource(ABC):
             self._search_data = {}
             self._data = {}
 
+        # unix time the data was last fetched from the api (or None if we've been given none)
+        self._fetched_at = time.time() if data else None
+
         # this dictionary will log which attributes we've tried to fetch so that we don't get
         # stuck in an infinite loop if something goes badly wrong
         self._tried_to_fetch = {}
 
+        # related resources (see JOINS) we've already fetched, keyed by join name
+        self._joined = {}
+
         # update attributes with whatever we've been given as data
         self._update_attributes()
 
     def __eq__(self, other):
+        # resources are identified by their kind and id, whatever data we happen to have for them
         if isinstance(self, other.__class__):
-            return self.__dict__ == other.__dict__
+            return self.id == other.id
 
         # if they're different classes return NotImplemented instead of False so that we fallback
         #  to the default comparison method
         return NotImplemented
 
     def __hash__(self):
-        return hash(tuple(sorted(self.__dict__.items())))
+        return hash((self.KIND, self.id))
+
+    def __reduce__(self):
+        # pickle as a record, leaving out the youtube instance (use attach() after unpickling)
+        return resource_from_record, (self.to_record(),)
+
+    def to_record(self):
+        """Get the data of this resource as a compact tuple of plain python objects.
+
+        The record is (kind, id, etag, fetched_at, parts, partial), where parts is a dictionary
+        of the api data parts we have (snippet, statistics etc.) and partial is True if we don't
+        have a full snippet, i.e. the snippet (if any) is from a search result.  It can be
+        serialised with json, pickle etc. and turned back into a Resource with
+        `resource_from_record()`.
+
+        """
+        # a search result's snippet, with any parts fetched since over it
+        parts = {}
+        for data in (self._search_data, self._data):
+            parts.update((k, v) for k, v in data.items() if k not in ('kind', 'etag', 'id'))
+        partial = 'snippet' not in self._data
+        etag = (self._data or self._search_data).get('etag')
+        return self.KIND, self.id, etag, self._fetched_at, parts, partial
+
+    def attach(self, youtube):
+        """Attach this resource to a YouTube instance, e.g. after unpickling it."""
+        self.youtube = youtube
+        return self
 
     def __repr__(self):
         n_chars = 16
@@ -604,109 +1337,54 @@ class Resource(ABC):
     def __str__(self):
         return self.title
 
-    def _update_attributes(self):
+    def _update_attributes(self, part=None):
         """Take internally stored raw data and creates attributes with right types etc.
 
         Attributes defined in ATTRIBUTE_DEFS will be added as attributes, if they exist in
-        internal data storage.
-
-        """
-        for attr_name, attr_def in self.ATTRIBUTE_DEFS.items():
-            type_ = attr_def.type_
-            part = attr_def.part
-            if isinstance(attr_def.name, str):
-                # may be a string or list - we want a list
-                keys = [attr_def.name, ]
-            else:
-                keys = attr_def.name
-
-            try:
-                raw_value = self._get(part, *keys)
-            except DataMissing:
-                # if data is missing it basically means one of three things: we've not tried to
-                # fetch it yet, we fetched the right part but it was null and not returned with
-                # the query, or something is badly wrong (e.g. a bad AttributeDef).
-                #
-                # we check for the second case by looking in the data store to see if the part is
-                #  there.  if it is, we set the attribute to show we've fetched and there was
-                # nothing there.
-                #
-                # in the other two cases, just don't set this attribute right now.
-                if self._data.get(part) is not None:
-                    if type_ in ('str', 'string'):
-                        raw_value = ''
-                    elif type_ in ('int', 'integer', 'float'):
-                        raw_value = 0
-                    elif type_ == 'list':
-                        raw_value = []
-                    else:
-                        raw_value = None
-                else:
-                    continue
-
-            if type_ is None:
-                value = raw_value
-            elif type_ in ('str', 'string'):
-                value = str(raw_value)
-            elif type_ in ('int', 'integer'):
-                value = int(raw_value)
-            elif type_ == 'float':
-                value = float(raw_value)
-            elif type_ == 'list':
-                value = list(raw_value)
-            elif type_ == 'datetime':
-                value = string_to_datetime(raw_value)
-            elif type_ == 'timedelta':
-                value = timedelta(seconds=youtube_duration_to_seconds(raw_value))
-            elif type_ == 'thumbnails':
-                value = []
-                for key, val in raw_value.items():
-                    url = val.get('url', None)
-                    width = val.get('width', None)
-                    height = val.get('width', None)
-                    value.append(Thumbnail(key, url, width, height))
-            else:
-                raise TypeError(f"type '{type_}' not recognised.")
-
-            setattr(self, attr_name, value)
-
-    def _get(self, *keys):
-        """Get a data attribute from the stored item response, if it exists.
+        internal data storage.  This is done with the class's compiled attribute plan (see
+        `compile_attribute_plan()`), so each attribute is just a lookup and a conversion.
 
-        If it doesn't, raise DataMissing exception.  This could be because the necessary
-        information was not included in the 'part' argument in the original query, or because
-        youtube doesn't have the information stored (e.g. if country is not set by the user,
-        the key is not present in the API response).
-
-        :param *keys: one or more dictionary keys.  if there's more than one, we'll query
-            them recursively, so _get('a', 'b', 'c') will return
-            self._items['a']['b']['c']
-        :return: the data attribute
+        :param part: only update the attributes in this part, e.g. after fetching it (default:
+            update them all)
 
         """
-        def get_from_nested_dict(dict_, *keys):
-            """Get item from a nested dictionary; raise KeyError if it's not there."""
-            param = dict_
-            for key in keys:
-                param = param[key]
-            return param
+        plan = self._ATTRIBUTE_PLAN
+        if part is None:
+            groups = plan.items()
+        else:
+            groups = ((part, plan.get(part, ())),)
 
-        try:
-            param = get_from_nested_dict(self._data, *keys)
-            return param
-        except KeyError:
-            pass
+        for part, extractors in groups:
+            data_part = self._data.get(part)
+            search_part = self._search_data.get(part)
 
-        try:
-            param = get_from_nested_dict(self._search_data, *keys)
-            return param
-        except KeyError:
-            pass
+            for attr_name, keys, convert, default in extractors:
+                # look for the value in the resource data, then in the search result.  if it's
+                # in neither it basically means one of three things: we've not tried to fetch it
+                # yet, we fetched the right part but it was null and not returned with the
+                # query, or something is badly wrong (e.g. a bad AttributeDef).
+                #
+                # we check for the second case by seeing whether we have the part.  if we do,
+                # we set the attribute to its default to show we've fetched and there was
+                # nothing there.  in the other two cases, just don't set this attribute right now.
+                raw_value = _MISSING
+                for source in (data_part, search_part):
+                    if source is None:
+                        continue
+                    try:
+                        for key in keys:
+                            source = source[key]
+                    except KeyError:
+                        continue
+                    raw_value = source
+                    break
 
-        raise DataMissing(f"attribute with keys {str(keys)} not present in self._data or "
-                          f"self._search_data.  either it doesn't exist, or that part needs "
-                          f"fetching.")
+                if raw_value is _MISSING:
+                    if data_part is None:
+                        continue
+                    raw_value = default
 
+                setattr(self, attr_name, raw_value if convert is None else convert(raw_value))
 
     def __getattr__(self, item):
         """If an attribute hasn't been set, this function tries to fetch and add it.
@@ -728,14 +1406,31 @@ class Resource(ABC):
             raise AttributeError(f"already tried to fetch attribute '{item}'")
 
         # fetch the required part and update to (hopefully) set the required attribute
-        self._fetch(part=self.ATTRIBUTE_DEFS[item].part)
-        self._update_attributes()
+        part = self.ATTRIBUTE_DEFS[item].part
+        self._fetch(part=part)
+        self._update_attributes(part)
         self._tried_to_fetch[item] = True
 
         # now getattr() should access the attribute directly.  if not, we'll get an attribute
         # error from this function because we've logged which items we've tried to fetch.
         return getattr(self, item)
 
+    def _join(self, name):
+        """Get a related resource, fetching it on its own unless it's already been joined.
+
+        :param name: join name, as given in JOINS
+        :return: Resource instance, or None if there's no related resource or it wasn't found
+
+        """
+        if name not in self._joined:
+            endpoint, id_attribute = self.JOINS[name]
+            id = getattr(self, id_attribute)
+            if id:
+                self._joined[name] = self.youtube._fetch_by_ids(endpoint, [id], 'id').get(id)
+            else:
+                self._joined[name] = None
+        return self._joined[name]
+
     def _fetch(self, part):
         """Query the API for a specific data part.
 
@@ -745,6 +1440,10 @@ class Resource(ABC):
         :param part: part string for the API query.
 
         """
+        if self.youtube is None:
+            raise DataMissing(f"can't fetch part '{part}' because this resource isn't attached "
+                              f"to a YouTube instance")
+
         part_string = f"id,{part}"
 
         # get a raw listResponse from youtube
@@ -757,6 +1456,36 @@ class Resource(ABC):
         # get the first resource item and update the internal data storage
         item = response['items'][0]
         self._data.update(item)
+        self._fetched_at = time.time()
+
+
+def resource_from_record(record, youtube=None):
+    """Create a Resource instance from a record made by `Resource.to_record()`.
+
+    :param record: (kind, id, etag, fetched_at, parts, partial) tuple or list
+    :param youtube: YouTube instance to attach the resource to, so it can fetch more data
+    :return: Resource instance
+
+    """
+    kind, id, etag, fetched_at, parts, partial = record
+    resource_class = RESOURCE_CLASSES[kind]
+
+    data = dict(parts)
+    if partial:
+        # the snippet is from a search result, but any other parts are full ones
+        search_data = {'kind': 'youtube#searchResult', 'etag': etag,
+                       'id': {'kind': f'youtube#{kind}', f'{kind}Id': id}}
+        if 'snippet' in data:
+            search_data['snippet'] = data.pop('snippet')
+        resource = resource_class(youtube, id, search_data)
+        if data:
+            resource._data = dict(data, kind=f'youtube#{kind}', etag=etag, id=id)
+            resource._update_attributes()
+    else:
+        resource = resource_class(youtube, id, dict(data, kind=f'youtube#{kind}', etag=etag, id=id))
+
+    resource._fetched_at = fetched_at
+    return resource
 
 
 class AttributeDef(object):
@@ -787,9 +1516,80 @@ class AttributeDef(object):
         self.type_ = type_
 
 
+def _convert_thumbnails(raw_value):
+    return [Thumbnail(key, val.get('url', None), val.get('width', None), val.get('height', None))
+            for key, val in raw_value.items()]
+
+
+def _convert_duration(raw_value):
+    return timedelta(seconds=youtube_duration_to_seconds(raw_value))
+
+
+# functions converting raw api values to attribute values, for each AttributeDef type
+ATTRIBUTE_CONVERTERS = {
+    None: None,
+    'str': str,
+    'string': str,
+    'int': int,
+    'integer': int,
+    'float': float,
+    'list': list,
+    'datetime': string_to_datetime,
+    'timedelta': _convert_duration,
+    'thumbnails': _convert_thumbnails,
+}
+
+# raw values used for attributes missing from a part we've fetched, for each AttributeDef type
+ATTRIBUTE_DEFAULTS = {
+    'str': '',
+    'string': '',
+    'int': 0,
+    'integer': 0,
+    'float': 0,
+    'list': [],
+    'thumbnails': {},
+}
+
+# marks a value which isn't in the data
+_MISSING = object()
+
+
+def compile_attribute_plan(attribute_defs):
+    """Compile attribute definitions into a plan for extracting attributes from api data.
+
+    :param attribute_defs: dictionary of AttributeDefs keyed by attribute name
+    :return: dictionary keyed by part, of lists of (attribute name, keys, converter, default)
+        tuples.  keys is the tuple of dictionary keys leading to the value within the part,
+        converter converts the raw value (or is None if no conversion is needed) and default is
+        the raw value used if the part is there but the value isn't.
+    :raises TypeError: if an attribute's type isn't recognised
+
+    """
+    plan = collections.defaultdict(list)
+    for attr_name, attr_def in attribute_defs.items():
+        if attr_def.type_ not in ATTRIBUTE_CONVERTERS:
+            raise TypeError(f"type '{attr_def.type_}' not recognised.")
+
+        # name may be a string or list - we want a tuple
+        if isinstance(attr_def.name, str):
+            keys = (attr_def.name, )
+        else:
+            keys = tuple(attr_def.name)
+
+        plan[attr_def.part].append((
+            attr_name,
+            keys,
+            ATTRIBUTE_CONVERTERS[attr_def.type_],
+            ATTRIBUTE_DEFAULTS.get(attr_def.type_),
+        ))
+
+    return dict(plan)
+
+
 class Video(Resource):
     """A single YouTube video."""
 
+    KIND = 'video'
     ENDPOINT = 'videos'
     ATTRIBUTE_DEFS = {
         #
@@ -814,6 +1614,9 @@ class Video(Resource):
         'n_favorites': AttributeDef('statistics', 'favoriteCount', type_='int'),
         'n_comments': AttributeDef('statistics', 'commentCount', type_='int'),
     }
+    JOINS = {
+        'channel': ('channels', 'channel_id'),
+    }
 
     @property
     def is_cc(self):
@@ -821,7 +1624,7 @@ class Video(Resource):
 
     @property
     def channel(self):
-        return self.youtube.channel(id=self.channel_id)
+        return self._join('channel')
 
     @property
     def url(self):
@@ -831,6 +1634,7 @@ class Video(Resource):
 class Channel(Resource):
     """A single YouTube channel."""
 
+    KIND = 'channel'
     ENDPOINT = 'channels'
     ATTRIBUTE_DEFS = {
         #
@@ -859,11 +1663,26 @@ class Channel(Resource):
 
     uploads_playlist = property(get_uploads_playlist)
 
-    def most_recent_upload(self):
-        response = self.most_recent_uploads(n=1)
+    def most_recent_upload(self, feed=False):
+        response = self.most_recent_uploads(n=1, feed=feed)
         return response[0]
 
-    def most_recent_uploads(self, n=50):
+    def most_recent_uploads(self, n=None, feed=False):
+        """Get the channel's most recent uploads, newest first.
+
+        :param n: number of uploads (at most 50, or 15 from the feed).  default: as many as
+            possible.
+        :param feed: read the channel's public atom feed rather than searching, which uses no
+            quota (a search costs 100 units).  the videos only have their snippet data until
+            they're hydrated (see `FeedReader`).  raises FeedError if the feed can't be read.
+        """
+        if feed:
+            from .feeds import FeedReader, FEED_SIZE
+            reader = FeedReader(self.youtube, max_workers=1)
+            return reader.recent_uploads(self.id, FEED_SIZE if n is None else n)
+
+        if n is None:
+            n = 50
         if n > 50:
             raise ValueError(f"n must be less than 50, not {n}")
 
@@ -881,6 +1700,7 @@ class Channel(Resource):
 class Playlist(Resource):
     """A single YouTube playlist."""
 
+    KIND = 'playlist'
     ENDPOINT = 'playlists'
     ATTRIBUTE_DEFS = {
         #
@@ -902,6 +1722,8 @@ class Playlist(Resource):
 
 class PlaylistItem(Resource):
     """A playlist item."""
+
+    KIND = 'playlistItem'
     ENDPOINT = 'playlist_items'
     ATTRIBUTE_DEFS = {
         #
@@ -917,10 +1739,95 @@ class PlaylistItem(Resource):
         'resource_kind': AttributeDef('snippet', ['resourceId', 'kind'], type_='str'),
         'resource_video_id': AttributeDef('snippet', ['resourceId', 'videoId'], type_='str'),
     }
+    JOINS = {
+        'video': ('videos', 'resource_video_id'),
+    }
 
     def get_video(self):
         if self.resource_kind == 'youtube#video':
-            return self.youtube.video(self.resource_video_id)
+            return self._join('video')
         return None
 
     video = property(get_video)
+
+
+class CommentThread(Resource):
+    """A top level comment on a video, along with (some of) its replies."""
+
+    KIND = 'commentThread'
+    ENDPOINT = 'comment_threads'
+    ATTRIBUTE_DEFS = {
+        #
+        # snippet
+        'video_id': AttributeDef('snippet', 'videoId', type_='str'),
+        'channel_id': AttributeDef('snippet', 'channelId', type_='str'),
+        'n_replies': AttributeDef('snippet', 'totalReplyCount', type_='int'),
+        'can_reply': AttributeDef('snippet', 'canReply'),
+        'is_public': AttributeDef('snippet', 'isPublic'),
+        '_top_level_comment': AttributeDef('snippet', 'topLevelComment'),
+        #
+        # replies
+        '_replies': AttributeDef('replies', 'comments', type_='list'),
+    }
+
+    @property
+    def top_level_comment(self):
+        data = self._top_level_comment
+        return Comment(self.youtube, data['id'], data)
+
+    @property
+    def title(self):
+        return self.top_level_comment.text
+
+    def get_replies(self):
+        """Get the replies to this thread's comment.
+
+        The api includes up to five replies with each thread.  If that's all of them we use
+        those, otherwise we page through the whole lot with a comments query.
+
+        :return: list of Comment instances, or a ListResponse of them
+
+        """
+        if self.n_replies == 0:
+            return []
+
+        replies = self._replies
+        if len(replies) >= self.n_replies:
+            return [Comment(self.youtube, data['id'], data) for data in replies]
+        return self.youtube.comments(self.id)
+
+    replies = property(get_replies)
+
+
+class Comment(Resource):
+    """A single comment (either a top level comment or a reply)."""
+
+    KIND = 'comment'
+    ENDPOINT = 'comments'
+    ATTRIBUTE_DEFS = {
+        #
+        # snippet
+        'text': AttributeDef('snippet', 'textDisplay', type_='str'),
+        'text_original': AttributeDef('snippet', 'textOriginal', type_='str'),
+        'author_name': AttributeDef('snippet', 'authorDisplayName', type_='str'),
+        'author_channel_id': AttributeDef('snippet', ['authorChannelId', 'value'], type_='str'),
+        'video_id': AttributeDef('snippet', 'videoId', type_='str'),
+        'parent_id': AttributeDef('snippet', 'parentId', type_='str'),
+        'n_likes': AttributeDef('snippet', 'likeCount', type_='int'),
+        'published_at': AttributeDef('snippet', 'publishedAt', type_='datetime'),
+        'updated_at': AttributeDef('snippet', 'updatedAt', type_='datetime'),
+    }
+
+    @property
+    def title(self):
+        return self.text
+
+    @property
+    def is_reply(self):
+        return bool(self.parent_id)
+
+
+# resource classes by kind, as given in api responses (without the 'youtube#' prefix)
+RESOURCE_CLASSES = {
+    cls.KIND: cls for cls in (Video, Channel, Playlist, PlaylistItem, CommentThread, Comment)
+}
@@ -8,5 +8,11 @@ setup(
     license='',
     author='6000hulls',
     author_email='6000hulls@gmail.com',
-    description='PYTAW: Python YouTube API Wrapper'
+    description='PYTAW: Python YouTube API Wrapper',
+    extras_require={
+        'analytics': ['numpy'],
+    },
+    entry_points={
+        'console_scripts': ['pytaw=pytaw.cli:main'],
+    },
 )
@@ -0,0 +1,219 @@
+import copy
+import threading
+
+import pytest
+
+from pytaw import YouTube
+
+
+class FakeService(object):
+    """Stands in for a googleapiclient service object, answering list requests from a dict.
+
+    Data is given as a dictionary of items for each api resource:
+        'videos', 'channels', 'playlists': dictionaries of items keyed by id
+        'playlistItems': dictionary of item lists keyed by playlist id
+        'search': dictionary of search result lists keyed by query (the 'q' parameter)
+        'commentThreads': dictionary of comment thread lists keyed by video id
+        'comments': dictionary of reply lists keyed by parent comment id
+        'subscriptions': list of subscription items
+
+    Only the parts asked for are returned.  Every request is logged in `requests`.  Exceptions
+    put in `errors` are raised instead of answering the next requests, one per request.
+
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.requests = []
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def __getattr__(self, resource_name):
+        if resource_name.startswith('_'):
+            raise AttributeError(resource_name)
+        return lambda: _FakeResource(self, resource_name)
+
+    def requests_to(self, resource_name):
+        return [params for name, params in self.requests if name == resource_name]
+
+
+class _FakeResource(object):
+
+    def __init__(self, service, name):
+        self.service = service
+        self.name = name
+
+    def list(self, **params):
+        return _FakeRequest(self.service, self.name, params)
+
+
+class _FakeRequest(object):
+
+    def __init__(self, service, name, params):
+        self.service = service
+        self.name = name
+        self.params = params
+
+    def execute(self, http=None):
+        with self.service._lock:
+            self.service.requests.append((self.name, self.params))
+            error = self.service.errors.pop(0) if self.service.errors else None
+        if error is not None:
+            raise error
+
+        data = self.service.data.get(self.name, {})
+        parts = set(self.params.get('part', 'id').split(','))
+
+        if 'id' in self.params:
+            ids = self.params['id'].split(',')
+            items = [data[id] for id in ids if id in data]
+        elif self.name == 'playlistItems':
+            items = data.get(self.params['playlistId'], [])
+        elif self.name == 'search':
+            items = data.get(self.params.get('q'), [])
+        elif self.name == 'commentThreads':
+            items = data.get(self.params['videoId'], [])
+        elif self.name == 'comments':
+            items = data.get(self.params['parentId'], [])
+        elif self.name == 'subscriptions':
+            items = data
+        else:
+            items = []
+
+        per_page = int(self.params.get('maxResults', 5))
+        start = int(self.params.get('pageToken', 0))
+        page = items[start:start + per_page]
+
+        response = {
+            'kind': f'youtube#{self.name}ListResponse',
+            'pageInfo': {'totalResults': len(items), 'resultsPerPage': per_page},
+            'items': [
+                {k: copy.deepcopy(v) for k, v in item.items()
+                 if k in ('kind', 'etag', 'id') or k in parts}
+                for item in page
+            ],
+        }
+        if start + per_page < len(items):
+            response['nextPageToken'] = str(start + per_page)
+        return response
+
+
+def video_item(id, channel_id='UC1', title=None, published_at='2020-01-01T00:00:00Z', **parts):
+    item = {
+        'kind': 'youtube#video',
+        'etag': f'etag-{id}',
+        'id': id,
+        'snippet': {
+            'title': title or f'video {id}',
+            'channelId': channel_id,
+            'channelTitle': f'channel {channel_id}',
+            'publishedAt': published_at,
+            'description': '',
+            'tags': [],
+        },
+        'contentDetails': {'duration': 'PT1M'},
+        'statistics': {'viewCount': '100', 'likeCount': '10', 'commentCount': '1'},
+    }
+    item.update(parts)
+    return item
+
+
+def channel_item(id, title=None, uploads=None):
+    return {
+        'kind': 'youtube#channel',
+        'etag': f'etag-{id}',
+        'id': id,
+        'snippet': {'title': title or f'channel {id}', 'description': ''},
+        'contentDetails': {'relatedPlaylists': {'uploads': uploads or f'UU{id[2:]}'}},
+        'statistics': {'viewCount': '1000', 'subscriberCount': '10', 'videoCount': '5'},
+    }
+
+
+def playlist_item_item(playlist_id, video_id, position):
+    return {
+        'kind': 'youtube#playlistItem',
+        'etag': f'etag-{playlist_id}-{position}',
+        'id': f'{playlist_id}-{position}',
+        'snippet': {
+            'title': f'video {video_id}',
+            'playlistId': playlist_id,
+            'position': position,
+            'resourceId': {'kind': 'youtube#video', 'videoId': video_id},
+        },
+        'contentDetails': {'videoId': video_id},
+    }
+
+
+def search_result_item(video_id, title=None, channel_id='UC1',
+                       published_at='2020-01-01T00:00:00Z'):
+    return {
+        'kind': 'youtube#searchResult',
+        'etag': f'etag-search-{video_id}',
+        'id': {'kind': 'youtube#video', 'videoId': video_id},
+        'snippet': {
+            'title': title or f'video {video_id}',
+            'channelId': channel_id,
+            'publishedAt': published_at,
+        },
+    }
+
+
+def comment_item(id, text=None, parent_id=None):
+    snippet = {
+        'textDisplay': text or f'comment {id}',
+        'textOriginal': text or f'comment {id}',
+        'authorDisplayName': 'Arthur',
+        'likeCount': 0,
+        'publishedAt': '2021-01-01T00:00:00Z',
+        'updatedAt': '2021-01-01T00:00:00Z',
+    }
+    if parent_id is not None:
+        snippet['parentId'] = parent_id
+    return {'kind': 'youtube#comment', 'etag': f'etag-{id}', 'id': id, 'snippet': snippet}
+
+
+def comment_thread_item(video_id, id, replies=()):
+    """Make a comment thread, with its replies (only the first five are included, as in the api).
+    """
+    return {
+        'kind': 'youtube#commentThread',
+        'etag': f'etag-{id}',
+        'id': id,
+        'snippet': {
+            'videoId': video_id,
+            'topLevelComment': comment_item(id),
+            'totalReplyCount': len(replies),
+        },
+        'replies': {'comments': [comment_item(reply, parent_id=id) for reply in replies[:5]]},
+    }
+
+
+def subscription_item(channel_id, title=None):
+    return {
+        'kind': 'youtube#subscription',
+        'etag': f'etag-subscription-{channel_id}',
+        'id': f'subscription-{channel_id}',
+        'snippet': {
+            'title': title or f'channel {channel_id}',
+            'description': '',
+            'publishedAt': '2021-01-01T00:00:00Z',
+            'channelId': 'UCme',
+            'resourceId': {'kind': 'youtube#channel', 'channelId': channel_id},
+            'thumbnails': {'default': {'url': f'https://example.com/{channel_id}.jpg'}},
+        },
+    }
+
+
+@pytest.fixture
+def fake_youtube():
+    """Factory for YouTube instances whose requests are answered by a FakeService."""
+
+    def make(data, key='fake-key', **kwargs):
+        youtube = YouTube(key=key, **kwargs)
+        service = FakeService(data)
+        for developer_key in youtube.builds:
+            youtube.builds[developer_key] = service
+        youtube.build = service
+        return youtube, service
+
+    return make
@@ -0,0 +1,115 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from conftest import video_item
+from pytaw.analytics import VideoTable
+from pytaw.store import ResourceStore
+from pytaw.youtube import create_resource_from_api_response
+
+
+DAY = 86400.0
+
+
+def item(id, channel_id='UC1', views=100, likes=10, comments=1, duration='PT1M', tags=(),
+         published_at='2020-01-01T00:00:00Z'):
+    item = video_item(id, channel_id=channel_id, published_at=published_at,
+                      contentDetails={'duration': duration},
+                      statistics={'viewCount': str(views), 'likeCount': str(likes),
+                                  'commentCount': str(comments)})
+    item['snippet']['tags'] = list(tags)
+    return item
+
+
+def table():
+    return VideoTable.from_items([
+        item('v1', views=1000, likes=100, comments=0, duration='PT30S', tags=['Parrot', 'live']),
+        item('v2', views=10, likes=1, comments=1, duration='PT5M', tags=['parrot']),
+        item('v3', channel_id='UC2', views=500, likes=5, comments=5, duration='PT1H1M',
+             tags=['cheese'], published_at='2020-01-11T00:00:00Z'),
+        item('v4', channel_id='UC2', views=0, likes=0, comments=0, duration='PT10M'),
+    ])
+
+
+class TestVideoTable:
+
+    def test_columns(self):
+        t = table()
+        assert len(t) == 4
+        assert list(t.ids) == ['v1', 'v2', 'v3', 'v4']
+        assert list(t.duration) == [30, 300, 3660, 600]
+        assert list(t.n_views) == [1000, 10, 500, 0]
+        assert t.published_at[2] - t.published_at[0] == 10 * DAY
+        assert list(t.channel_names) == ['UC1', 'UC2']
+
+    def test_missing_parts_are_nan_and_not_fetched(self):
+        raw = item('v1')
+        del raw['statistics']
+        video = create_resource_from_api_response(None, raw)
+        t = VideoTable.from_videos([video])
+        assert np.isnan(t.n_views[0])
+        assert t.duration[0] == 60
+
+    def test_rates(self):
+        t = table()
+        now = t.published_at[0] + 100 * DAY
+        assert t.views_per_day(now)[0] == pytest.approx(10.0)
+        assert t.views_per_day(now)[2] == pytest.approx(500 / 90)
+
+        engagement = t.engagement()
+        assert engagement[:3] == pytest.approx([0.1, 0.2, 0.02])
+        assert np.isnan(engagement[3])
+
+    def test_percentiles_and_histogram(self):
+        t = table()
+        assert list(t.percentiles('n_views', (0, 50, 100))) == [0, 255, 1000]
+        assert t.percentiles('engagement', 50) == pytest.approx(0.1)
+
+        counts, edges = t.duration_histogram()
+        assert list(counts) == [1, 0, 1, 1, 0, 1]
+        counts, _ = t.duration_histogram(bins=2)
+        assert counts.sum() == 4
+
+    def test_group_by_channel(self):
+        t = table()
+        channels, views = t.group_by_channel('n_views')
+        assert list(channels) == ['UC1', 'UC2'] and list(views) == [1010, 500]
+        assert list(t.group_by_channel('n_views', 'mean')[1]) == [505, 250]
+        assert list(t.group_by_channel('n_views', 'max')[1]) == [1000, 500]
+        assert list(t.group_by_channel('n_views', 'min')[1]) == [10, 0]
+        # v4 has no views, so no engagement rate to count
+        assert list(t.group_by_channel('engagement', 'count')[1]) == [2, 1]
+
+        with pytest.raises(ValueError):
+            t.group_by_channel('n_views', 'median')
+
+    def test_top_k(self):
+        t = table()
+        assert list(t.top_k(2).ids) == ['v1', 'v3']
+        assert list(t.top_k(10, by='engagement').ids) == ['v2', 'v1', 'v3', 'v4']
+        assert t.top_channels(1) == [('UC1', 1010)]
+        assert [c for c, _ in t.top_channels(2, by='engagement', agg='mean')] == ['UC1', 'UC2']
+
+    def test_tag_frequency(self):
+        t = table()
+        assert t.tag_frequency() == [('parrot', 2), ('live', 1), ('cheese', 1)]
+        assert t.tag_frequency(1) == [('parrot', 2)]
+
+    def test_select_and_concat(self):
+        t = table()
+        short = t[t.duration < 600]
+        assert list(short.ids) == ['v1', 'v2']
+        assert short.tag_frequency() == [('parrot', 2), ('live', 1)]
+        assert t[[2]].tag_frequency() == [('cheese', 1)]
+        assert list(short.channel_names) == ['UC1']
+
+        both = VideoTable.concat([t[[2, 3]], short])
+        assert list(both.ids) == ['v3', 'v4', 'v1', 'v2']
+        assert both.tag_frequency() == [('parrot', 2), ('cheese', 1), ('live', 1)]
+        assert list(both[[3]].group_by_channel()[1]) == [10]
+
+    def test_from_store(self, tmp_path):
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        store.upsert([item('v1', views=7), item('v2', channel_id='UC2', views=3)])
+        t = VideoTable.from_store(store, channel_id='UC2')
+        assert list(t.ids) == ['v2'] and list(t.n_views) == [3]
@@ -0,0 +1,94 @@
+import csv
+import json
+
+from conftest import video_item, channel_item, playlist_item_item, search_result_item
+from test_import import run_python
+from pytaw import cli
+
+
+def cli_data(n_videos=120):
+    return {
+        'videos': {f'v{i}': video_item(f'v{i}') for i in range(n_videos)},
+        'channels': {'UC1': channel_item('UC1')},
+        'playlistItems': {'UU1': [playlist_item_item('UU1', f'v{i}', i)
+                                  for i in range(n_videos)]},
+        'search': {'monty python': [search_result_item(f'v{i}') for i in range(120)]},
+    }
+
+
+def read_ndjson(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestCli:
+
+    def test_uploads(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube(cli_data())
+        output = tmp_path / 'out.ndjson'
+
+        status = cli.main(['--quiet', '-o', str(output), '--parts', 'statistics',
+                           'uploads', 'UC1'], youtube=youtube)
+        assert status == 0
+
+        items = read_ndjson(output)
+        assert sorted(item['id'] for item in items) == sorted(f'v{i}' for i in range(120))
+        assert all(set(item) == {'kind', 'etag', 'id', 'statistics'} for item in items)
+        assert len(service.requests_to('videos')) == 3
+
+    def test_videos_from_urls(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube(cli_data())
+        ids_file = tmp_path / 'ids.txt'
+        ids_file.write_text('v1\nhttps://www.youtube.com/watch?v=v2\n\nhttps://youtu.be/v3\n')
+        output = tmp_path / 'out.csv'
+
+        cli.main(['--quiet', '-o', str(output), '-f', 'csv', 'videos', str(ids_file)],
+                 youtube=youtube)
+
+        with open(output, newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert sorted(row['id'] for row in rows) == ['v1', 'v2', 'v3']
+        assert rows[0]['snippet.channelId'] == 'UC1'
+
+    def test_search_quota_budget(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube(cli_data())
+        output = tmp_path / 'out.ndjson'
+
+        status = cli.main(['--quiet', '-o', str(output), '--quota-budget', '200',
+                           'search', 'monty python'], youtube=youtube)
+        assert status == 1
+        assert len(read_ndjson(output)) == 100
+        assert len(service.requests_to('search')) == 2
+
+    def test_resume(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube(cli_data())
+        ids_file = tmp_path / 'ids.txt'
+        ids_file.write_text('\n'.join(f'v{i}' for i in range(120)))
+        output = tmp_path / 'out.ndjson'
+        progress = tmp_path / 'progress'
+        args = ['--quiet', '-o', str(output), '-r', str(progress), '-c', '1',
+                '--quota-budget', '2', 'videos', str(ids_file)]
+
+        assert cli.main(args, youtube=youtube) == 1
+        assert len(read_ndjson(output)) == 100
+
+        assert cli.main(args, youtube=youtube) == 0
+        assert sorted(item['id'] for item in read_ndjson(output)) == \
+            sorted(f'v{i}' for i in range(120))
+        assert len(service.requests_to('videos')) == 3
+
+    def test_debug_logs_are_not_shown(self, tmp_path):
+        # run in a fresh interpreter, since pytest has already configured logging here
+        ids_file = tmp_path / 'ids.txt'
+        ids_file.write_text('v1\n')
+        code = (
+            "import sys; sys.path.insert(0, 'tests');"
+            "from conftest import FakeService, video_item;"
+            "from pytaw import YouTube, cli;"
+            "youtube = YouTube(key='fake-key');"
+            "youtube.build = youtube.builds['fake-key'] = "
+            "FakeService({'videos': {'v1': video_item('v1')}});"
+            f"cli.main(['--quiet', '-o', {str(tmp_path / 'out.ndjson')!r}, 'videos', "
+            f"{str(ids_file)!r}], youtube=youtube)"
+        )
+        assert run_python(code).stderr == ''
@@ -0,0 +1,49 @@
+import pytest
+
+from conftest import comment_thread_item, comment_item
+from pytaw.comments import CommentHarvester
+
+
+def comment_data():
+    threads = [comment_thread_item('v1', f'c{i}') for i in range(120)]
+    threads[0] = comment_thread_item('v1', 'c0', replies=[f'c0-r{i}' for i in range(7)])
+    return {
+        'commentThreads': {
+            'v1': threads,
+            'v2': [comment_thread_item('v2', f'd{i}', replies=['d-r']) for i in range(3)],
+        },
+        'comments': {'c0': [comment_item(f'c0-r{i}', parent_id='c0') for i in range(7)]},
+    }
+
+
+class TestCommentHarvester:
+
+    def test_harvest(self, fake_youtube):
+        youtube, service = fake_youtube(comment_data())
+        harvester = CommentHarvester(youtube, max_workers=2)
+        comments = list(harvester.harvest(['v1', 'v2']))
+
+        # 120 + 3 threads, 7 replies to c0 (paged separately) and one reply to each of v2's
+        assert len(comments) == harvester.n_comments == 133
+        assert sum(comment.is_reply for comment in comments) == 10
+        assert len(service.requests_to('commentThreads')) == 3
+        assert [params['parentId'] for params in service.requests_to('comments')] == ['c0']
+
+    def test_replies_left_out(self, fake_youtube):
+        youtube, service = fake_youtube(comment_data())
+        harvester = CommentHarvester(youtube, include_replies=False)
+        assert len(list(harvester.harvest(['v2']))) == 3
+        assert service.requests_to('commentThreads')[0]['part'] == 'snippet'
+
+    def test_failing_input(self, fake_youtube):
+        youtube, _ = fake_youtube(comment_data())
+
+        def video_ids():
+            yield 'v2'
+            raise RuntimeError("lost the list of videos")
+
+        comments = []
+        with pytest.raises(RuntimeError, match='lost the list'):
+            for comment in CommentHarvester(youtube).harvest(video_ids()):
+                comments.append(comment)
+        assert len(comments) == 6
@@ -0,0 +1,149 @@
+import pytest
+
+from conftest import playlist_item_item
+from pytaw.crawl import WorkQueue, CrawlWorker, LeaseLost
+from pytaw.store import ResourceStore
+
+
+class TestWorkQueue:
+
+    def test_duplicate_tasks_are_ignored(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / 'queue.db'))
+        queue.put('channel', ['a', 'b', 'a'])
+        queue.put('channel', ['b'])
+        assert queue.counts() == {'pending': 2}
+
+    def test_claim_and_complete(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / 'queue.db'))
+        queue.put('channel', ['a'])
+
+        task = queue.claim('worker-0')
+        assert task.kind == 'channel' and task.value == 'a'
+        assert queue.claim('worker-1') is None
+        assert not queue.is_drained()
+
+        queue.complete(task)
+        assert queue.is_drained()
+
+    def test_work_stealing(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / 'queue.db'), n_shards=4)
+        queue.put('videos', ['x'])
+        shard = queue._shard('x')
+        other_shard = (shard + 1) % 4
+
+        task = queue.claim('worker', shard=other_shard)
+        assert task is not None and task.value == 'x'
+
+    def test_crashed_worker_tasks_are_requeued(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / 'queue.db'))
+        queue.put('channel', ['a', 'b'])
+        queue.claim('worker-0')
+        queue.claim('worker-1')
+
+        assert queue.requeue(worker='worker-0') == 1
+        assert queue.counts() == {'pending': 1, 'claimed': 1}
+
+    def test_failed_tasks_are_retried(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / 'queue.db'))
+        queue.put('channel', ['a'])
+
+        queue.fail(queue.claim('w'), 'oops', max_attempts=2)
+        assert queue.counts() == {'pending': 1}
+        queue.fail(queue.claim('w'), 'oops', max_attempts=2)
+        assert queue.counts() == {'failed': 1}
+
+    def test_claims_are_renewed(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / 'queue.db'))
+        queue.put('channel', ['a'])
+        task = queue.claim('worker-0')
+        queue.connection.execute('UPDATE tasks SET claimed_at = 0')
+
+        assert queue.renew(task, 'worker-0')
+        assert queue.requeue(older_than=60) == 0
+        assert not queue.renew(task, 'worker-1')
+
+
+class FailingStore(ResourceStore):
+    """A store whose upserts start failing after a given number."""
+
+    def __init__(self, path, fail_after):
+        super().__init__(path)
+        self.fail_after = fail_after
+
+    def upsert(self, resources, fetched_at=None):
+        if self.fail_after == 0:
+            raise RuntimeError("disk full")
+        self.fail_after -= 1
+        return super().upsert(resources, fetched_at)
+
+
+class HookedStore(ResourceStore):
+    """A store which calls a function before each upsert."""
+
+    def __init__(self, path, hook):
+        super().__init__(path)
+        self.hook = hook
+
+    def upsert(self, resources, fetched_at=None):
+        self.hook()
+        return super().upsert(resources, fetched_at)
+
+
+def playlist_data():
+    return {'playlistItems': {
+        'PL1': [playlist_item_item('PL1', f'v{i}', i) for i in range(120)]
+    }}
+
+
+class TestCrawlWorker:
+
+    def test_playlist_resumes_from_checkpoint(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube({'playlistItems': {
+            'PL1': [playlist_item_item('PL1', f'v{i}', i) for i in range(120)]
+        }})
+        queue = WorkQueue(str(tmp_path / 'queue.db'))
+        store = FailingStore(str(tmp_path / 'store.db'), fail_after=2)
+        worker = CrawlWorker(youtube, queue, store, 'worker-0')
+
+        with pytest.raises(RuntimeError):
+            worker.crawl_playlist('PL1')
+        assert store.load_cursor('crawl:playlist:PL1')['page_token'] == '100'
+
+        store.fail_after = -1
+        worker.crawl_playlist('PL1')
+        tokens = [params.get('pageToken') for params in service.requests_to('playlistItems')]
+        assert tokens == [None, '50', '100', '100']
+        assert len(store) == 120
+        assert store.load_cursor('crawl:playlist:PL1') is None
+
+    def test_long_tasks_keep_their_claim(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube(playlist_data())
+        queue = WorkQueue(str(tmp_path / 'queue.db'))
+        queue.put('playlist', ['PL1'])
+        requeued = []
+
+        def stall():
+            # dealing with each page takes longer than the lease, but the claim is renewed
+            requeued.append(queue.requeue(older_than=60))
+            queue.connection.execute('UPDATE tasks SET claimed_at = 0')
+
+        store = HookedStore(str(tmp_path / 'store.db'), stall)
+        CrawlWorker(youtube, queue, store, 'worker-0').run()
+        assert requeued[:3] == [0, 0, 0]
+        assert len(service.requests_to('playlistItems')) == 3
+        assert queue.counts() == {'done': 4}
+
+    def test_lost_claims_are_left(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube(playlist_data())
+        queue = WorkQueue(str(tmp_path / 'queue.db'))
+        queue.put('playlist', ['PL1'])
+        store = HookedStore(str(tmp_path / 'store.db'), lambda: None)
+        worker = CrawlWorker(youtube, queue, store, 'worker-0')
+        worker._task = queue.claim('worker-0')
+
+        # another worker takes over the task while the first page is being stored
+        store.hook = lambda: queue.requeue()
+        with pytest.raises(LeaseLost):
+            worker.crawl_playlist('PL1')
+        assert len(service.requests_to('playlistItems')) == 1
+        assert store.load_cursor('crawl:playlist:PL1') is None
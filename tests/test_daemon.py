@@ -0,0 +1,180 @@
+import os
+import json
+import stat
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from conftest import video_item, search_result_item
+from test_import import run_python, HEAVY_MODULES
+from pytaw import cli
+from pytaw.daemon import Daemon, DaemonClient, DaemonError, RemoteYouTube, ResponseCache, \
+    _raise_error
+from pytaw.quota import QuotaExhausted, error_reasons
+
+
+def daemon_data():
+    return {
+        'videos': {f'v{i}': video_item(f'v{i}', title=f'video {i}') for i in range(60)},
+        'search': {'parrot': [search_result_item(f'v{i}') for i in range(3)]},
+    }
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / 'pytaw.sock')
+
+
+@pytest.fixture
+def daemon(fake_youtube, socket_path):
+    youtube, service = fake_youtube(daemon_data(), daily_quota=150)
+    with Daemon(youtube, path=socket_path) as daemon:
+        daemon.service = service
+        yield daemon
+
+
+class TestResponseCache:
+
+    def test_expiry_and_eviction(self):
+        cache = ResponseCache(max_entries=2, ttl=10)
+        cache.put('a', 1, now=0)
+        cache.put('b', 2, now=0)
+        assert cache.get('a', now=5) == 1
+        cache.put('c', 3, now=5)      # evicts b, the least recently used
+        assert cache.get('b', now=5) is None
+        assert cache.get('a', now=11) is None
+        assert cache.get('c', now=11) == 3
+        assert (cache.n_hits, cache.n_misses) == (2, 2)
+
+        uncached = ResponseCache(ttl=0)
+        uncached.put('a', 1)
+        assert uncached.get('a') is None
+
+
+class TestDaemon:
+
+    def test_remote_queries(self, daemon, socket_path):
+        youtube = RemoteYouTube(socket_path)
+        video = youtube.video('v1', part='snippet')
+        assert video.title == 'video 1'
+
+        # resources fetch missing data through the daemon too
+        assert video.n_views == 100
+
+        videos = youtube.videos([f'v{i}' for i in range(60)])
+        assert [v.id for v in videos] == [f'v{i}' for i in range(60)]
+        assert [r.id for r in youtube.search(q='parrot')] == ['v0', 'v1', 'v2']
+        assert len(daemon.service.requests_to('videos')) == 4
+
+    def test_shared_cache(self, daemon, socket_path):
+        first, second = RemoteYouTube(socket_path), RemoteYouTube(socket_path)
+        assert first.video('v1').id == 'v1'
+        assert second.video('v1').id == 'v1'
+        assert len(daemon.service.requests_to('videos')) == 1
+
+        status = second.status()
+        assert status['n_requests'] == 2
+        assert status['cache'] == {'size': 1, 'n_hits': 1, 'n_misses': 1}
+        assert status['quota_remaining'] == 149
+
+    def test_concurrent_clients(self, daemon, socket_path):
+        youtube = RemoteYouTube(socket_path, max_connections=4)
+        results = []
+
+        def fetch(i):
+            results.append(youtube.videos([f'v{j}' for j in range(i, i + 5)]).found())
+
+        threads = [threading.Thread(target=fetch, args=(i,)) for i in range(0, 50, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(v.id for found in results for v in found) == \
+            sorted(f'v{i}' for i in range(50))
+
+    def test_errors(self, daemon, socket_path):
+        youtube = RemoteYouTube(socket_path)
+        youtube.search(q='parrot').first()
+
+        # the daemon's key has 49 units left, not enough for another search
+        with pytest.raises(QuotaExhausted):
+            youtube.search(q='parrot', order='date').first()
+
+        with pytest.raises(DaemonError, match='unknown method'):
+            DaemonClient(socket_path).call('delete_everything')
+
+        with pytest.raises(DaemonError, match='is it running'):
+            RemoteYouTube(socket_path + '.missing').video('v1')
+
+    def test_http_errors_are_raised_again(self):
+        from googleapiclient.errors import HttpError
+
+        content = json.dumps({'error': {'errors': [{'reason': 'commentsDisabled'}]}})
+        with pytest.raises(HttpError) as error:
+            _raise_error({'type': 'HttpError', 'message': '', 'status': 403,
+                          'content': content, 'uri': None})
+        assert error.value.resp.status == 403
+        assert error_reasons(error.value) == ['commentsDisabled']
+
+    def test_reconnect_after_restart(self, fake_youtube, socket_path):
+        youtube, _ = fake_youtube(daemon_data())
+        remote = RemoteYouTube(socket_path)
+        with Daemon(youtube, path=socket_path):
+            assert remote.video('v1').id == 'v1'
+            with pytest.raises(DaemonError, match='already listening'):
+                Daemon(youtube, path=socket_path).start()
+        with Daemon(youtube, path=socket_path):
+            assert remote.video('v2').id == 'v2'
+
+    def test_stale_connections_are_dropped(self, daemon, socket_path):
+        client = DaemonClient(socket_path)
+        for _ in range(3):
+            sock, peer = socket.socketpair()
+            peer.close()
+            client._idle.put((sock, sock.makefile('rb')))
+        assert client.ping()
+        assert client._idle.qsize() == 1
+
+    def test_default_socket_is_private(self, fake_youtube, tmp_path, monkeypatch):
+        monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+        monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+        youtube, _ = fake_youtube(daemon_data())
+        with Daemon(youtube) as daemon:
+            directory = os.path.dirname(daemon.path)
+            assert directory == str(tmp_path / f'pytaw-{os.getuid()}')
+            assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+            assert stat.S_IMODE(os.stat(daemon.path).st_mode) == 0o600
+            assert RemoteYouTube().video('v1').id == 'v1'
+
+    def test_other_users_sockets_are_refused(self, daemon, socket_path, monkeypatch):
+        uid = os.getuid()
+        monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+        with pytest.raises(DaemonError, match='refusing'):
+            RemoteYouTube(socket_path).video('v1')
+        with pytest.raises(DaemonError, match='refusing'):
+            Daemon(daemon.youtube, path=socket_path).start()
+
+    def test_client_is_light(self):
+        code = (
+            "import sys, pytaw;"
+            "pytaw.RemoteYouTube('/nonexistent.sock');"
+            "print(','.join(sorted({m.split('.')[0] for m in sys.modules})))"
+        )
+        imported = set(run_python(code).stdout.strip().split(','))
+        assert imported.isdisjoint(HEAVY_MODULES)
+
+    def test_cli(self, daemon, socket_path, tmp_path, capsys):
+        ids_file = tmp_path / 'ids.txt'
+        ids_file.write_text('v1\nv2\n')
+        output = tmp_path / 'out.ndjson'
+
+        status = cli.main(['--quiet', '--remote', '--socket', socket_path, '-o', str(output),
+                           'videos', str(ids_file)])
+        assert status == 0
+        with open(output) as f:
+            assert sorted(json.loads(line)['id'] for line in f) == ['v1', 'v2']
+
+        assert cli.main(['--socket', socket_path, 'daemon', '--status']) == 0
+        assert json.loads(capsys.readouterr().out)['n_requests'] == 1
@@ -0,0 +1,155 @@
+import threading
+import http.server
+import urllib.parse
+
+import pytest
+
+from conftest import video_item
+from pytaw import feeds
+from pytaw.feeds import FeedReader, FeedError, parse_atom
+from pytaw.youtube import Channel
+
+
+def feed(channel_id, video_ids):
+    entries = ''.join(f"""
+        <entry>
+            <id>yt:video:{id}</id>
+            <yt:videoId>{id}</yt:videoId>
+            <yt:channelId>{channel_id}</yt:channelId>
+            <title>video {id}</title>
+            <author><name>channel {channel_id}</name></author>
+            <published>2021-01-0{len(video_ids) - i}T00:00:00+00:00</published>
+            <updated>2021-01-0{len(video_ids) - i}T00:00:00+00:00</updated>
+            <media:group>
+                <media:title>video {id}</media:title>
+                <media:thumbnail url="https://i.ytimg.com/vi/{id}/hqdefault.jpg" width="480"
+                                 height="360"/>
+                <media:description>all about {id}</media:description>
+            </media:group>
+        </entry>""" for i, id in enumerate(video_ids))
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+        <feed xmlns:yt="http://www.youtube.com/xml/schemas/2015"
+              xmlns:media="http://search.yahoo.com/mrss/" xmlns="http://www.w3.org/2005/Atom">
+            <title>channel {channel_id}</title>
+            {entries}
+        </feed>""".encode()
+
+
+FEEDS = {
+    'UC1': feed('UC1', ['v3', 'v2', 'v1']),
+    'UC2': feed('UC2', ['w1']),
+    'UCbroken': b'<feed',
+}
+
+
+class FeedHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_GET(self):
+        channel_id = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)['channel_id'][0]
+        FeedHandler.requests.append((channel_id, self.headers.get('if-none-match')))
+
+        etag = f'"{channel_id}"'
+        if channel_id not in FEEDS:
+            status, body = 404, b''
+        elif self.headers.get('if-none-match') == etag:
+            status, body = 304, b''
+        else:
+            status, body = 200, FEEDS[channel_id]
+
+        self.send_response(status)
+        self.send_header('etag', etag)
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feed_url():
+    FeedHandler.requests = []
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/feeds/videos.xml?channel_id={{}}"
+    httpd.shutdown()
+
+
+class TestFeeds:
+
+    def test_parse_feed(self):
+        entries = parse_atom(FEEDS['UC1'])
+        assert [e.video_id for e in entries] == ['v3', 'v2', 'v1']
+        assert entries[0].channel_title == 'channel UC1'
+        assert entries[0].description == 'all about v3'
+        assert entries[0].thumbnails['high']['width'] == 480
+
+    def test_read_feeds(self, feed_url, fake_youtube):
+        youtube, service = fake_youtube({})
+        reader = FeedReader(youtube, max_workers=4, feed_url=feed_url)
+
+        results = list(reader.read(['UC1', 'UC2', 'UCmissing', 'UCbroken']))
+        assert [r.channel_id for r in results] == ['UC1', 'UC2', 'UCmissing', 'UCbroken']
+        assert [r.status for r in results] == ['fetched', 'fetched', 'failed', 'failed']
+        assert reader.n_failed == 2
+
+        video = results[0].videos[0]
+        assert (video.id, video.title, video.channel_id) == ('v3', 'video v3', 'UC1')
+        assert video.published_at.day == 3
+        assert video.description == 'all about v3'
+        assert service.requests == []
+
+    def test_conditional_requests(self, feed_url):
+        reader = FeedReader(feed_url=feed_url)
+        reader.recent_uploads('UC1')
+        uploads = reader.recent_uploads('UC1', n=2)
+
+        # the second read only gets a 304, and gives the entries remembered from the first
+        assert [video.id for video in uploads] == ['v3', 'v2']
+        assert FeedHandler.requests == [('UC1', None), ('UC1', '"UC1"')]
+        assert reader.n_not_modified == 1
+
+        with pytest.raises(ValueError):
+            reader.recent_uploads('UC1', n=20)
+
+    def test_hydrate_on_demand(self, feed_url, fake_youtube):
+        youtube, service = fake_youtube({'videos': {
+            id: video_item(id, channel_id='UC1', title=f'full {id}') for id in ('v1', 'v2', 'v3')
+        }})
+        reader = FeedReader(youtube, feed_url=feed_url)
+        videos = reader.recent_uploads('UC1')
+
+        reader.hydrate(videos, 'contentDetails,statistics')
+        assert len(service.requests_to('videos')) == 1
+        assert [video.n_views for video in videos] == [100, 100, 100]
+        assert videos[0].title == 'video v3'
+
+        # a single stub fetches what it's missing by itself
+        stub = reader.recent_uploads('UC1', n=1)[0]
+        assert stub.duration.total_seconds() == 60
+        assert len(service.requests_to('videos')) == 2
+
+    def test_channel_most_recent_uploads(self, feed_url, fake_youtube, monkeypatch):
+        monkeypatch.setattr(feeds, 'FEED_URL', feed_url)
+        youtube, service = fake_youtube({})
+        channel = Channel(youtube, 'UC1')
+
+        assert channel.most_recent_upload(feed=True).id == 'v3'
+        assert [v.id for v in channel.most_recent_uploads(n=2, feed=True)] == ['v3', 'v2']
+        assert [v.id for v in channel.most_recent_uploads(feed=True)] == ['v3', 'v2', 'v1']
+        assert service.requests_to('search') == []
+
+    def test_unreadable_feed(self, feed_url, fake_youtube, monkeypatch):
+        monkeypatch.setattr(feeds, 'FEED_URL', feed_url)
+        youtube, _ = fake_youtube({})
+        with pytest.raises(FeedError):
+            Channel(youtube, 'UCmissing').most_recent_upload(feed=True)
+
+        # nothing is listening on the port the reader is pointed at
+        reader = FeedReader(feed_url='http://127.0.0.1:9/{}')
+        with pytest.raises(FeedError):
+            reader.recent_uploads('UC1')
+        assert reader.n_failed == 1
@@ -0,0 +1,120 @@
+import pytest
+
+from conftest import video_item, channel_item, playlist_item_item
+from pytaw.graph import GraphCrawler, VisitedSet, Node, Edge
+
+
+def playlist(id, channel_id):
+    return {'kind': 'youtube#playlist', 'id': id, 'snippet': {'channelId': channel_id}}
+
+
+def graph_data():
+    # UC1 uploaded v0..v54, and its uploads playlist has five videos from UC2 in it too
+    video_ids = [f'v{i}' for i in range(60)]
+    return {
+        'channels': {id: channel_item(id) for id in ('UC1', 'UC2')},
+        'playlists': {'UU1': playlist('UU1', 'UC1'), 'UU2': playlist('UU2', 'UC2')},
+        'playlistItems': {
+            'UU1': [playlist_item_item('UU1', id, i) for i, id in enumerate(video_ids)],
+            'UU2': [playlist_item_item('UU2', 'w0', 0)],
+        },
+        'videos': dict(
+            {id: video_item(id, channel_id='UC1' if i < 55 else 'UC2')
+             for i, id in enumerate(video_ids)},
+            w0=video_item('w0', channel_id='UC2'),
+        ),
+    }
+
+
+class TestVisitedSet:
+
+    def test_membership(self):
+        visited = VisitedSet(capacity=10000, error_rate=1e-3)
+        for i in range(10000):
+            visited.add(f'video:{i}')
+        assert 9950 < len(visited) <= 10000       # an add can be a false positive too
+        assert all(f'video:{i}' in visited for i in range(10000))
+
+        false_positives = sum(f'channel:{i}' in visited for i in range(10000))
+        assert false_positives < 50
+
+        # about 14 bits per node
+        assert len(visited._bits) < 20000
+
+    def test_bad_arguments(self):
+        with pytest.raises(ValueError):
+            VisitedSet(error_rate=1)
+
+
+class TestGraphCrawler:
+
+    def test_crawl(self, fake_youtube):
+        youtube, service = fake_youtube(graph_data())
+        crawler = GraphCrawler(youtube, max_depth=2, video_parts='statistics')
+        stream = list(crawler.crawl(channels=['UC1']))
+
+        nodes = [thing for thing in stream if isinstance(thing, Node)]
+        edges = {thing for thing in stream if isinstance(thing, Edge)}
+        assert {(node.kind, node.id, node.depth) for node in nodes} == \
+            {('channel', 'UC1', 0), ('playlist', 'UU1', 1)} | \
+            {('video', f'v{i}', 2) for i in range(60)}
+        assert nodes[-1].item['statistics']['viewCount'] == '100'
+
+        assert Edge(('channel', 'UC1'), 'uploads', ('playlist', 'UU1')) in edges
+        assert Edge(('playlist', 'UU1'), 'owned_by', ('channel', 'UC1')) in edges
+        assert Edge(('playlist', 'UU1'), 'contains', ('video', 'v59')) in edges
+        assert Edge(('video', 'v59'), 'uploaded_by', ('channel', 'UC2')) in edges
+        assert len(edges) == 122
+
+        # each level is fetched in batches: 60 videos take two requests, not sixty
+        assert len(service.requests_to('videos')) == 2
+        assert len(service.requests_to('playlistItems')) == 2
+        assert crawler.n_requests == 6
+
+    def test_deeper_crawl(self, fake_youtube):
+        youtube, _ = fake_youtube(graph_data())
+        crawler = GraphCrawler(youtube, max_depth=5)
+        nodes = [thing for thing in crawler.crawl(videos=['v59']) if isinstance(thing, Node)]
+        assert [(node.kind, node.id, node.depth) for node in nodes] == [
+            ('video', 'v59', 0), ('channel', 'UC2', 1), ('playlist', 'UU2', 2), ('video', 'w0', 3)
+        ]
+
+    def test_max_playlist_items(self, fake_youtube):
+        youtube, _ = fake_youtube(graph_data())
+        crawler = GraphCrawler(youtube, max_depth=1, max_playlist_items=10)
+        nodes = [thing for thing in crawler.crawl(playlists=['UU1']) if isinstance(thing, Node)]
+        assert sorted(node.id for node in nodes if node.kind == 'video') == \
+            sorted(f'v{i}' for i in range(10))
+
+    def test_budget(self, fake_youtube):
+        youtube, service = fake_youtube(graph_data())
+        crawler = GraphCrawler(youtube, max_depth=5, quota_budget=3, max_workers=1)
+        list(crawler.crawl(channels=['UC1']))
+        assert crawler.budget_exhausted
+        assert len(service.requests) == crawler.budget.spent == 3
+
+    def test_visited_is_shared(self, fake_youtube):
+        youtube, service = fake_youtube(graph_data())
+        first = GraphCrawler(youtube, max_depth=0)
+        assert len(list(first.crawl(channels=['UC1']))) == 2
+        second = GraphCrawler(youtube, max_depth=0, visited=first.visited)
+        assert list(second.crawl(channels=['UC1'])) == []
+        assert len(service.requests) == 1
+
+    def test_resume(self, fake_youtube):
+        # nodes past max_depth aren't marked visited, so a later crawl can carry on to them
+        youtube, _ = fake_youtube(graph_data())
+        first = GraphCrawler(youtube, max_depth=0)
+        list(first.crawl(channels=['UC1']))
+        second = GraphCrawler(youtube, max_depth=0, visited=first.visited)
+        assert [thing.id for thing in second.crawl(playlists=['UU1'])
+                if isinstance(thing, Node)] == ['UU1']
+
+        # nor are nodes left out when the budget ran out
+        youtube, _ = fake_youtube(graph_data())
+        first = GraphCrawler(youtube, max_depth=5, quota_budget=1)
+        assert len(list(first.crawl(channels=['UC1']))) == 2
+        second = GraphCrawler(youtube, max_depth=1, visited=first.visited)
+        nodes = [thing for thing in second.crawl(playlists=['UU1']) if isinstance(thing, Node)]
+        assert 'channel:UC1' in first.visited
+        assert len(nodes) == 61
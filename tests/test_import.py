@@ -0,0 +1,47 @@
+import os
+import sys
+import subprocess
+
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules which are slow to import, and shouldn't be imported until they're needed
+HEAVY_MODULES = ('googleapiclient', 'oauth2client', 'httplib2', 'dateutil', 'numpy')
+
+# generous limit on the no. of modules `import pytaw.youtube` loads (measured: ~40).  unlike an
+# import time, this doesn't depend on how busy the machine is.
+MAX_YOUTUBE_MODULES = 100
+
+
+def run_python(code, *args):
+    return subprocess.run(
+        [sys.executable, *args, '-c', code], cwd=PACKAGE_DIR, capture_output=True, text=True,
+        check=True,
+    )
+
+
+class TestImport:
+
+    def test_heavy_modules_are_not_imported(self):
+        code = (
+            "import sys, pytaw, pytaw.youtube;"
+            "print(','.join(sorted({m.split('.')[0] for m in sys.modules})))"
+        )
+        imported = set(run_python(code).stdout.strip().split(','))
+        assert imported.isdisjoint(HEAVY_MODULES)
+
+    def test_import_cost(self):
+        code = (
+            "import sys; before = set(sys.modules);"
+            "import pytaw; print(','.join(sorted(set(sys.modules) - before)));"
+            "before = set(sys.modules);"
+            "import pytaw.youtube; print(len(set(sys.modules) - before))"
+        )
+        package_modules, n_youtube_modules = run_python(code).stdout.split()
+        assert package_modules == 'pytaw'        # submodules are only imported when used
+        assert int(n_youtube_modules) < MAX_YOUTUBE_MODULES
+
+    def test_lazy_names(self):
+        code = "import pytaw; print(pytaw.YouTube.__module__, pytaw.ResourceStore.__module__)"
+        assert run_python(code).stdout.split() == ['pytaw.youtube', 'pytaw.store']
+
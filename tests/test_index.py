@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+
+from conftest import video_item, channel_item, search_result_item
+from pytaw.index import SearchIndex, tokenize
+from pytaw.store import ResourceStore
+from pytaw.youtube import create_resource_from_api_response, Video, Channel
+
+
+def videos():
+    return [
+        video_item('v1', title='Dead Parrot', published_at='2010-01-01T00:00:00Z'),
+        video_item('v2', title='The Cheese Shop', published_at='2012-01-01T00:00:00Z',
+                   channel_id='UC2'),
+        video_item('v3', title='Parrot sketch, live', published_at='2014-01-01T00:00:00Z'),
+        video_item('v4', title='Ministry of Silly Walks', published_at='2016-01-01T00:00:00Z'),
+    ]
+
+
+class TestSearchIndex:
+
+    def test_tokenize(self):
+        assert tokenize("Monty Python's Flying-Circus") == \
+            ['monty', 'python', 's', 'flying', 'circus']
+
+    def test_ranked_search(self):
+        index = SearchIndex()
+        assert index.add({'items': videos()}) == 4
+
+        results = index.search('parrot')
+        assert [video.id for video in results] == ['v1', 'v3']
+        assert isinstance(results[0], Video)
+        assert results[0].title == 'Dead Parrot'
+
+        assert [v.id for v in index.search('dead parrot')] == ['v1', 'v3']
+        assert [v.id for v in index.search('dead parrot', require_all=True)] == ['v1']
+        assert index.search('spanish inquisition') == []
+
+    def test_filters(self):
+        index = SearchIndex()
+        index.add(videos())
+        index.add([channel_item('UC1', title='Monty Python')])
+
+        after = datetime(2011, 1, 1, tzinfo=timezone.utc)
+        assert [v.id for v in index.search('parrot', published_after=after)] == ['v3']
+        assert [v.id for v in index.search('parrot', published_before=after)] == ['v1']
+        assert [v.id for v in index.search('shop', channel_id='UC1')] == []
+        assert [v.id for v in index.search('shop', channel_id='UC2')] == ['v2']
+
+        results = index.search('monty', kind='channel')
+        assert len(results) == 1 and isinstance(results[0], Channel)
+
+    def test_boundaries_are_inclusive(self):
+        index = SearchIndex()
+        index.add(videos())
+        after = datetime(2010, 1, 1, tzinfo=timezone.utc)
+        before = datetime(2014, 1, 1, tzinfo=timezone.utc)
+        assert [v.id for v in index.search('parrot', published_after=after,
+                                           published_before=before)] == ['v1', 'v3']
+
+    def test_incremental_updates(self):
+        index = SearchIndex()
+        index.add(videos())
+        assert [v.id for v in index.search('walks')] == ['v4']
+
+        # a new title replaces the old one in the index, and the cached results
+        renamed = video_item('v4', title='Ministry of Silly Parrots')
+        index.add([renamed])
+        assert index.search('walks') == []
+        assert [v.id for v in index.search('parrot')][-1] == 'v3'
+        assert len(index) == 4
+
+        # adding statistics doesn't lose the snippet
+        index.add([{'kind': 'youtube#video', 'etag': 'x', 'id': 'v4',
+                    'statistics': {'viewCount': '5'}}])
+        video = index.search('silly')[0]
+        assert video.title == 'Ministry of Silly Parrots'
+        assert video.n_views == 5
+
+        assert index.remove('video', 'v4')
+        assert not index.remove('video', 'v4')
+        assert index.search('silly') == []
+        assert len(index) == 3
+
+    def test_search_results_dont_replace_full_snippets(self):
+        index = SearchIndex()
+        item = video_item('v1', title='Dead Parrot')
+        item['snippet']['tags'] = ['norwegian blue']
+        index.add([item])
+        index.add([search_result_item('v1', title='Dead Parrot')])
+        assert index.search('norwegian')[0].id == 'v1'
+
+    def test_store_and_archive(self, tmp_path):
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        store.upsert(videos())
+        index = SearchIndex.from_store(store)
+        assert len(index) == 4
+
+        path = str(tmp_path / 'index.bin')
+        index.save(path)
+        loaded = SearchIndex.load(path)
+        assert [v.id for v in loaded.search('parrot')] == ['v1', 'v3']
+
+    def test_resources(self):
+        index = SearchIndex()
+        index.add([create_resource_from_api_response(None, item) for item in videos()])
+        assert [v.id for v in index.search('cheese')] == ['v2']
@@ -0,0 +1,66 @@
+from conftest import video_item, channel_item
+from pytaw.ingest import UrlIngester
+from pytaw.youtube import Video, Channel
+
+
+CHANNEL_ID = f'UC{"a" * 22}'
+
+
+def ingest_data():
+    return {
+        'videos': {f'video-{i:05d}': video_item(f'video-{i:05d}') for i in range(120)},
+        'channels': {CHANNEL_ID: channel_item(CHANNEL_ID, title='monty python')},
+    }
+
+
+def video_url(i):
+    return f'https://www.youtube.com/watch?v=video-{i:05d}'
+
+
+class TestUrlIngester:
+
+    def test_classify_and_dedupe(self, fake_youtube):
+        youtube, _ = fake_youtube({})
+        ingester = UrlIngester(youtube)
+        urls = [video_url(1), 'https://youtu.be/video-00001', 'https://example.com/',
+                f'https://www.youtube.com/channel/{CHANNEL_ID}', video_url(2)]
+        assert list(ingester.classify(urls)) == [
+            ('video', 'video-00001'), ('channel', CHANNEL_ID), ('video', 'video-00002')]
+        stats = ingester.stats
+        assert (stats.n_urls, stats.n_unrecognised, stats.n_duplicates) == (5, 1, 1)
+
+    def test_batches(self, fake_youtube):
+        youtube, _ = fake_youtube({})
+        urls = [video_url(i) for i in range(120)] + ['https://www.youtube.com/@MontyPython']
+        batches = list(UrlIngester(youtube).batches(urls))
+        assert [(kind, len(ids)) for kind, ids in batches] == \
+            [('video', 50), ('video', 50), ('channel_handle', 1), ('video', 20)]
+
+    def test_ingest(self, fake_youtube):
+        youtube, service = fake_youtube(ingest_data())
+        ingester = UrlIngester(youtube, parts='snippet,statistics', max_workers=4)
+        urls = [video_url(i) for i in range(130)] * 2 + \
+            [f'https://www.youtube.com/channel/{CHANNEL_ID}', 'https://www.youtube.com/@nobody']
+        resources = list(ingester.ingest(urls))
+
+        videos = [r for r in resources if isinstance(r, Video)]
+        assert sorted(v.id for v in videos) == [f'video-{i:05d}' for i in range(120)]
+        assert videos[0].n_views == 100
+        channel, = [r for r in resources if isinstance(r, Channel)]
+        assert channel.title == 'monty python'
+
+        # three video batches, one channel batch and a lookup of the handle
+        assert len(service.requests_to('videos')) == 3
+        handles = [params.get('forHandle') for params in service.requests_to('channels')]
+        assert sorted(handles, key=str) == ['@nobody', None]
+        stats = ingester.stats
+        assert (stats.n_requests, stats.n_found, stats.n_missing) == (5, 121, 11)
+        assert stats.n_duplicates == 130
+
+    def test_seen_is_shared(self, fake_youtube):
+        youtube, service = fake_youtube(ingest_data())
+        first = UrlIngester(youtube)
+        list(first.ingest([video_url(1), video_url(2)]))
+        second = UrlIngester(youtube, seen=first.seen)
+        assert [v.id for v in second.ingest([video_url(2), video_url(3)])] == ['video-00003']
+        assert len(service.requests_to('videos')) == 2
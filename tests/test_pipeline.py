@@ -0,0 +1,114 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import video_item, search_result_item
+from pytaw.pipeline import Pipeline
+
+
+def pipeline_data(n=120):
+    return {
+        'videos': {f'v{i}': video_item(f'v{i}', statistics={'viewCount': str(i)})
+                   for i in range(n)},
+        'search': {'parrot': [
+            search_result_item(f'v{i}', published_at=f'20{10 + i % 10}-01-01T00:00:00Z')
+            for i in range(n)
+        ]},
+    }
+
+
+class TestPipeline:
+
+    def test_lazy(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        pipeline = youtube.search(q='parrot').hydrate('statistics').map(lambda v: v.n_views)
+        assert service.requests == []
+        assert list(pipeline.take(3)) == [0, 1, 2]
+
+    def test_filters_pushed_down(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        after = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+        list(youtube.search(q='parrot', maxResults=50)
+             .filter(kind='video', published_after=after, duration='short')
+             .take(10))
+
+        params = service.requests_to('search')[0]
+        assert params['type'] == 'video'
+        assert params['videoDuration'] == 'short'
+        assert params['publishedAfter'] == after.isoformat()
+
+    def test_conflicting_filter_checked_locally(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        after = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+        videos = list(youtube.search(q='parrot', maxResults=50,
+                                     publishedAfter=datetime(2012, 1, 1, tzinfo=timezone.utc))
+                      .filter(published_after=after))
+        assert len(videos) == 60
+        assert all(video.published_at >= after for video in videos)
+
+    def test_boundaries_are_inclusive(self, fake_youtube):
+        # like the api's publishedAfter and publishedBefore.  (the filters are checked here,
+        # since a list of videos can't be pushed down into a search)
+        youtube, _ = fake_youtube(pipeline_data(n=10))
+        boundary = datetime(2015, 1, 1, tzinfo=timezone.utc)
+        videos = list(youtube.search(q='parrot', maxResults=50))
+
+        assert [video.id for video in Pipeline(videos).filter(published_after=boundary)] == \
+            [f'v{i}' for i in range(5, 10)]
+        assert [video.id for video in Pipeline(videos).filter(published_before=boundary)] == \
+            [f'v{i}' for i in range(6)]
+
+    def test_filters_run_before_hydrating(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        after = datetime(2018, 6, 1, tzinfo=timezone.utc)
+
+        views = list(youtube.search(q='parrot', maxResults=50)
+                     .map(lambda video: video)
+                     .hydrate('statistics')
+                     .filter(published_after=after)
+                     .map(lambda video: video.n_views))
+
+        assert views == [i for i in range(120) if i % 10 == 9]
+        # only the 12 videos published after the date were fetched, in one request
+        requests = service.requests_to('videos')
+        assert len(requests) == 1
+        assert len(requests[0]['id'].split(',')) == 12
+
+    def test_fetch_stages_fused(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        pipeline = youtube.search(q='parrot', maxResults=50).hydrate('statistics').join('channel')
+        source, stages = pipeline.plan()
+        assert [stage.kind for stage in stages] == ['fetch']
+
+        videos = list(pipeline.filter(lambda video: video.n_views % 2 == 0))
+        assert len(videos) == 60
+        assert videos[0].channel is None        # channel UC1 isn't in the data
+        assert len(service.requests_to('videos')) == 3
+
+    def test_take_pushed_down(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        assert len(list(youtube.search(q='parrot').take(3))) == 3
+        assert service.requests_to('search')[0]['maxResults'] == 3
+
+    def test_batch_to_sink(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        batches = []
+        n = youtube.search(q='parrot', maxResults=50).batch(25).to(batches)
+        assert n == 5
+        assert [len(batch) for batch in batches] == [25, 25, 25, 25, 20]
+
+    def test_other_sources(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        videos = youtube.videos([f'v{i}' for i in range(10)], parts='statistics').found()
+
+        pipeline = Pipeline(videos).filter(lambda video: video.n_views > 4).hydrate('snippet')
+        assert [video.title for video in pipeline] == [f'video v{i}' for i in range(5, 10)]
+
+    def test_bad_condition(self, fake_youtube):
+        youtube, service = fake_youtube(pipeline_data())
+        with pytest.raises(ValueError):
+            youtube.search(q='parrot').filter(colour='red')
+        with pytest.raises(ValueError):
+            youtube.search(q='parrot').filter(duration='epic')
@@ -0,0 +1,91 @@
+import time
+import threading
+
+from conftest import video_item
+from pytaw.poller import StatisticsPoller
+
+
+class FakePoller(StatisticsPoller):
+    """A poller which gets its statistics from a dictionary rather than the api."""
+
+    def __init__(self, path, statistics, **kwargs):
+        self.statistics = statistics
+        super().__init__(None, path, **kwargs)
+
+    def _fetch(self, video_ids):
+        return {id: self.statistics[id] for id in video_ids if id in self.statistics}
+
+
+class TestStatisticsPoller:
+
+    def test_only_changes_are_stored(self, tmp_path):
+        statistics = {'a': (10, 1, 0), 'b': (20, 2, 0)}
+        poller = FakePoller(str(tmp_path / 'stats.db'), statistics, tiers=(60,))
+        poller.add(['a', 'b'])
+        t = int(time.time()) + 1
+
+        assert poller.poll(now=t) == 2
+        statistics['a'] = (15, 1, 0)
+        assert poller.poll(now=t + 60) == 2
+
+        assert poller.history('a') == [(t, 10, 1, 0), (t + 60, 15, 1, 0)]
+        assert poller.history('b') == [(t, 20, 2, 0)]
+        rows = poller.connection.execute('SELECT * FROM deltas WHERE video_id = ?', ('a',))
+        assert list(rows)[-1] == ('a', t + 60, 15, None, None)
+
+    def test_videos_move_between_tiers(self, tmp_path):
+        statistics = {'a': (10, 1, 0)}
+        poller = FakePoller(str(tmp_path / 'stats.db'), statistics, tiers=(60, 600),
+                            default_tier=0, demote_after=2)
+        poller.add(['a'])
+        t = time.time() + 1
+
+        poller.poll(now=t)
+        poller.poll(now=t + 60)
+        poller.poll(now=t + 120)
+        assert poller._videos['a'][0] == 1         # unchanged twice, so demoted
+        assert poller.due(now=t + 180) == []
+
+        statistics['a'] = (11, 1, 0)
+        poller.poll(now=t + 720)
+        assert poller._videos['a'][0] == 0         # changed, so promoted
+
+    def test_state_is_reloaded(self, tmp_path):
+        path = str(tmp_path / 'stats.db')
+        poller = FakePoller(path, {'a': (1, 1, 1)})
+        poller.add(['a', 'deleted'])
+        poller.poll()
+        assert len(poller) == 1
+        poller.close()
+
+        assert len(FakePoller(path, {})) == 1
+
+    def test_failed_requests_are_retried(self, tmp_path, fake_youtube):
+        youtube, service = fake_youtube({'videos': {id: video_item(id) for id in ('a', 'b')}})
+        poller = StatisticsPoller(youtube, str(tmp_path / 'stats.db'), tiers=(600,),
+                                  retry_delay=10)
+        poller.add(['a', 'b'])
+        t = int(time.time()) + 1
+
+        service.errors.append(RuntimeError("backend error"))
+        assert poller.poll(now=t) == 0
+        assert len(poller) == 2 and poller.n_failed == 1
+        assert poller.poll(now=t + 9) == 0
+        assert poller.poll(now=t + 10) == 2
+        assert poller.history('a') == [(t + 10, 100, 10, 1)]
+
+    def test_run_carries_on_after_errors(self, tmp_path, fake_youtube):
+        youtube, service = fake_youtube({'videos': {'a': video_item('a')}})
+        poller = StatisticsPoller(youtube, str(tmp_path / 'stats.db'), retry_delay=0)
+        poller.add(['a'])
+        service.errors.append(RuntimeError("backend error"))
+
+        stop = threading.Event()
+        thread = threading.Thread(target=poller.run, args=(stop, 0.01))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while poller.n_polled == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stop.set()
+        thread.join()
+        assert poller.n_failed == 1 and poller.n_polled == 1
@@ -1,13 +1,14 @@
 import pytest
 import logging
 import sys
-import collections
+import collections.abc
 from datetime import datetime, timedelta
 
 from googleapiclient.errors import HttpError
 
 from pytaw import YouTube
-from pytaw.youtube import Resource, Video, AttributeDef
+from pytaw.youtube import Resource, Video, Comment, AttributeDef
+from pytaw.comments import CommentHarvester
 
 
 logging.basicConfig(stream=sys.stdout)      # show log output when run with pytest -s
@@ -118,12 +119,46 @@ class TestVideo:
         assert video.duration.total_seconds() == 19
 
 
+class TestBulk:
+
+    def test_videos_are_aligned_with_ids(self, youtube):
+        ids = ['jNQXAC9IVRw', 'not_a_valid_youtube_video_id', '4vuW6tQ0218', 'jNQXAC9IVRw']
+        videos = youtube.videos(ids)
+        assert len(videos) == 4
+        assert videos[0].title == "Me at the zoo"
+        assert videos[1] is None
+        assert videos[3] is videos[0]
+        assert videos.missing == {'not_a_valid_youtube_video_id'}
+
+    def test_channels(self, youtube):
+        channels = youtube.channels(['UCMDQxm7cUx3yXkfeHa5zJIQ'], parts=['snippet', 'statistics'])
+        assert channels[0].title == "YouTube Help"
+
+
 class TestChannel:
 
     def test_title(self, channel):
         assert channel.title == "YouTube Help"
 
 
+class TestComments:
+
+    def test_comment_threads(self, youtube):
+        threads = youtube.comment_threads('jNQXAC9IVRw')
+        thread = threads[0]
+        assert thread.video_id == 'jNQXAC9IVRw'
+        assert isinstance(thread.top_level_comment, Comment)
+
+    def test_harvest(self, youtube):
+        harvester = CommentHarvester(youtube, max_workers=2)
+        comments = harvester.harvest(['jNQXAC9IVRw', '4vuW6tQ0218'])
+        for i, comment in enumerate(comments):
+            assert isinstance(comment, Comment)
+            if i == 500:
+                break
+        assert harvester.n_comments > 500
+
+
 class TestSearch:
 
     def test_video_search_returns_a_video(self, video_search):
@@ -143,7 +178,7 @@ class TestSearch:
 class TestListResponse:
 
     def test_if_iterable(self, search):
-        assert isinstance(search, collections.Iterator)
+        assert isinstance(search, collections.abc.Iterator)
 
     def test_integer_indexing(self, search):
         assert isinstance(search[0], Resource)
@@ -0,0 +1,61 @@
+import json
+from datetime import datetime
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from conftest import video_item
+from pytaw.quota import KeyPool, QuotaExhausted, quota_cost, is_quota_error, \
+    next_quota_reset, QUOTA_RESET_TIMEZONE
+
+
+def make_error(reason):
+    content = json.dumps({'error': {'errors': [{'reason': reason}]}}).encode()
+    return HttpError(httplib2.Response({'status': 403}), content)
+
+
+class TestKeyPool:
+
+    def test_search_costs_more(self):
+        assert quota_cost('search') == 100
+        assert quota_cost('videos') == 1
+
+    def test_quota_error_detection(self):
+        assert is_quota_error(make_error('quotaExceeded'))
+        assert not is_quota_error(make_error('forbidden'))
+
+    def test_load_is_spread_over_keys(self):
+        pool = KeyPool(['a', 'b'], daily_quota=500)
+        chosen = [pool.choose(100) for _ in range(10)]
+        assert chosen.count('a') == chosen.count('b') == 5
+        with pytest.raises(QuotaExhausted):
+            pool.choose(100)
+
+    def test_erroring_keys_are_avoided(self):
+        pool = KeyPool(['a', 'b'])
+        for _ in range(5):
+            pool.record_error('a', make_error('backendError'))
+        assert pool.choose() == 'b'
+
+    def test_quota_exceeded_removes_key(self):
+        pool = KeyPool(['a', 'b'])
+        assert pool.record_error('a', make_error('quotaExceeded'))
+        assert {pool.choose() for _ in range(10)} == {'b'}
+
+    def test_queries_fail_over_to_another_key(self, fake_youtube):
+        youtube, service = fake_youtube({'videos': {'v1': video_item('v1')}}, key=['k1', 'k2'])
+        states = youtube.key_pool.states
+        service.errors.append(make_error('quotaExceeded'))
+
+        # the query goes to k1 first, which is out of quota, so it's sent again with k2
+        assert youtube.video('v1', part='snippet').title == 'video v1'
+        assert len(service.requests) == 2
+        assert (states['k1'].used, states['k2'].used) == (1, 1)
+
+        # k1 is out of rotation until midnight pacific time
+        assert states['k1'].exhausted_until == next_quota_reset()
+        reset = datetime.fromtimestamp(states['k1'].exhausted_until, QUOTA_RESET_TIMEZONE)
+        assert (reset.hour, reset.minute) == (0, 0)
+        youtube.video('v1')
+        assert (states['k1'].used, states['k2'].used) == (1, 2)
@@ -0,0 +1,216 @@
+import time
+import threading
+
+import pytest
+
+from conftest import video_item
+from pytaw.scheduler import (
+    Scheduler,
+    SchedulerFull,
+    TokenBucket,
+    request_priority,
+    current_priority,
+)
+
+
+class FakeClock(object):
+    """A clock which only moves when it's told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def wait_in_thread(scheduler, order, name, endpoint='videos', key=None, priority='bulk'):
+    def run():
+        scheduler.wait(endpoint, key, priority=priority)
+        order.append(name)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+def depth(scheduler, priority):
+    return scheduler.metrics()[priority]['depth']
+
+
+class TestScheduler:
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=10, capacity=2, now=0)
+        assert bucket.delay(1, 0) == 0
+        bucket.take(2, 0)
+        assert bucket.delay(1, 0) == pytest.approx(0.1)
+
+        # expensive requests may overdraw a full bucket
+        assert bucket.delay(100, 1) == 0
+        bucket.take(100, 1)
+        assert bucket.delay(1, 1) == pytest.approx(9.9)
+
+    def test_rate_limit(self):
+        clock = FakeClock()
+        scheduler = Scheduler(endpoint_rates={'videos': 20}, clock=clock)
+        for _ in range(20):
+            scheduler.wait('videos')
+
+        # the bucket is empty, so the next request waits until the clock moves on
+        order = []
+        thread = wait_in_thread(scheduler, order, 'next')
+        wait_for(lambda: depth(scheduler, 'bulk') == 1)
+        clock.advance(0.06)
+        thread.join()
+        assert order == ['next']
+
+        # other endpoints aren't limited
+        for _ in range(30):
+            scheduler.wait('channels')
+        metrics = scheduler.metrics()
+        assert metrics['interactive']['n_dispatched'] == 50
+        assert metrics['interactive']['wait_max'] == 0
+
+    def test_key_rate_counts_quota(self):
+        clock = FakeClock()
+        scheduler = Scheduler(key_rate=100, clock=clock)
+        scheduler.wait('search', 'a')
+        scheduler.wait('search', 'b')       # each key has its own bucket
+        assert scheduler.metrics()['interactive']['wait_max'] == 0
+
+        order = []
+        thread = wait_in_thread(scheduler, order, 'a', endpoint='search', key='a')
+        wait_for(lambda: depth(scheduler, 'bulk') == 1)
+        clock.advance(0.5)
+        time.sleep(0.05)
+        assert order == []      # a search costs 100 units, so needs a full second's worth
+        clock.advance(0.6)
+        thread.join()
+        assert scheduler.metrics()['bulk']['wait_max'] == pytest.approx(1.1)
+
+    def test_interactive_overtakes_bulk(self):
+        clock = FakeClock()
+        scheduler = Scheduler(endpoint_rates={'videos': 10}, clock=clock)
+        for _ in range(10):
+            scheduler.wait('videos')
+
+        order = []
+        bulk = [wait_in_thread(scheduler, order, f'bulk{i}') for i in range(3)]
+        wait_for(lambda: depth(scheduler, 'bulk') == 3)
+        interactive = wait_in_thread(scheduler, order, 'interactive', priority='interactive')
+        wait_for(lambda: depth(scheduler, 'interactive') == 1)
+
+        # there's a token for one request, and the interactive one gets it
+        clock.advance(0.15)
+        interactive.join()
+        assert order == ['interactive']
+        assert depth(scheduler, 'bulk') == 3
+
+        clock.advance(1)
+        for thread in bulk:
+            thread.join()
+        metrics = scheduler.metrics()
+        assert metrics['interactive']['n_dispatched'] == 11
+        assert metrics['bulk']['n_dispatched'] == 3
+        assert metrics['bulk']['max_depth'] == 3
+        assert metrics['bulk']['depth'] == 0
+        assert metrics['bulk']['wait_max'] > metrics['interactive']['wait_p50']
+
+    def test_aging(self):
+        clock = FakeClock()
+        scheduler = Scheduler(endpoint_rates={'videos': 10}, aging=0.01, clock=clock)
+        for _ in range(10):
+            scheduler.wait('videos')
+
+        order = []
+        background = wait_in_thread(scheduler, order, 'background', priority='background')
+        wait_for(lambda: depth(scheduler, 'background') == 1)
+        clock.advance(0.05)
+        interactive = wait_in_thread(scheduler, order, 'interactive', priority='interactive')
+        wait_for(lambda: depth(scheduler, 'interactive') == 1)
+
+        # the background request has waited long enough to outrank the interactive one
+        clock.advance(0.06)
+        background.join()
+        assert order == ['background']
+        clock.advance(1)
+        interactive.join()
+
+    def test_bounded_queue(self):
+        clock = FakeClock()
+        scheduler = Scheduler(endpoint_rates={'videos': 5}, queue_size=1, clock=clock)
+        for _ in range(5):
+            scheduler.wait('videos')
+
+        order = []
+        thread = wait_in_thread(scheduler, order, 'first')
+        wait_for(lambda: depth(scheduler, 'bulk') == 1)
+        with pytest.raises(SchedulerFull):
+            scheduler.wait('videos', priority='bulk', timeout=0.01)
+
+        # other priorities have queues of their own
+        clock.advance(1)
+        scheduler.wait('videos', priority='interactive', timeout=0.01)
+        thread.join()
+
+    def test_request_priority(self):
+        assert current_priority() == 'interactive'
+        with request_priority('background'):
+            assert current_priority() == 'background'
+            with pytest.raises(ValueError):
+                with request_priority('urgent'):
+                    pass
+            assert current_priority() == 'background'
+        assert current_priority() == 'interactive'
+
+    def test_queries_use_scheduler(self, fake_youtube):
+        scheduler = Scheduler(endpoint_rates={'videos': 1000})
+        youtube, service = fake_youtube({'videos': {'v1': video_item('v1')}},
+                                        scheduler=scheduler)
+
+        with request_priority('background'):
+            response = youtube.videos(['v1'])
+            listing = youtube.playlist_items('PL1')
+        assert response.get('v1').id == 'v1'
+        assert listing.priority == 'background'
+        assert list(listing) == []
+
+        assert scheduler.metrics()['background']['n_dispatched'] == 2
+
+    def test_priorities_are_not_coalesced(self, fake_youtube):
+        # an interactive query isn't held back behind an identical bulk one that's waiting
+        clock = FakeClock()
+        scheduler = Scheduler(endpoint_rates={'videos': 1}, clock=clock)
+        youtube, service = fake_youtube({'videos': {'v1': video_item('v1')}},
+                                        scheduler=scheduler)
+        youtube.video('v2')
+
+        def fetch(priority):
+            with request_priority(priority):
+                youtube.video('v1')
+
+        bulk = threading.Thread(target=fetch, args=('bulk',), daemon=True)
+        bulk.start()
+        wait_for(lambda: depth(scheduler, 'bulk') == 1)
+        interactive = threading.Thread(target=fetch, args=('interactive',), daemon=True)
+        interactive.start()
+        wait_for(lambda: depth(scheduler, 'interactive') == 1)
+
+        clock.advance(1.5)
+        interactive.join(timeout=5)
+        assert not interactive.is_alive()
+        assert bulk.is_alive()
+        clock.advance(1)
+        bulk.join()
+        assert len(service.requests_to('videos')) == 3
@@ -0,0 +1,77 @@
+import pickle
+
+from conftest import video_item, search_result_item
+from pytaw.youtube import Video, Channel, create_resource_from_api_response
+from pytaw.serialization import encode_resources, decode_resources
+
+
+VIDEO_ITEM = {
+    'kind': 'youtube#video',
+    'etag': 'abc',
+    'id': 'jNQXAC9IVRw',
+    'snippet': {'title': 'Me at the zoo', 'publishedAt': '2005-04-24T03:31:52Z'},
+    'statistics': {'viewCount': '100'},
+}
+
+SEARCH_ITEM = {
+    'kind': 'youtube#searchResult',
+    'etag': 'def',
+    'id': {'kind': 'youtube#channel', 'channelId': 'UC1'},
+    'snippet': {'title': 'a channel'},
+}
+
+
+class TestSerialization:
+
+    def test_batch_round_trip(self):
+        youtube = object()
+        resources = [
+            create_resource_from_api_response(None, VIDEO_ITEM),
+            create_resource_from_api_response(None, SEARCH_ITEM),
+        ]
+        data = encode_resources(resources)
+        video, channel = decode_resources(data, youtube=youtube)
+
+        assert isinstance(video, Video) and isinstance(channel, Channel)
+        assert video == resources[0] and channel == resources[1]
+        assert video.title == 'Me at the zoo'
+        assert video.n_views == 100
+        assert video.youtube is youtube
+        assert video._fetched_at == resources[0]._fetched_at
+        assert channel._search_data and not channel._data     # still only a search result
+
+    def test_pickle_leaves_out_youtube(self):
+        video = Video(object(), VIDEO_ITEM['id'], VIDEO_ITEM)
+        unpickled = pickle.loads(pickle.dumps(video))
+        assert unpickled.youtube is None
+        assert unpickled.title == video.title
+        assert unpickled.attach('yt').youtube == 'yt'
+
+    def test_detached_attributes(self):
+        # a detached resource can't fetch missing parts, but hasattr() and getattr() still work
+        video = pickle.loads(pickle.dumps(Video(object(), VIDEO_ITEM['id'], VIDEO_ITEM)))
+        assert not hasattr(video, 'duration')
+        assert getattr(video, 'license', None) is None
+        assert hasattr(video, 'title')
+
+    def test_search_result_with_fetched_part(self, fake_youtube):
+        youtube, service = fake_youtube({'videos': {'v1': video_item('v1')}})
+        video = create_resource_from_api_response(youtube, search_result_item('v1', title='t'))
+        assert video.n_views == 100       # fetches the statistics part
+
+        for copy in (pickle.loads(pickle.dumps(video)).attach(youtube),
+                     decode_resources(encode_resources([video]), youtube=youtube)[0]):
+            assert copy.title == 't'
+            assert copy.n_views == 100
+            assert copy.to_record()[5]      # still partial
+        assert len(service.requests) == 1
+
+        # the rest of the snippet is fetched, rather than taken to be empty
+        assert copy.channel_title == 'channel UC1'
+        assert len(service.requests) == 2
+
+    def test_hashing_uses_identity(self):
+        a = create_resource_from_api_response(None, VIDEO_ITEM)
+        b = Video(None, VIDEO_ITEM['id'])
+        assert a == b
+        assert len({a, b}) == 1
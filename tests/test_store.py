@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+
+from conftest import video_item, search_result_item
+from pytaw.store import ResourceStore
+from pytaw.youtube import Video, Channel, create_resource_from_api_response
+
+
+class TestResourceStore:
+
+    def test_upsert_page_and_get(self, tmp_path):
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        page = {'items': [video_item('a')]}
+        assert store.upsert(page) == 1
+
+        video = store.get('video', 'a')
+        assert isinstance(video, Video)
+        assert video.title == 'video a'
+
+    def test_parts_are_merged(self, tmp_path):
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        store.upsert([video_item('a')])
+        store.upsert([{'kind': 'youtube#video', 'etag': 'new', 'id': 'a',
+                       'statistics': {'viewCount': '10'}}])
+
+        video = store.get('video', 'a')
+        assert video.title == 'video a'
+        assert video.n_views == 10
+
+    def test_resources_and_search_results(self, tmp_path):
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        channel = Channel(None, 'UC1', {'kind': 'youtube#channel', 'id': 'UC1',
+                                        'snippet': {'title': 'a channel'}})
+        search_result = {'kind': 'youtube#searchResult', 'etag': 'x',
+                         'id': {'kind': 'youtube#video', 'videoId': 'b'},
+                         'snippet': {'title': 'video b', 'channelId': 'UC1',
+                                     'publishedAt': '2021-01-01T00:00:00Z'}}
+        store.upsert([channel, search_result])
+
+        assert store.get('channel', 'UC1').title == 'a channel'
+        assert [v.id for v in store.videos(channel_id='UC1')] == ['b']
+
+    def test_videos_of_channel_after_date(self, tmp_path):
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        store.upsert([
+            video_item('a'),
+            video_item('b', published_at='2021-01-01T00:00:00.000Z'),
+            video_item('c', channel_id='UC2', published_at='2021-01-01T00:00:00Z'),
+            video_item('d', published_at='2022-01-01T00:00:00Z'),
+        ])
+
+        after = datetime(2020, 6, 1, tzinfo=timezone.utc)
+        videos = store.videos(channel_id='UC1', published_after=after, newest_first=True)
+        assert [v.id for v in videos] == ['d', 'b']
+
+    def test_boundaries_are_inclusive(self, tmp_path):
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        store.upsert([video_item(id, published_at=f'202{i}-01-01T00:00:00Z')
+                      for i, id in enumerate('abc')])
+        videos = store.videos(published_after=datetime(2021, 1, 1, tzinfo=timezone.utc),
+                              published_before=datetime(2022, 1, 1, tzinfo=timezone.utc))
+        assert [v.id for v in videos] == ['b', 'c']
+
+    def test_search_results_are_partial(self, tmp_path, fake_youtube):
+        youtube, service = fake_youtube({'videos': {'a': video_item('a')}})
+        store = ResourceStore(str(tmp_path / 'store.db'), youtube=youtube)
+
+        # a search result which has fetched its statistics keeps its search snippet
+        video = create_resource_from_api_response(youtube, search_result_item('a'))
+        assert video.n_views == 100
+        store.upsert([video])
+        after = datetime(2019, 1, 1, tzinfo=timezone.utc)
+        stored, = store.videos(channel_id='UC1', published_after=after)
+        assert (stored.title, stored.n_views) == ('video a', 100)
+        assert len(service.requests) == 1
+
+        # the rest of the snippet is fetched, not taken to be empty
+        assert stored.channel_title == 'channel UC1'
+        assert len(service.requests) == 2
+
+        # and a search result never replaces a full snippet
+        store.upsert([video_item('a', title='full title')])
+        store.upsert([search_result_item('a', title='search title')])
+        assert store.get('video', 'a').title == 'full title'
+        assert store.get('video', 'a').channel_title == 'channel UC1'
+        assert len(service.requests) == 2
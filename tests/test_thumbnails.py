@@ -0,0 +1,95 @@
+import threading
+import http.server
+
+import pytest
+
+from pytaw.youtube import Thumbnail
+from pytaw.thumbnails import ThumbnailStore, ThumbnailDownloader, best_thumbnail
+
+
+IMAGES = {
+    '/a/hq.jpg': b'image a',
+    '/b/hq.jpg': b'image b',
+    '/default.jpg': b'default image',
+    '/default2.jpg': b'default image',
+}
+
+
+class ImageHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path not in IMAGES:
+            self.send_response(404)
+            self.send_header('content-length', '0')
+            self.end_headers()
+            return
+
+        etag = f'"{self.path}"'
+        if self.headers.get('if-none-match') == etag:
+            self.send_response(304)
+            self.send_header('content-length', '0')
+            self.end_headers()
+            return
+
+        body = IMAGES[self.path]
+        self.send_response(200)
+        self.send_header('etag', etag)
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def thumbnails(base_url, path):
+    return [
+        Thumbnail('default', f'{base_url}/small.jpg', 120, 90),
+        Thumbnail('high', f'{base_url}{path}', 480, 360),
+    ]
+
+
+class TestThumbnails:
+
+    def test_best_thumbnail(self):
+        collection = [Thumbnail('a', 'a', 120, 90), Thumbnail('b', 'b', 480, 360),
+                      Thumbnail('c', 'c', 320, 180)]
+        assert best_thumbnail(collection).id == 'b'
+        assert best_thumbnail(collection, width=200).id == 'c'
+        assert best_thumbnail(collection, width=1000).id == 'b'
+        assert best_thumbnail([]) is None
+
+    def test_download_and_dedupe(self, server, tmp_path):
+        store = ThumbnailStore(str(tmp_path))
+        downloader = ThumbnailDownloader(store, max_workers=4)
+        collections = [thumbnails(server, path) for path in IMAGES]
+
+        results = {r.thumbnail.url: r for r in downloader.download(collections)}
+        statuses = sorted(r.status for r in results.values())
+        assert statuses == ['downloaded', 'downloaded', 'downloaded', 'duplicate']
+        assert results[f'{server}/default.jpg'].digest == results[f'{server}/default2.jpg'].digest
+        assert store.get(results[f'{server}/a/hq.jpg'].digest) == b'image a'
+        assert downloader.stats.bytes == sum(len(image) for image in IMAGES.values())
+
+    def test_refresh_uses_conditional_requests(self, server, tmp_path):
+        store = ThumbnailStore(str(tmp_path))
+        collections = [thumbnails(server, '/a/hq.jpg')]
+        list(ThumbnailDownloader(store).download(collections))
+
+        again = ThumbnailDownloader(store)
+        assert [r.status for r in again.download(collections)] == ['cached']
+        assert again.stats.n_requests == 0
+
+        refresh = ThumbnailDownloader(store, refresh=True)
+        assert [r.status for r in refresh.download(collections)] == ['not_modified']
+        assert refresh.stats.hit_rate == 1.0
@@ -0,0 +1,30 @@
+import threading
+
+from pytaw.transport import HttpPool
+
+
+class TestHttpPool:
+
+    def test_connections_are_reused(self):
+        pool = HttpPool(max_connections=2)
+        with pool.connection() as a:
+            pass
+        with pool.connection() as b:
+            pass
+        assert a is b
+
+    def test_pool_is_bounded(self):
+        pool = HttpPool(max_connections=2)
+        a = pool.acquire()
+        b = pool.acquire()
+        assert a is not b
+
+        got = []
+        t = threading.Thread(target=lambda: got.append(pool.acquire()))
+        t.start()
+        t.join(timeout=0.2)
+        assert t.is_alive()     # blocked waiting for a free connection
+
+        pool.release(a)
+        t.join(timeout=1)
+        assert got == [a]
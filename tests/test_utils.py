@@ -0,0 +1,91 @@
+import time
+import threading
+
+from pytaw.utils import SingleFlight, normalise_api_params, classify_youtube_url, \
+    youtube_url_to_id
+
+
+class TestSingleFlight:
+
+    def test_params_are_normalised(self):
+        a = normalise_api_params({'part': 'id,snippet', 'id': 'b,a', 'maxResults': 50})
+        b = normalise_api_params({'maxResults': 50, 'id': 'a,b', 'part': 'snippet,id'})
+        assert a == b
+
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        n_executed = []
+
+        def slow_call():
+            n_executed.append(1)
+            time.sleep(0.2)
+            return {'items': [1, 2, 3]}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do('key', slow_call)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(n_executed) == 1
+        assert flight.n_coalesced == 4
+        assert results == [{'items': [1, 2, 3]}] * 5
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+
+        def failing_call():
+            time.sleep(0.1)
+            raise ValueError('oops')
+
+        errors = []
+
+        def call():
+            try:
+                flight.do('key', failing_call)
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(errors) == 3
+        assert flight.n_calls == 1
+
+
+class TestClassifyYoutubeUrl:
+
+    def test_common_urls(self):
+        video = ('video', 'jNQXAC9IVRw')
+        assert classify_youtube_url('https://www.youtube.com/watch?v=jNQXAC9IVRw') == video
+        assert classify_youtube_url('youtube.com/watch?t=10&v=jNQXAC9IVRw&list=PL1') == video
+        assert classify_youtube_url('https://youtu.be/jNQXAC9IVRw?t=10') == video
+        assert classify_youtube_url('https://m.youtube.com/shorts/jNQXAC9IVRw') == video
+        assert classify_youtube_url('https://www.youtube.com/playlist?list=PLabc_-1') == \
+            ('playlist', 'PLabc_-1')
+        assert classify_youtube_url(f'https://www.youtube.com/channel/UC{"x" * 22}/videos') == \
+            ('channel', f'UC{"x" * 22}')
+        assert classify_youtube_url('https://www.youtube.com/@MontyPython') == \
+            ('channel_handle', '@MontyPython')
+        assert classify_youtube_url('https://www.youtube.com/user/MontyPython') == \
+            ('channel_username', 'MontyPython')
+
+    def test_unusual_urls(self):
+        video = ('video', 'jNQXAC9IVRw')
+        assert classify_youtube_url('https://www.youtube.com/watch%3Fv%3DjNQXAC9IVRw') == video
+        assert classify_youtube_url('https://WWW.YouTube.com/watch?v=jNQXAC9IVRw') == video
+        assert classify_youtube_url('https://example.com/watch?v=jNQXAC9IVRw') is None
+        assert classify_youtube_url('https://www.youtube.com/feed/trending') is None
+        assert classify_youtube_url('not a url') is None
+
+    def test_url_to_id(self):
+        assert youtube_url_to_id('https://youtu.be/jNQXAC9IVRw') == 'jNQXAC9IVRw'
+        assert youtube_url_to_id('https://www.youtube.com/v/jNQXAC9IVRw?fs=1') == 'jNQXAC9IVRw'
+        assert youtube_url_to_id('https://www.youtube.com/@MontyPython') is None
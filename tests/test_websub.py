@@ -0,0 +1,240 @@
+import hmac
+import time
+import hashlib
+import threading
+import http.server
+import urllib.parse
+import urllib.request
+
+import pytest
+
+from conftest import video_item
+from pytaw.store import ResourceStore
+from pytaw.websub import WebSubSubscriber, SubscriptionError, parse_atom, check_signature, \
+    topic_url
+
+
+def notification(*video_ids, channel_id='UC1', updated='2021-01-01T00:00:00+00:00'):
+    entries = ''.join(f"""
+        <entry>
+            <id>yt:video:{id}</id>
+            <yt:videoId>{id}</yt:videoId>
+            <yt:channelId>{channel_id}</yt:channelId>
+            <title>video {id}</title>
+            <link rel="alternate" href="https://www.youtube.com/watch?v={id}"/>
+            <published>2021-01-01T00:00:00+00:00</published>
+            <updated>{updated}</updated>
+        </entry>""" for id in video_ids)
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+        <feed xmlns:yt="http://www.youtube.com/xml/schemas/2015"
+              xmlns="http://www.w3.org/2005/Atom">
+            <title>YouTube video feed</title>
+            {entries}
+        </feed>""".encode()
+
+
+DELETED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:at="http://purl.org/atompub/tombstones/1.0" xmlns="http://www.w3.org/2005/Atom">
+    <at:deleted-entry ref="yt:video:gone" when="2021-01-02T00:00:00+00:00">
+        <link href="https://www.youtube.com/watch?v=gone"/>
+        <at:by>
+            <name>channel</name>
+            <uri>https://www.youtube.com/channel/UC1</uri>
+        </at:by>
+    </at:deleted-entry>
+</feed>"""
+
+
+class StandInHub(object):
+    """A local hub, which verifies subscriptions and publishes signed notifications."""
+
+    def __init__(self, lease_seconds=None, refuse=False):
+        self.lease_seconds = lease_seconds
+        self.refuse = refuse
+        self.subscriptions = {}     # topic -> (callback, secret)
+        self.requests = []
+        self.n_verifications = 0
+
+        hub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['content-length']))
+                params = dict(urllib.parse.parse_qsl(body.decode()))
+                hub.requests.append(params)
+                self.send_response(400 if hub.refuse else 202)
+                self.send_header('content-length', '0')
+                self.end_headers()
+                if not hub.refuse:
+                    threading.Thread(target=hub.verify, args=(params,)).start()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/subscribe"
+
+    def verify(self, params):
+        query = {
+            'hub.mode': params['hub.mode'],
+            'hub.topic': params['hub.topic'],
+            'hub.challenge': 'challenge-123',
+            'hub.lease_seconds': str(self.lease_seconds or params['hub.lease_seconds']),
+        }
+        url = f"{params['hub.callback']}?{urllib.parse.urlencode(query)}"
+        try:
+            with urllib.request.urlopen(url) as response:
+                verified = response.read() == b'challenge-123'
+        except urllib.error.HTTPError:
+            verified = False
+        if verified and params['hub.mode'] == 'subscribe':
+            self.subscriptions[params['hub.topic']] = (params['hub.callback'],
+                                                       params['hub.secret'])
+        elif verified:
+            self.subscriptions.pop(params['hub.topic'], None)
+        self.n_verifications += 1
+
+    def publish(self, topic, body, secret=None):
+        callback, real_secret = self.subscriptions[topic]
+        signature = hmac.new((secret or real_secret).encode(), body, hashlib.sha1).hexdigest()
+        request = urllib.request.Request(callback, data=body, headers={
+            'content-type': 'application/atom+xml',
+            'x-hub-signature': f'sha1={signature}',
+        })
+        with urllib.request.urlopen(request) as response:
+            return response.status
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+@pytest.fixture
+def hub():
+    hub = StandInHub()
+    yield hub
+    hub.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+class TestParsing:
+
+    def test_parse_entries(self):
+        entries = parse_atom(notification('v1', 'v2'))
+        assert [e.video_id for e in entries] == ['v1', 'v2']
+        assert entries[0].channel_id == 'UC1'
+        assert entries[0].title == 'video v1'
+        assert entries[0].published_at.year == 2021
+        assert not entries[0].deleted
+
+    def test_parse_deleted(self):
+        entry, = parse_atom(DELETED)
+        assert entry.deleted
+        assert (entry.video_id, entry.channel_id) == ('gone', 'UC1')
+        assert entry.updated_at.day == 2
+
+    def test_check_signature(self):
+        digest = hmac.new(b'secret', b'body', hashlib.sha256).hexdigest()
+        assert check_signature('secret', b'body', f'sha256={digest}')
+        assert not check_signature('secret', b'body!', f'sha256={digest}')
+        assert not check_signature('secret', b'body', f'md5={digest}')
+        assert not check_signature('secret', b'body', None)
+
+
+class TestWebSubSubscriber:
+
+    def test_end_to_end(self, hub, fake_youtube, tmp_path):
+        youtube, service = fake_youtube({
+            'videos': {f'v{i}': video_item(f'v{i}') for i in range(4)}
+        })
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        batches = []
+        subscriber = WebSubSubscriber(youtube, host='127.0.0.1', hub_url=hub.url, store=store,
+                                      on_videos=batches.append, batch_delay=0.2)
+
+        with subscriber:
+            subscriber.subscribe(['UC1', 'UC2'])
+            wait_for(lambda: len(hub.subscriptions) == 2)
+            assert hub.requests[0]['hub.secret'] == subscriber.secret
+            assert subscriber.subscriptions()['UC1'] > time.time() + 86400
+
+            # three notifications arriving together are hydrated in one request, and a repeat
+            # of one of them is ignored
+            assert hub.publish(topic_url('UC1'), notification('v0', 'v1')) == 204
+            hub.publish(topic_url('UC2'), notification('v2', channel_id='UC2'))
+            hub.publish(topic_url('UC1'), notification('v1'))
+            wait_for(lambda: subscriber.n_videos == 3)
+
+        assert [[video.id for video in batch] for batch in batches] == [['v0', 'v1', 'v2']]
+        assert batches[0][0].n_views == 100
+        assert len(service.requests_to('videos')) == 1
+        assert 'statistics' in service.requests_to('videos')[0]['part']
+        assert store.get('video', 'v2') is not None
+
+    def test_bad_signatures_and_deletions(self, hub, fake_youtube):
+        youtube, service = fake_youtube({'videos': {'v1': video_item('v1')}})
+        deleted = []
+        subscriber = WebSubSubscriber(youtube, host='127.0.0.1', hub_url=hub.url,
+                                      on_deleted=deleted.append, batch_delay=0.05)
+
+        with subscriber:
+            subscriber.subscribe(['UC1'])
+            wait_for(lambda: hub.subscriptions)
+            hub.publish(topic_url('UC1'), notification('v1'), secret='forged')
+            hub.publish(topic_url('UC1'), DELETED)
+            wait_for(lambda: deleted)
+
+        assert subscriber.n_rejected == 1
+        assert service.requests_to('videos') == []
+        assert deleted[0].video_id == 'gone'
+
+    def test_unexpected_verification_is_refused(self, hub, fake_youtube):
+        youtube, _ = fake_youtube({})
+        with WebSubSubscriber(youtube, host='127.0.0.1', hub_url=hub.url) as subscriber:
+            hub.verify({'hub.mode': 'subscribe', 'hub.topic': topic_url('UC9'),
+                        'hub.callback': subscriber.callback_url, 'hub.lease_seconds': '60'})
+            assert subscriber.subscriptions() == {}
+            assert hub.subscriptions == {}
+
+    def test_unsubscribe_and_renew(self, fake_youtube):
+        hub = StandInHub(lease_seconds=60)
+        youtube, _ = fake_youtube({})
+        subscriber = WebSubSubscriber(youtube, host='127.0.0.1', hub_url=hub.url,
+                                      renew_margin=600)
+        try:
+            with subscriber:
+                subscriber.subscribe(['UC1', 'UC2'])
+                wait_for(lambda: len(hub.subscriptions) == 2)
+
+                # the hub only gave us a minute, so both are due for renewal
+                n_requests = len(hub.requests)
+                assert subscriber.renew() == 2
+                assert len(hub.requests) == n_requests + 2
+                wait_for(lambda: hub.n_verifications == 4)
+
+                subscriber.unsubscribe(['UC1'])
+                wait_for(lambda: hub.n_verifications == 5)
+                assert list(subscriber.subscriptions()) == ['UC2']
+                assert list(hub.subscriptions) == [topic_url('UC2')]
+        finally:
+            hub.close()
+
+    def test_refused_subscription(self, fake_youtube):
+        hub = StandInHub(refuse=True)
+        youtube, _ = fake_youtube({})
+        try:
+            with WebSubSubscriber(youtube, host='127.0.0.1', hub_url=hub.url) as subscriber:
+                with pytest.raises(SubscriptionError):
+                    subscriber.subscribe(['UC1'])
+                assert subscriber._pending == {}
+        finally:
+            hub.close()
@@ -0,0 +1,226 @@
+"""Offline tests of the YouTube client, with requests answered by a FakeService."""
+from datetime import timedelta
+
+from conftest import (
+    video_item,
+    channel_item,
+    playlist_item_item,
+    search_result_item,
+    subscription_item,
+)
+import pytest
+
+from pytaw.store import ResourceStore
+from pytaw.youtube import (
+    ListResponse,
+    join_resources,
+    compile_attribute_plan,
+    create_resource_from_api_response,
+    AttributeDef,
+    Video,
+)
+
+
+def search_data(n_queries=3, n_results=12):
+    return {'search': {
+        f'query {q}': [search_result_item(f'q{q}-v{i}') for i in range(n_results)]
+        for q in range(n_queries)
+    }}
+
+
+class TestSearchMany:
+
+    def test_stream(self, fake_youtube):
+        youtube, service = fake_youtube(search_data())
+        searches = [{'q': f'query {q}', 'maxResults': 5} for q in range(3)]
+
+        results = list(youtube.search_many(searches, max_workers=3))
+        assert len(results) == 36
+        for search, video in results:
+            assert video.id.startswith(search['q'].replace('query ', 'q'))
+
+    def test_prefetched_responses(self, fake_youtube):
+        youtube, service = fake_youtube(search_data())
+        searches = [{'q': f'query {q}', 'maxResults': 5} for q in range(3)]
+
+        responses = youtube.search_many(searches, stream=False)
+        assert len(service.requests) == 9
+        assert [len(list(r)) for r in responses] == [12, 12, 12]
+        assert len(service.requests) == 9       # iterating didn't need any more requests
+
+    def test_quota_budget(self, fake_youtube):
+        youtube, service = fake_youtube(search_data(n_results=15))
+        searches = [{'q': f'query {q}', 'maxResults': 5} for q in range(3)]
+
+        results = list(youtube.search_many(searches, quota_budget=400))
+        assert len(service.requests) == 4
+        assert len(results) == 20
+
+    def test_stop_early(self, fake_youtube):
+        youtube, service = fake_youtube(search_data(n_results=100))
+        searches = [{'q': f'query {q}', 'maxResults': 5} for q in range(3)]
+
+        stream = youtube.search_many(searches, max_workers=1)
+        assert next(stream)[1].id == 'q0-v0'
+        stream.close()
+
+        # the bounded queue holds two pages, so only a few are fetched of the sixty available
+        assert len(service.requests) <= 4
+
+
+def join_data(n_items=120, n_channels=3):
+    return {
+        'videos': {f'v{i}': video_item(f'v{i}', channel_id=f'UC{i % n_channels}')
+                   for i in range(n_items)},
+        'channels': {f'UC{i}': channel_item(f'UC{i}') for i in range(n_channels)},
+        'playlistItems': {'PL1': [playlist_item_item('PL1', f'v{i}', i)
+                                  for i in range(n_items)]},
+        'subscriptions': [subscription_item(f'UC{i}') for i in range(n_channels)],
+    }
+
+
+class TestJoins:
+
+    def test_playlist_item_videos(self, fake_youtube):
+        youtube, service = fake_youtube(join_data())
+        items = youtube.playlist_items('PL1', maxResults=50)
+
+        durations = [item.video.duration.total_seconds()
+                     for item in items.join('video', parts='contentDetails')]
+        assert durations == [60] * 120
+        assert len(service.requests_to('videos')) == 3
+        assert all('contentDetails' in params['part'] for params in service.requests_to('videos'))
+
+    def test_video_channels_are_shared(self, fake_youtube):
+        youtube, service = fake_youtube(join_data(n_items=10))
+        videos = youtube.videos([f'v{i}' for i in range(10)]).found()
+
+        join_resources(youtube, videos, 'channel', parts=['snippet', 'statistics'])
+        assert len(service.requests_to('channels')) == 1
+        assert [v.channel.id for v in videos] == [f'UC{i % 3}' for i in range(10)]
+        assert videos[0].channel is videos[3].channel
+        assert videos[0].channel.n_subscribers == 10
+        assert len(service.requests_to('channels')) == 1
+
+    def test_join_fetches_missing_ids_in_batches(self, fake_youtube):
+        youtube, service = fake_youtube(join_data(n_items=10))
+        videos = youtube.videos([f'v{i}' for i in range(10)], parts='statistics').found()
+
+        join_resources(youtube, videos, 'channel')
+        assert len(service.requests_to('videos')) == 2     # statistics, then snippets
+        assert len(service.requests_to('channels')) == 1
+
+    def test_single_join_is_cached(self, fake_youtube):
+        youtube, service = fake_youtube(join_data(n_items=1))
+        video = youtube.videos(['v0']).get('v0')
+
+        assert video.channel.id == 'UC0'
+        assert video.channel.id == 'UC0'
+        assert len(service.requests_to('channels')) == 1
+
+    def test_subscriptions(self, fake_youtube):
+        youtube, service = fake_youtube(join_data())
+        channels = list(youtube.subscriptions())
+
+        assert [c.title for c in channels] == ['channel UC0', 'channel UC1', 'channel UC2']
+        assert service.requests_to('channels') == []
+
+        channels = list(youtube.subscriptions().hydrate('statistics'))
+        assert [c.n_videos for c in channels] == [5, 5, 5]
+        assert len(service.requests_to('channels')) == 1
+
+
+class TestAttributePlans:
+
+    def test_grouped_by_part(self):
+        plan = compile_attribute_plan(Video.ATTRIBUTE_DEFS)
+        assert set(plan) == {'snippet', 'contentDetails', 'status', 'statistics'}
+        assert [a[0] for a in plan['contentDetails']] == ['duration']
+
+        name, keys, convert, default = plan['snippet'][0]
+        assert (name, keys, convert, default) == ('title', ('title',), str, '')
+
+    def test_unknown_type(self):
+        with pytest.raises(TypeError):
+            compile_attribute_plan({'x': AttributeDef('snippet', 'x', type_='colour')})
+
+    def test_conversion(self):
+        video = create_resource_from_api_response(None, video_item('v1'))
+        assert video.title == 'video v1'
+        assert video.tags == []
+        assert video.duration == timedelta(minutes=1)
+        assert video.n_views == 100
+        assert video.n_dislikes == 0        # missing from a part we have
+        assert 'license' not in vars(video)     # part not fetched
+
+    def test_update_single_part(self):
+        video = create_resource_from_api_response(None, video_item('v1'))
+        video._data['snippet']['title'] = 'new title'
+        video._data['statistics']['viewCount'] = '200'
+
+        video._update_attributes('statistics')
+        assert video.n_views == 200
+        assert video.title == 'video v1'
+
+    def test_compiled_per_class(self):
+
+        class AnnotatedVideo(Video):
+            ATTRIBUTE_DEFS = dict(Video.ATTRIBUTE_DEFS, x=AttributeDef('snippet', 'channelTitle'))
+
+        item = video_item('v1')
+        assert AnnotatedVideo(None, 'v1', item).x == 'channel UC1'
+        assert 'x' not in vars(create_resource_from_api_response(None, item))
+
+
+class TestCursors:
+
+    def test_resume_part_way_through_a_page(self, fake_youtube):
+        youtube, service = fake_youtube(join_data())
+        items = youtube.playlist_items('PL1', maxResults=50)
+        first = [next(items).id for _ in range(70)]
+
+        cursor = items.cursor()
+        assert cursor['page_token'] == '50'
+        assert (cursor['offset'], cursor['n_pages'], cursor['n_items']) == (20, 1, 70)
+
+        resumed = ListResponse.from_cursor(youtube, cursor)
+        rest = [item.id for item in resumed]
+        assert first + rest == [f'PL1-{i}' for i in range(120)]
+        assert resumed.cursor()['done']
+        assert service.requests_to('playlistItems')[2]['pageToken'] == '50'
+
+    def test_cursor_at_start_and_end(self, fake_youtube):
+        youtube, service = fake_youtube(join_data())
+        items = youtube.playlist_items('PL1', maxResults=50)
+        assert items.cursor()['page_token'] is None
+        assert not items.cursor()['done']
+
+        list(items)
+        assert items.cursor()['done']
+        assert list(ListResponse.from_cursor(youtube, items.cursor())) == []
+
+    def test_checkpoint(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube(join_data())
+        store = ResourceStore(str(tmp_path / 'store.db'))
+
+        items = youtube.playlist_items('PL1', maxResults=50).checkpoint(store, 'PL1')
+        for _ in range(60):
+            next(items)
+        # the job dies here.  the first page was finished, so that's where we carry on from.
+        assert store.load_cursor('PL1')['n_pages'] == 1
+
+        items = youtube.playlist_items('PL1', maxResults=50).checkpoint(store, 'PL1')
+        assert [item.id for item in items] == [f'PL1-{i}' for i in range(50, 120)]
+        assert store.load_cursor('PL1')['done']
+
+        # once it's finished there's nothing left to do
+        items = youtube.playlist_items('PL1', maxResults=50).checkpoint(store, 'PL1')
+        assert list(items) == []
+
+    def test_checkpoint_for_another_query(self, fake_youtube, tmp_path):
+        youtube, service = fake_youtube(join_data())
+        store = ResourceStore(str(tmp_path / 'store.db'))
+        list(youtube.playlist_items('PL1', maxResults=50).checkpoint(store, 'PL1'))
+
+        with pytest.raises(ValueError):
+            youtube.playlist_items('PL1', maxResults=20).checkpoint(store, 'PL1')